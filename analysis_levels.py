@@ -1,3 +1,15 @@
+import json
+
+ANALYSIS_LEVELS = ("fastest", "balanced", "deepest")
+
+# How the form introduces each level; estimator.describe_levels adds the
+# estimated ideas and duration
+LEVEL_SUMMARIES = {
+    "fastest": "Quick analysis",
+    "balanced": "Standard depth analysis",
+    "deepest": "Thorough analysis"
+}
+
 def get_analysis_config(level):
     """Return configuration parameters based on analysis level"""
     if level == 'fastest':
@@ -23,4 +35,13 @@ def get_analysis_config(level):
             'root_cause_depth': 2,
             'max_leaf_causes': 3,
             'solutions_per_domain': 1
-        }
\ No newline at end of file
+        }
+
+def analysis_key(problem, config):
+    """Identify an analysis by its normalized problem text and configuration.
+    
+    Submissions that differ only in case or whitespace produce the same key,
+    so identical concurrent requests can share one run.
+    """
+    normalized_problem = " ".join(problem.split()).casefold()
+    return json.dumps([normalized_problem, config or {}], sort_keys=True)
@@ -0,0 +1,137 @@
+import os
+import csv
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Set
+from analysis_levels import ANALYSIS_LEVELS, get_analysis_config, analysis_key
+from models import AnalysisResult, dumps
+from stats import percentile
+from config import BATCH_CONCURRENCY
+
+def read_problems(input_path: str, analysis_level: str = "balanced") -> List[Dict[str, Any]]:
+    """Read problems from a CSV file (with a "problem" column) or a JSONL file.
+
+    JSONL lines may be plain strings or objects with a "problem" key. Either
+    format may also give an "id" and an "analysis_level" per problem; problems
+    without an ID get one derived from the problem text and level.
+    """
+    if input_path.lower().endswith(".csv"):
+        with open(input_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        rows = []
+        with open(input_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    rows.append({"problem": row} if isinstance(row, str) else row)
+
+    problems = []
+    for number, row in enumerate(rows, 1):
+        problem = (row.get("problem") or "").strip()
+        if not problem:
+            print(f"Skipping entry {number}: no problem statement")
+            continue
+        level = row.get("analysis_level") or analysis_level
+        if level not in ANALYSIS_LEVELS:
+            print(f"Skipping entry {number}: unknown analysis level '{level}'")
+            continue
+        problem_id = str(row.get("id") or "").strip()
+        if not problem_id:
+            key = analysis_key(problem, get_analysis_config(level))
+            problem_id = hashlib.sha256(key.encode()).hexdigest()[:16]
+        problems.append({"id": problem_id, "problem": problem, "analysis_level": level})
+    return problems
+
+def completed_ids(output_path: str) -> Set[str]:
+    """IDs already analyzed successfully in an earlier run writing to the same output file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short when the previous run was interrupted
+            if record.get("status") == "done":
+                done.add(record["id"])
+    return done
+
+def run_batch(analyzer, input_path: str, output_path: str, analysis_level: str = "balanced",
+              concurrency: int = BATCH_CONCURRENCY) -> Dict[str, Any]:
+    """Analyze every problem in input_path, appending one JSON line per analysis to output_path.
+
+    Up to `concurrency` problems are analyzed at once; their LLM calls share
+    the process-wide rate limiters. Each result is written as soon as it
+    finishes, so an interrupted run resumes where it stopped when started
+    again with the same output file. Failed problems are retried on resume.
+    """
+    problems = read_problems(input_path, analysis_level)
+    done = completed_ids(output_path)
+    pending = [p for p in problems if p["id"] not in done]
+    print(f"{len(problems)} problems, {len(problems) - len(pending)} already done, {len(pending)} to analyze "
+          f"({concurrency} at a time)")
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    write_lock = threading.Lock()
+    latencies = []
+    failures = 0
+    solutions = 0
+    started = time.monotonic()
+
+    def analyze(item):
+        start = time.monotonic()
+        results = analyzer.analyze_problem(item["problem"], get_analysis_config(item["analysis_level"]))
+        return AnalysisResult.from_dict(results), time.monotonic() - start
+
+    with open(output_path, "ab") as output, ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(analyze, item): item for item in pending}
+        try:
+            for number, future in enumerate(as_completed(futures), 1):
+                item = futures[future]
+                record = dict(item)
+                try:
+                    result, elapsed = future.result()
+                    record.update(status="done", elapsed=round(elapsed, 3), result=result)
+                    latencies.append(elapsed)
+                    solutions += len(result.solutions)
+                    print(f"[{number}/{len(pending)}] {item['id']} done in {elapsed:.1f}s")
+                except Exception as e:
+                    failures += 1
+                    record.update(status="failed", error=str(e))
+                    print(f"[{number}/{len(pending)}] {item['id']} failed: {e}")
+                # Checkpoint every result as soon as it is known
+                with write_lock:
+                    output.write(dumps(record) + b"\n")
+                    output.flush()
+        except KeyboardInterrupt:
+            print("\nInterrupted; finished analyses are saved and will be skipped on the next run.")
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    elapsed = time.monotonic() - started
+    summary = {
+        "analyzed": len(latencies),
+        "failed": failures,
+        "skipped": len(problems) - len(pending),
+        "solutions": solutions,
+        "wall_seconds": round(elapsed, 1),
+        "problems_per_minute": round(len(latencies) / elapsed * 60, 2) if elapsed else 0.0,
+        "latency_mean": round(sum(latencies) / len(latencies), 1) if latencies else None,
+        "latency_p50": round(percentile(latencies, 0.5), 1) if latencies else None,
+        "latency_p95": round(percentile(latencies, 0.95), 1) if latencies else None
+    }
+    print("\n=== BATCH COMPLETE ===")
+    print(f"- Analyzed: {summary['analyzed']} ({summary['failed']} failed, {summary['skipped']} skipped as already done)")
+    print(f"- Solutions generated: {summary['solutions']}")
+    print(f"- Wall time: {summary['wall_seconds']}s ({summary['problems_per_minute']} problems/minute)")
+    if latencies:
+        print(f"- Per problem: mean {summary['latency_mean']}s, p50 {summary['latency_p50']}s, p95 {summary['latency_p95']}s")
+    return summary
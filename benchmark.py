@@ -0,0 +1,300 @@
+import io
+import os
+import json
+import time
+import asyncio
+import tempfile
+import platform
+import threading
+import contextlib
+import http.client
+from datetime import datetime
+from http.server import ThreadingHTTPServer
+from typing import Any, Callable, Dict, List
+from lateral_thinking import LateralThinkingEnhanced
+from llm_backends import FakeLLM
+from rate_limiter import RateLimiter
+from analysis_levels import ANALYSIS_LEVELS, get_analysis_config
+from evaluation import parse_evaluation, parse_solution_content
+from report_builder import generate_html_report, render_html_report, cause_tree_to_html
+from form_handler import FormHandler
+from jobs import JobQueue
+from stats import percentile
+from estimator import estimate
+from config import PROBLEM_STATEMENT, FAKE_LLM_LATENCY, FAKE_LLM_JITTER, FAKE_LLM_SEED
+
+ROLES = ("analyst", "challenger", "evaluator", "domain")
+SAMPLE_EVALUATION = "NOVELTY: 8\nFEASIBILITY: 6\nIMPACT: 7\nRELEVANCE: 9\nOVERALL: 7.5"
+
+class CallCounter:
+    """Wraps a role's LLM and records how many calls it receives and how long each takes"""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.model_name = llm.model_name
+        self.temperature = llm.temperature
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def _record(self, started: float):
+        with self._lock:
+            self.latencies.append(time.monotonic() - started)
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        started = time.monotonic()
+        try:
+            return self.llm.invoke(prompt, **kwargs)
+        finally:
+            self._record(started)
+
+    async def ainvoke(self, prompt: str, **kwargs) -> str:
+        started = time.monotonic()
+        try:
+            return await self.llm.ainvoke(prompt, **kwargs)
+        finally:
+            self._record(started)
+
+    def take(self) -> List[float]:
+        """Return and reset the latencies recorded so far"""
+        with self._lock:
+            latencies, self.latencies = self.latencies, []
+        return latencies
+
+def make_analyzer(latency: float = FAKE_LLM_LATENCY, jitter: float = FAKE_LLM_JITTER) -> LateralThinkingEnhanced:
+    """An analyzer on the fake backend, without the response cache or rate limits, with every role's calls counted"""
+    analyzer = LateralThinkingEnhanced(backend="fake")
+    analyzer.response_cache = None  # Every call must reach the (simulated) model
+    # Simulated calls must not spend (or wait for) the real provider's quota
+    analyzer.rate_limiters = {role: RateLimiter() for role in ROLES}
+    for role in ROLES:
+        llm = getattr(analyzer, f"{role}_llm")
+        setattr(analyzer, f"{role}_llm", CallCounter(FakeLLM(llm.temperature, latency, jitter, 0.0, 0.0, FAKE_LLM_SEED)))
+    return analyzer
+
+def take_calls(analyzer: LateralThinkingEnhanced) -> Dict[str, List[float]]:
+    return {role: getattr(analyzer, f"{role}_llm").take() for role in ROLES}
+
+def summarize(values: List[float], scale: float = 1.0, digits: int = 3) -> Dict[str, Any]:
+    """Count, mean and percentiles of a list of measurements, multiplied by `scale`"""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values) * scale, digits),
+        "min": round(min(values) * scale, digits),
+        "p50": round(percentile(values, 0.5) * scale, digits),
+        "p95": round(percentile(values, 0.95) * scale, digits),
+        "p99": round(percentile(values, 0.99) * scale, digits),
+        "max": round(max(values) * scale, digits)
+    }
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """Silence the analysis's progress output while measuring"""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def bench_levels(levels: List[str] = ANALYSIS_LEVELS, runs: int = 3, latency: float = FAKE_LLM_LATENCY,
+                 jitter: float = FAKE_LLM_JITTER, use_async: bool = False, verbose: bool = False) -> Dict[str, Any]:
+    """Run analyze_problem `runs` times at each analysis level against the simulated-latency LLM"""
+    analyzer = make_analyzer(latency, jitter)
+    # Every role of the fake backend has the same latency
+    fake_latency = {role: {"mean": latency, "p95": latency + jitter} for role in ROLES}
+    results = {}
+    for level in levels:
+        config = get_analysis_config(level)
+        predicted = estimate(config, latency=fake_latency)
+        wall, calls, solutions = [], {role: [] for role in ROLES}, []
+        for run in range(runs):
+            # A different problem each run so nothing is shared between runs
+            problem = f"Run {run + 1}: {PROBLEM_STATEMENT}"
+            started = time.monotonic()
+            with quiet(not verbose):
+                if use_async:
+                    analysis = asyncio.run(analyzer.analyze_problem_async(problem, config))
+                else:
+                    analysis = analyzer.analyze_problem(problem, config)
+            wall.append(time.monotonic() - started)
+            solutions.append(len(analysis["solutions"]))
+            for role, latencies in take_calls(analyzer).items():
+                calls[role].extend(latencies)
+        results[level] = {
+            "config": config,
+            "runs": runs,
+            "wall_seconds": summarize(wall),
+            "solutions": solutions[-1],
+            "calls_per_run": {role: len(calls[role]) // runs for role in ROLES},
+            "total_calls_per_run": sum(len(latencies) for latencies in calls.values()) // runs,
+            "call_seconds": summarize([latency for latencies in calls.values() for latency in latencies]),
+            # What estimator.py predicts, to keep it honest
+            "estimate": {"seconds": predicted["seconds"], "calls": predicted["calls"], "max_calls": predicted["max_calls"]}
+        }
+        print(f"{level}: p50 {results[level]['wall_seconds']['p50']}s, {results[level]['total_calls_per_run']} calls, "
+              f"{results[level]['solutions']} solutions per run (estimated {predicted['seconds']}s, {predicted['calls']} calls)")
+    return results
+
+def time_operation(operation: Callable[[], Any], iterations: int) -> Dict[str, Any]:
+    """Time `iterations` calls of `operation`, in milliseconds"""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings, scale=1000, digits=4)
+
+def bench_micro(iterations: int = 200) -> Dict[str, Any]:
+    """Time report generation and response parsing on the results of a deepest analysis"""
+    with quiet():
+        sample = make_analyzer(latency=0.0, jitter=0.0).analyze_problem(PROBLEM_STATEMENT, get_analysis_config("deepest"))
+    content = sample["solutions"][0]["content"]
+
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as directory:
+        report_path = os.path.join(directory, "report.html")
+        results = {
+            "parse_evaluation": time_operation(lambda: parse_evaluation(SAMPLE_EVALUATION), iterations * 10),
+            "parse_solution_content": time_operation(lambda: parse_solution_content(content), iterations * 10),
+            "cause_tree_to_html": time_operation(
+                lambda: [cause_tree_to_html(i, tree) for i, tree in enumerate(sample["cause_trees"], 1)], iterations),
+            "render_html_report": time_operation(lambda: render_html_report(sample), iterations),
+            "generate_html_report": time_operation(lambda: generate_html_report(sample, report_path=report_path), iterations)
+        }
+    for name, timing in results.items():
+        print(f"{name}: p50 {timing['p50']}ms, p99 {timing['p99']}ms")
+    return {"sample_solutions": len(sample["solutions"]), "milliseconds": results}
+
+class QuietFormHandler(FormHandler):
+    def log_message(self, format, *args):
+        pass
+
+def run_client(port: int, client: int, requests: int, level: str, timings: Dict[str, List[float]], lock: threading.Lock):
+    """One simulated visitor: load the form page, then run analyses over the streaming API"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+
+    def record(name, value):
+        with lock:
+            timings[name].append(value)
+
+    for request in range(requests):
+        started = time.monotonic()
+        conn.request("GET", "/", headers={"Accept-Encoding": "gzip"})
+        conn.getresponse().read()
+        record("page", time.monotonic() - started)
+
+        problem = f"Client {client}.{request}: {PROBLEM_STATEMENT[:250]}"
+        body = json.dumps({"problem": problem, "analysis_level": level, "stream": True})
+        started = time.monotonic()
+        conn.request("POST", "/api/analyses", body=body, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        if response.status == 503:
+            response.read()
+            record("rejected", 1.0)
+            continue
+        first_event = None
+        outcome = None
+        for line in response:
+            event = json.loads(line)["event"]
+            if first_event is None and event != "queued":
+                first_event = time.monotonic() - started
+            if event in ("done", "failed"):
+                outcome = event
+        elapsed = time.monotonic() - started
+        if first_event is not None:
+            record("first_event", first_event)
+        record("analysis" if outcome == "done" else "failed", elapsed)
+    conn.close()
+
+def bench_server(clients: int = 8, requests: int = 2, level: str = "fastest", latency: float = FAKE_LLM_LATENCY,
+                 jitter: float = FAKE_LLM_JITTER) -> Dict[str, Any]:
+    """Drive FormHandler with `clients` concurrent visitors, each running `requests` analyses"""
+    analyzer = make_analyzer(latency, jitter)
+    jobs = JobQueue(analyzer)
+
+    def handler_factory(*args, **kwargs):
+        return QuietFormHandler(*args, analyzer=analyzer, jobs=jobs, **kwargs)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_factory)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    timings = {name: [] for name in ("page", "first_event", "analysis", "failed", "rejected")}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=run_client, args=(server.server_address[1], client, requests, level, timings, lock))
+               for client in range(clients)]
+    started = time.monotonic()
+    with quiet():
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.monotonic() - started
+    server.shutdown()
+    server.server_close()
+
+    calls = take_calls(analyzer)
+    results = {
+        "clients": clients,
+        "requests_per_client": requests,
+        "level": level,
+        "wall_seconds": round(elapsed, 3),
+        "analyses_per_second": round(len(timings["analysis"]) / elapsed, 3),
+        "completed": len(timings["analysis"]),
+        "failed": len(timings["failed"]),
+        "rejected": len(timings["rejected"]),
+        "page_ms": summarize(timings["page"], scale=1000),
+        "first_event_seconds": summarize(timings["first_event"]),
+        "analysis_seconds": summarize(timings["analysis"]),
+        "llm_calls": {role: len(latencies) for role, latencies in calls.items()}
+    }
+    print(f"server: {results['completed']} analyses in {results['wall_seconds']}s "
+          f"({results['analyses_per_second']}/s), p95 {results['analysis_seconds'].get('p95')}s, "
+          f"{results['rejected']} rejected")
+    return results
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], path: str = "") -> List[str]:
+    """Describe how each p50/p95/p99 in `current` changed from `baseline`"""
+    changes = []
+    for key, value in current.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        name = f"{path}.{key}" if path else key
+        if isinstance(value, dict):
+            changes.extend(compare(old or {}, value, name))
+        elif key in ("p50", "p95", "p99") and isinstance(old, (int, float)) and old:
+            changes.append(f"{name}: {old} -> {value} ({(value - old) / old:+.1%})")
+    return changes
+
+def run_benchmarks(output_path: str = "benchmark.json", levels: List[str] = ANALYSIS_LEVELS, runs: int = 3,
+                   clients: int = 8, requests: int = 2, server_level: str = "fastest",
+                   latency: float = FAKE_LLM_LATENCY, jitter: float = FAKE_LLM_JITTER, use_async: bool = False,
+                   skip: List[str] = (), baseline_path: str = None) -> Dict[str, Any]:
+    """Run the benchmark suite and write its results as JSON to output_path"""
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "llm": {"backend": "fake", "latency": latency, "jitter": jitter},
+        "async": use_async
+    }
+    if "levels" not in skip:
+        print("=== Analysis levels ===")
+        report["levels"] = bench_levels(levels, runs, latency, jitter, use_async)
+    if "micro" not in skip:
+        print("=== Micro-benchmarks ===")
+        report["micro"] = bench_micro()
+    if "server" not in skip:
+        print("=== HTTP load test ===")
+        report["server"] = bench_server(clients, requests, server_level, latency, jitter)
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output_path}")
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"=== Compared with {baseline_path} ===")
+        for change in compare(baseline, report):
+            print(change)
+    return report
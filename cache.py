@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional
+
+class TTLCache:
+    """Thread-safe in-memory cache whose entries expire after `ttl` seconds.
+
+    Once `max_entries` is reached the least recently used entry is dropped.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class Memo:
+    """Thread-safe memo in which concurrent callers asking for the same key share one computation.
+
+    The first caller for a key computes the value while later callers wait for
+    it, so a value is never computed twice even when requested from several
+    threads at once. Failed computations are not remembered.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except Exception as e:
+            with self._lock:
+                del self._futures[key]
+            future.set_exception(e)
+            raise
+        future.set_result(value)
+        return value
+
+class ResponseCache:
+    """On-disk LLM response cache keyed by role, model, temperature and rendered prompt.
+
+    Backed by SQLite in WAL mode so several server or batch processes can share
+    one cache file. Entries expire after their TTL, and once the stored
+    responses exceed `max_bytes` the least recently used ones are evicted.
+    Measuring the stored size scans the whole table, so puts keep a running
+    estimate instead and only measure (and evict) once it passes `max_bytes`,
+    or every `evict_every` puts to catch expired entries and other processes'
+    writes.
+    """
+
+    def __init__(self, path: str, max_bytes: int, evict_every: int = 100):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evict_every = max(1, evict_every)
+        self._local = threading.local()
+        self._size_lock = threading.Lock()
+        self._estimated_bytes = 0
+        self._puts_since_evict = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    role TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._estimated_bytes = self._stored_bytes(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        # SQLite connections cannot be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(role: str, model: str, temperature: float, prompt: str, max_tokens: Optional[int] = None) -> str:
+        """Content address for one LLM call"""
+        payload = json.dumps([role, model, temperature, max_tokens, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT response, expires FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[1] < now:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                return row[0]
+        except sqlite3.Error as e:
+            print(f"Error reading response cache: {e}")
+            return None
+
+    def put(self, key: str, role: str, response: str, ttl: float):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, role, response, size, expires, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, role, response, size, now + ttl, now)
+                )
+                with self._size_lock:
+                    # Replacing an entry overcounts, which only brings the next eviction forward
+                    self._estimated_bytes += size
+                    self._puts_since_evict += 1
+                    due = self._estimated_bytes > self.max_bytes or self._puts_since_evict >= self.evict_every
+                    if due:
+                        self._puts_since_evict = 0
+                if due:
+                    self._evict(conn, now)
+        except sqlite3.Error as e:
+            print(f"Error writing response cache: {e}")
+
+    @staticmethod
+    def _stored_bytes(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM responses WHERE expires < ?", (now,))
+        total = self._stored_bytes(conn)
+        freed = 0
+        if total > self.max_bytes:
+            # Drop least recently used entries down to 90% of the limit, so the
+            # next few puts do not push it straight back over
+            excess = total - int(self.max_bytes * 0.9)
+            stale = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                stale.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+        with self._size_lock:
+            self._estimated_bytes = total - freed
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+        with self._size_lock:
+            self._estimated_bytes = 0
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution.
+
+    While a call for a key is running, further callers for that key wait for
+    it and receive its result (or its exception) instead of starting their
+    own. Unlike Memo, nothing is kept once the call finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = self._calls[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            value = fn()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
@@ -0,0 +1,62 @@
+import gzip
+import zlib
+import hashlib
+from email.utils import formatdate
+from typing import Dict, Iterable, Iterator, List, Optional
+from config import GZIP_LEVEL, ZSTD_LEVEL
+
+try:
+    import zstandard
+except ImportError:  # Optional: responses fall back to gzip
+    zstandard = None
+
+def available_encodings() -> List[str]:
+    """Content encodings this server can produce, most preferred first"""
+    return ["zstd", "gzip"] if zstandard else ["gzip"]
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best encoding allowed by an Accept-Encoding header, or None for identity"""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def iter_compressed(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress a stream chunk by chunk, flushing each one so the client can render it straight away"""
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(flush_block)
+        yield compressor.flush()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+class StaticAsset:
+    """A response body that does not change, with its validators and pre-compressed copies"""
+
+    def __init__(self, body: bytes, modified: Optional[float] = None):
+        self.body = body
+        self.etag = f'W/"{hashlib.sha256(body).hexdigest()[:20]}"'
+        self.last_modified = formatdate(modified, usegmt=True) if modified is not None else None
+        self.variants: Dict[str, bytes] = {encoding: compress(body, encoding) for encoding in available_encodings()}
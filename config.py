@@ -17,7 +17,111 @@ ROOT_CAUSE_DEPTH = 1
 MAX_LEAF_CAUSES = 2
 SOLUTIONS_PER_DOMAIN = 1
 API_REQUEST_TIMEOUT = 60
-API_CALL_DELAY = 0.8
+MAX_IN_FLIGHT = 8  # Maximum number of LLM-backed analysis steps (including evaluation batches) running at once
+
+# Background analysis jobs: analyses running at once, and how many may wait
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 2))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", 20))
+JOB_RETENTION_SECONDS = 3600  # How long finished results stay available
+BATCH_CONCURRENCY = 4  # Problems analyzed at once by "main.py batch"
+# Directory where each finished job's HTML report is saved as <job id>.html so it
+# outlives JOB_RETENTION_SECONDS; unset to keep reports in memory only
+REPORT_ARCHIVE_DIR = os.getenv("REPORT_ARCHIVE_DIR")
+# Embed style.css in every page, or link to /style.css so browsers cache it
+# (saved and archived reports always embed it so they stand alone)
+EMBED_CSS = os.getenv("EMBED_CSS", "1") != "0"
+
+# Serve Prometheus metrics at /metrics; prompt and completion tokens are counted
+# with this tiktoken encoding (estimated from text length if it is unavailable)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+METRICS_TOKEN_ENCODING = os.getenv("METRICS_TOKEN_ENCODING", "cl100k_base")
+
+# Profiling: the fraction of analyses profiled automatically (0 disables it), and
+# a token that profiles a single request when passed as ?profile=<token>.
+# Profiles (pstats and speedscope files) are written to PROFILE_DIR.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_STACK_INTERVAL = 0.01  # Seconds between call stack samples for the flame graph
+
+# Pre-run estimates (estimator.py): seconds per call for each role until a role
+# has ESTIMATE_MIN_OBSERVATIONS calls in the metrics to go by
+ESTIMATE_DEFAULT_LATENCY = {"domain": 3.0, "analyst": 5.0, "challenger": 15.0, "evaluator": 6.0}
+ESTIMATE_MIN_OBSERVATIONS = 5
+# Server budget per analysis, checked against the estimate before it starts
+# (0 = unlimited): worst-case LLM calls, expected tokens and expected seconds
+ANALYSIS_MAX_LLM_CALLS = int(os.getenv("ANALYSIS_MAX_LLM_CALLS", 250))
+ANALYSIS_MAX_TOKENS = int(os.getenv("ANALYSIS_MAX_TOKENS", 0))
+ANALYSIS_MAX_SECONDS = float(os.getenv("ANALYSIS_MAX_SECONDS", 0))
+
+# HTTP response compression (zstd when the zstandard package is installed, else
+# gzip) and caching. Bodies smaller than COMPRESSION_MIN_BYTES are sent as is.
+COMPRESSION_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+STATIC_MAX_AGE = 365 * 24 * 3600  # For versioned static assets (/style.css?v=...)
+REPORT_MAX_AGE = 3600  # Finished job reports never change
+
+# Rate limits per LLM role, shared by every analysis in the process.
+# Calls are only delayed when one of these is about to be exceeded.
+RATE_LIMITS = {
+    "analyst": {"requests_per_minute": 3500, "tokens_per_minute": 90000},
+    "challenger": {"requests_per_minute": 3500, "tokens_per_minute": 90000},
+    "evaluator": {"requests_per_minute": 3500, "tokens_per_minute": 90000},
+    "domain": {"requests_per_minute": 3500, "tokens_per_minute": 90000}
+}
+RATE_LIMIT_MAX_RETRIES = 5  # Retries after a 429 response before giving up
+RATE_LIMIT_BACKOFF_BASE = 1.0  # Seconds; doubled on every retry
+RATE_LIMIT_BACKOFF_MAX = 30.0
+
+# Expand every cause at the same tree depth (across all root causes) with one
+# "why" call instead of one call per cause, falling back to per-cause calls
+# for anything the batched response gets wrong.
+BATCH_WHY_EXPANSION = True
+WHY_BATCH_SIZE = 16  # Maximum causes sent in one batched "why" call
+
+# Solutions scored per evaluator call; 1 evaluates each solution on its own
+EVALUATION_BATCH_SIZE = 8
+# Solutions are evaluated while others are still being generated: each worker
+# waits up to EVALUATION_BATCH_LINGER seconds for more solutions to fill a batch
+EVALUATION_WORKERS = 4
+EVALUATION_BATCH_LINGER = 1.0
+
+# Key ideas are generated once per domain per analysis. Set a TTL (seconds) to
+# also reuse them across analyses; 0 keeps every analysis independent.
+KEY_IDEA_CACHE_TTL = 0
+
+# Persistent LLM response cache (SQLite, shareable between processes). Each
+# role can be cached or bypassed: the low-temperature analyst and evaluator
+# give near-deterministic answers, while the creative roles should vary.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") != "0"
+RESPONSE_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_responses.sqlite3")
+)
+RESPONSE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+RESPONSE_CACHE_POLICY = {
+    "analyst": {"enabled": True, "ttl": 7 * 24 * 3600},
+    "evaluator": {"enabled": True, "ttl": 7 * 24 * 3600},
+    "challenger": {"enabled": False, "ttl": 24 * 3600},
+    "domain": {"enabled": False, "ttl": 0}
+}
+
+# LLM backend: "openai" (the default), "fake" (an offline stand-in that answers
+# in the expected formats with simulated latency and errors), "record" (OpenAI,
+# saving every response to LLM_CASSETTE_PATH) or "replay" (answers from that
+# cassette, no API key needed)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_CASSETTE_PATH = os.getenv(
+    "LLM_CASSETTE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cassettes", "llm.jsonl")
+)
+LLM_REPLAY_SPEED = float(os.getenv("LLM_REPLAY_SPEED", 0))  # 1.0 replays recorded latencies; 0 answers instantly
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", 0.5))  # Seconds per call
+FAKE_LLM_JITTER = float(os.getenv("FAKE_LLM_JITTER", 0.2))  # Up to this many seconds either way
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", 0))  # Fraction of calls that fail
+FAKE_LLM_RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", 0))  # Fraction answered with a 429
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", 0))
 
 # LLM temperature settings
 ANALYST_TEMPERATURE = 0.3
@@ -0,0 +1,328 @@
+import math
+import heapq
+import functools
+import collections
+from typing import Any, Dict, List, Optional, Tuple
+from analysis_levels import ANALYSIS_LEVELS, LEVEL_SUMMARIES, get_analysis_config
+from metrics import LLM_CALL_SECONDS, count_tokens
+from lateral_thinking import (
+    DOMAIN_PROMPT, CAUSE_PROMPT, WHY_PROMPT, BATCH_WHY_PROMPT, KEY_IDEA_PROMPT, SOLUTION_PROMPT,
+    EVALUATION_PROMPT, BATCH_EVALUATION_PROMPT, WHY_BRANCHING
+)
+from config import (
+    NUM_DOMAINS,
+    NUM_INITIAL_CAUSES,
+    ROOT_CAUSE_DEPTH,
+    MAX_LEAF_CAUSES,
+    SOLUTIONS_PER_DOMAIN,
+    MAX_IN_FLIGHT,
+    BATCH_WHY_EXPANSION,
+    WHY_BATCH_SIZE,
+    EVALUATION_BATCH_SIZE,
+    EVALUATION_WORKERS,
+    EVALUATION_BATCH_LINGER,
+    ESTIMATE_DEFAULT_LATENCY,
+    ESTIMATE_MIN_OBSERVATIONS,
+    ANALYSIS_MAX_LLM_CALLS,
+    ANALYSIS_MAX_TOKENS,
+    ANALYSIS_MAX_SECONDS
+)
+
+# The knobs an analysis config may set, with the range of values each accepts
+# (the server budget usually rejects configs well inside these)
+CONFIG_LIMITS = {
+    "num_domains": (1, 10),
+    "num_initial_causes": (1, 10),
+    "root_cause_depth": (0, 5),
+    "max_leaf_causes": (1, 32),
+    "solutions_per_domain": (1, 3)
+}
+
+# Typical size in tokens of the text the LLMs write, used for the prompts
+# that include it and for the completions themselves
+TYPICAL_TOKENS = {
+    "problem": 60,
+    "domain": 4,
+    "cause": 20,
+    "key_idea": 150,
+    "solution": 300,
+    "evaluation": 30
+}
+
+@functools.lru_cache(maxsize=None)
+def template_tokens(template: str) -> int:
+    return count_tokens(template)
+
+def validate_config(config: Dict[str, Any]) -> Optional[str]:
+    """Return an error message if the analysis config overrides are unusable"""
+    if not isinstance(config, dict):
+        return "config must be an object"
+    for key, value in config.items():
+        if key not in CONFIG_LIMITS:
+            return f"Unknown config key '{key}'. Supported keys: {', '.join(CONFIG_LIMITS)}"
+        low, high = CONFIG_LIMITS[key]
+        if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+            return f"config.{key} must be an integer from {low} to {high}"
+    return None
+
+def role_latency(role: str) -> Dict[str, Any]:
+    """Mean and 95th percentile seconds per call for a role, observed or from ESTIMATE_DEFAULT_LATENCY"""
+    observations, total = LLM_CALL_SECONDS.summary(role=role)
+    if observations >= ESTIMATE_MIN_OBSERVATIONS:
+        return {"mean": total / observations, "p95": LLM_CALL_SECONDS.quantile(0.95, role=role),
+                "observations": observations, "source": "observed"}
+    default = ESTIMATE_DEFAULT_LATENCY[role]
+    return {"mean": default, "p95": default * 2, "observations": observations, "source": "default"}
+
+def expansion_levels(depth: int, max_leaf_causes: int) -> Tuple[List[int], int]:
+    """Nodes asked 'why' at each level of one cause tree, and the leaf causes it yields.
+
+    Mirrors select_for_expansion in lateral_thinking.py, assuming every 'why'
+    returns WHY_BRANCHING causes.
+    """
+    frontier, levels = 1, []
+    for remaining_depth in range(depth, 0, -1):
+        needed = -(-max_leaf_causes // WHY_BRANCHING ** remaining_depth)  # Ceiling division
+        expanded = min(frontier, needed)
+        levels.append(expanded)
+        frontier = expanded * WHY_BRANCHING
+    return levels, min(frontier, max_leaf_causes)
+
+def simulate_evaluations(arrivals: List[float], close_time: float, seconds: float, workers: int,
+                         batch_size: int, linger: float) -> Tuple[List[int], float]:
+    """Replay EvaluationPipeline for solutions submitted at the given times.
+
+    Returns the size of every evaluation batch and when the last one finishes.
+    Idle or lingering workers take new solutions in the order they started
+    waiting, as queue.Queue hands them out; close_time is when close() ends
+    every linger.
+    """
+    pending = collections.deque(sorted(arrivals))
+    waiting = list(range(workers))  # Workers blocked on the queue, longest waiting first
+    busy = []  # (free at, worker)
+    batches = {}  # worker -> [solutions, linger deadline]
+    sizes, finished, now = [], close_time, 0.0
+
+    def flush(worker, at):
+        nonlocal finished
+        size, _ = batches.pop(worker)
+        sizes.append(size)
+        waiting.remove(worker)
+        heapq.heappush(busy, (at + seconds, worker))
+        finished = max(finished, at + seconds)
+
+    while pending or batches:
+        deadline, lingering = min(((batch[1], worker) for worker, batch in batches.items()), default=(math.inf, None))
+        arrival = max(pending[0], now) if pending and waiting else math.inf
+        free_at = busy[0][0] if busy else math.inf
+        if free_at <= min(arrival, deadline):
+            now, worker = heapq.heappop(busy)
+            waiting.append(worker)
+        elif deadline <= arrival:
+            now = deadline
+            flush(lingering, deadline)
+        else:
+            now = arrival
+            pending.popleft()
+            worker = waiting.pop(0)
+            waiting.append(worker)  # Waiting again, now at the back
+            if worker in batches:
+                batches[worker][0] += 1
+            else:
+                batches[worker] = [1, min(now + linger, max(close_time, now))]
+            # A worker takes anything already queued without waiting its turn
+            while pending and pending[0] < now and batches[worker][0] < batch_size:
+                pending.popleft()
+                batches[worker][0] += 1
+            if batches[worker][0] >= batch_size:
+                flush(worker, now)
+    return sizes, finished
+
+def predict_timeline(cfg: Dict[str, Any], levels: List[int], leaves: int, latency: Dict[str, float]) -> Tuple[List[float], float]:
+    """When each solution is generated by analyze_problem's graph, and when the graph finishes.
+
+    Each call takes its role's latency; steps wait for a free slot of max_in_flight.
+    """
+    slots = [0.0] * max(1, cfg["max_in_flight"])
+
+    def run(ready, duration):
+        start = max(ready, heapq.heappop(slots))
+        heapq.heappush(slots, start + duration)
+        return start + duration
+
+    domains_ready = run(0.0, latency["domain"])
+    causes_ready = run(0.0, latency["analyst"])
+    key_ideas_ready = max(run(domains_ready, latency["challenger"]) for _ in range(cfg["num_domains"]))
+
+    trees = cfg["num_initial_causes"]
+    if cfg["batch_why"]:
+        forest = sum(-(-(nodes * trees) // WHY_BATCH_SIZE) for nodes in levels) * latency["analyst"]
+        trees_ready = [run(causes_ready, forest)] * trees
+    else:
+        trees_ready = [run(causes_ready, sum(levels) * latency["analyst"]) for _ in range(trees)]
+
+    per_tree = leaves * cfg["num_domains"] * cfg["solutions_per_domain"]
+    arrivals, finished = [], max(key_ideas_ready, *trees_ready)
+    for tree_ready in trees_ready:
+        start = max(heapq.heappop(slots), tree_ready, domains_ready)
+        if per_tree:
+            start = max(start, key_ideas_ready)
+        arrivals.extend(start + latency["challenger"] * (i + 1) for i in range(per_tree))
+        end = start + latency["challenger"] * per_tree
+        heapq.heappush(slots, end)
+        finished = max(finished, end)
+    return arrivals, finished
+
+def predict_seconds(cfg: Dict[str, Any], levels: List[int], leaves: int, latency: Dict[str, float]) -> Tuple[float, List[int]]:
+    """Wall-clock seconds for the whole analysis, and the evaluation batch sizes on the way"""
+    arrivals, graph_finished = predict_timeline(cfg, levels, leaves, latency)
+    if not arrivals:
+        return graph_finished, []
+    sizes, finished = simulate_evaluations(arrivals, graph_finished, latency["evaluator"], EVALUATION_WORKERS,
+                                           cfg["evaluation_batch_size"], EVALUATION_BATCH_LINGER)
+    return finished, sizes
+
+def stage(role: str, calls: int, prompt_tokens: int, completion_tokens: int, **extra) -> Dict[str, Any]:
+    return {"role": role, "calls": calls, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, **extra}
+
+def current_latency() -> Dict[str, Dict[str, Any]]:
+    return {role: role_latency(role) for role in ESTIMATE_DEFAULT_LATENCY}
+
+def estimate(config: Dict[str, Any] = None, problem: str = None, latency: Dict[str, Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Predict the LLM calls, tokens and wall-clock time of analyze_problem for a config.
+
+    Call counts are exact for well-formed LLM responses (no retries, no
+    fallbacks for garbled batched answers, no response or key idea cache
+    hits) except evaluation batching: how solutions group into evaluator
+    calls depends on timing, so that count is an expected value from
+    replaying the evaluation pipeline and can miss either way (the benchmark
+    has measured 47 calls against an estimated 45, and 82 against 83), while
+    "max_calls" assumes every solution is scored on its own.
+    Times use the mean latency per role observed by metrics.py (p95_seconds
+    uses the 95th percentile), or ESTIMATE_DEFAULT_LATENCY before there are
+    ESTIMATE_MIN_OBSERVATIONS calls of that role; pass `latency` (as from
+    current_latency) to use other figures.
+    """
+    cfg = config or {}
+    cfg = {
+        "num_domains": cfg.get("num_domains", NUM_DOMAINS),
+        "num_initial_causes": cfg.get("num_initial_causes", NUM_INITIAL_CAUSES),
+        "root_cause_depth": cfg.get("root_cause_depth", ROOT_CAUSE_DEPTH),
+        "max_leaf_causes": cfg.get("max_leaf_causes", MAX_LEAF_CAUSES),
+        "solutions_per_domain": cfg.get("solutions_per_domain", SOLUTIONS_PER_DOMAIN),
+        "max_in_flight": cfg.get("max_in_flight", MAX_IN_FLIGHT),
+        "batch_why": cfg.get("batch_why", BATCH_WHY_EXPANSION),
+        "evaluation_batch_size": max(1, cfg.get("evaluation_batch_size", EVALUATION_BATCH_SIZE))
+    }
+    sizes = dict(TYPICAL_TOKENS)
+    if problem:
+        sizes["problem"] = count_tokens(problem)
+    domains, trees = cfg["num_domains"], cfg["num_initial_causes"]
+    levels, leaves = expansion_levels(cfg["root_cause_depth"], cfg["max_leaf_causes"])
+    num_solutions = trees * leaves * domains * cfg["solutions_per_domain"]
+
+    stages = {
+        "domains": stage("domain", 1, template_tokens(DOMAIN_PROMPT.template), domains * sizes["domain"]),
+        "causes": stage("analyst", 1, template_tokens(CAUSE_PROMPT.template) + sizes["problem"], trees * sizes["cause"])
+    }
+
+    why_calls, why_prompt = [], 0
+    for nodes in levels:
+        if cfg["batch_why"]:
+            total = nodes * trees
+            chunks = [min(WHY_BATCH_SIZE, total - start) for start in range(0, total, WHY_BATCH_SIZE)]
+        else:
+            chunks = [1] * (nodes * trees)
+        why_calls.append(len(chunks))
+        for chunk in chunks:
+            template = WHY_PROMPT if chunk == 1 else BATCH_WHY_PROMPT
+            why_prompt += template_tokens(template.template) + sizes["problem"] + chunk * sizes["cause"]
+    why_nodes = sum(levels) * trees
+    stages["whys"] = stage("analyst", sum(why_calls), why_prompt, why_nodes * WHY_BRANCHING * sizes["cause"],
+                           calls_per_level=why_calls)
+
+    key_ideas = domains if num_solutions else 0
+    stages["key_ideas"] = stage("challenger", key_ideas,
+                                key_ideas * (template_tokens(KEY_IDEA_PROMPT.template) + 3 * sizes["domain"]),
+                                key_ideas * sizes["key_idea"])
+    stages["solutions"] = stage("challenger", num_solutions,
+                                num_solutions * (template_tokens(SOLUTION_PROMPT.template) + sizes["problem"]
+                                                 + sizes["cause"] + sizes["key_idea"]),
+                                num_solutions * sizes["solution"])
+
+    latency = latency or current_latency()
+    seconds, batches = predict_seconds(cfg, levels, leaves, {role: info["mean"] for role, info in latency.items()})
+    p95_seconds, _ = predict_seconds(cfg, levels, leaves, {role: info["p95"] for role, info in latency.items()})
+
+    evaluation_prompt = sum(
+        template_tokens((EVALUATION_PROMPT if size == 1 else BATCH_EVALUATION_PROMPT).template)
+        + sizes["problem"] + size * (sizes["cause"] + sizes["solution"])
+        for size in batches)
+    stages["evaluation"] = stage("evaluator", len(batches), evaluation_prompt, num_solutions * sizes["evaluation"],
+                                 min_calls=-(-num_solutions // cfg["evaluation_batch_size"]), max_calls=num_solutions)
+
+    calls = sum(s["calls"] for s in stages.values())
+    prompt_tokens = sum(s["prompt_tokens"] for s in stages.values())
+    completion_tokens = sum(s["completion_tokens"] for s in stages.values())
+    return {
+        "config": cfg,
+        "solutions": num_solutions,
+        "leaf_causes_per_tree": leaves,
+        "calls": calls,
+        "max_calls": calls - len(batches) + num_solutions,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "tokens": prompt_tokens + completion_tokens,
+        "seconds": round(seconds, 1),
+        "p95_seconds": round(max(seconds, p95_seconds), 1),
+        "stages": stages,
+        "latency": {role: dict(info, mean=round(info["mean"], 3), p95=round(info["p95"], 3))
+                    for role, info in latency.items()}
+    }
+
+def budget_error(prediction: Dict[str, Any]) -> Optional[str]:
+    """Return why an estimated analysis exceeds the server budget (None when it fits).
+
+    Calls are checked at their worst case, tokens and time at their expected values.
+    """
+    if ANALYSIS_MAX_LLM_CALLS and prediction["max_calls"] > ANALYSIS_MAX_LLM_CALLS:
+        return f"This analysis could make {prediction['max_calls']} LLM calls; the limit is {ANALYSIS_MAX_LLM_CALLS}"
+    if ANALYSIS_MAX_TOKENS and prediction["tokens"] > ANALYSIS_MAX_TOKENS:
+        return f"This analysis would use about {prediction['tokens']} tokens; the limit is {ANALYSIS_MAX_TOKENS}"
+    if ANALYSIS_MAX_SECONDS and prediction["seconds"] > ANALYSIS_MAX_SECONDS:
+        return f"This analysis would take about {prediction['seconds']:.0f} seconds; the limit is {ANALYSIS_MAX_SECONDS:.0f}"
+    return None
+
+def budget() -> Dict[str, Any]:
+    """The server budget per analysis (0 = unlimited)"""
+    return {"max_llm_calls": ANALYSIS_MAX_LLM_CALLS, "max_tokens": ANALYSIS_MAX_TOKENS,
+            "max_seconds": ANALYSIS_MAX_SECONDS}
+
+def estimate_levels(problem: str = None) -> Dict[str, Dict[str, Any]]:
+    """Estimates for every analysis level"""
+    return {level: estimate(get_analysis_config(level), problem) for level in ANALYSIS_LEVELS}
+
+def describe_duration(seconds: float) -> str:
+    if seconds < 90:
+        return f"about {max(5, round(seconds / 5) * 5)} seconds"
+    minutes = seconds / 60
+    if minutes < 10:
+        return f"about {minutes:.1f}".rstrip("0").rstrip(".") + " minutes"
+    return f"about {round(minutes)} minutes"
+
+def describe_levels() -> Dict[str, str]:
+    """The analysis level descriptions shown in the form, e.g. "Quick analysis generates 4 ideas in about 30 seconds" """
+    latency = current_latency()
+    return dict(_describe_levels(tuple((role, round(info["mean"], 2), round(info["p95"], 2))
+                                       for role, info in latency.items())))
+
+@functools.lru_cache(maxsize=64)
+def _describe_levels(latencies: Tuple[Tuple[str, float, float], ...]) -> Tuple[Tuple[str, str], ...]:
+    latency = {role: {"mean": mean, "p95": p95} for role, mean, p95 in latencies}
+    descriptions = []
+    for level in ANALYSIS_LEVELS:
+        prediction = estimate(get_analysis_config(level), latency=latency)
+        ideas = prediction["solutions"]
+        descriptions.append((level, f"{LEVEL_SUMMARIES.get(level, 'Analysis')} generates {ideas} "
+                                    f"idea{'s' if ideas != 1 else ''} in {describe_duration(prediction['seconds'])}"))
+    return tuple(descriptions)
@@ -1,4 +1,5 @@
-from typing import Dict, Any
+import re
+from typing import Dict, Any, List, Optional
 
 def parse_evaluation(eval_text: str) -> Dict[str, Any]:
     """Parse evaluation results into a structured format"""
@@ -46,69 +47,71 @@ def parse_evaluation(eval_text: str) -> Dict[str, Any]:
     
     return scores
 
+def parse_batch_evaluation(eval_text: str, count: int) -> List[Optional[Dict[str, Any]]]:
+    """Parse a batched evaluation ('EVALUATION 1:', 'EVALUATION 2:', ...) into scores per solution.
+    
+    Entries are None where the block is missing or has no usable scores, so
+    the caller can re-evaluate just those solutions.
+    """
+    results = []
+    for block in split_numbered_blocks(eval_text, "EVALUATION", count):
+        scores = parse_evaluation(block) if block else None
+        if scores and not all(scores[key] for key in ("novelty", "feasibility", "impact", "relevance")):
+            scores = None  # Partial blocks usually mean the response was cut off
+        results.append(scores)
+    return results
+
+# Section headers of the solution format requested by SOLUTION_PROMPT, tolerating
+# markdown decoration (**, #, >) and any capitalisation
+SOLUTION_SECTION_HEADER = re.compile(
+    r"^[ \t>*#]*(SOLUTION TITLE|KEY IDEA APPLICATION|IMPLEMENTATION)[ \t*]*:[ \t*]*",
+    re.IGNORECASE | re.MULTILINE
+)
+SOLUTION_SECTION_FIELDS = {
+    "SOLUTION TITLE": "title",
+    "KEY IDEA APPLICATION": "key_idea_application",
+    "IMPLEMENTATION": "implementation"
+}
+
 def parse_solution_content(content: str) -> Dict[str, str]:
-    """Parse solution content into structured sections including title"""
-    sections = {
-        "title": "",
-        "insight": "",
-        "solution": "",
-        "implementation": "",
-        "other": ""
-    }
+    """Parse solution content into its title, key idea application and implementation in one pass.
     
-    # Normalize line endings and ensure proper handling of the content
-    full_content = content.replace('\r\n', '\n').replace('\r', '\n')
+    Text before the first header goes to "other", the title is the first line
+    after its header, and a repeated header keeps its first occurrence.
+    """
+    sections = {field: "" for field in SOLUTION_SECTION_FIELDS.values()}
+    sections["other"] = ""
     
-    # First check for the solution title
-    if "SOLUTION TITLE:" in full_content:
-        parts = full_content.split("SOLUTION TITLE:", 1)
-        # If there's content before the title, save it as other
-        if parts[0].strip():
-            sections["other"] = parts[0].strip()
-        
-        remaining = parts[1]
-        
-        # Extract title section
-        if "KEY_IDEAICAL INSIGHT:" in remaining:
-            title_parts = remaining.split("KEY_IDEAICAL INSIGHT:", 1)
-            sections["title"] = title_parts[0].strip()
-            remaining = "KEY_IDEAICAL INSIGHT:" + title_parts[1]  # Add the header back for next split
-        else:
-            sections["title"] = remaining.strip()
-            remaining = ""
-    else:
-        # If no title found, continue with the regular parsing
-        remaining = full_content
+    matches = list(SOLUTION_SECTION_HEADER.finditer(content))
+    if not matches:
+        sections["other"] = content.strip()
+        return sections
     
-    # Continue with existing parsing logic
-    if "KEY_IDEAICAL INSIGHT:" in remaining:
-        parts = remaining.split("KEY_IDEAICAL INSIGHT:", 1)
-        # If there's content before the insight and no title was found, it goes to other
-        if parts[0].strip() and not sections["title"] and not sections["other"]:
-            sections["other"] = parts[0].strip()
-        
-        remaining = parts[1]
-        
-        # Extract insight section
-        if "CREATIVE SOLUTION:" in remaining:
-            insight_parts = remaining.split("CREATIVE SOLUTION:", 1)
-            sections["insight"] = insight_parts[0].strip()
-            remaining = insight_parts[1]
-        else:
-            sections["insight"] = remaining.strip()
-            remaining = ""
-        
-        # Extract solution section
-        if "IMPLEMENTATION:" in remaining:
-            solution_parts = remaining.split("IMPLEMENTATION:", 1)
-            sections["solution"] = solution_parts[0].strip()
-            # Everything after IMPLEMENTATION: is the implementation section
-            sections["implementation"] = solution_parts[1].strip()
-        elif remaining:
-            sections["solution"] = remaining.strip()
-    else:
-        # If no section headers found, put everything in other
-        if not sections["other"]:  # Only if other doesn't already have content
-            sections["other"] = remaining.strip()
+    sections["other"] = content[:matches[0].start()].strip()
+    for match, following in zip(matches, matches[1:] + [None]):
+        field = SOLUTION_SECTION_FIELDS[match.group(1).upper()]
+        end = following.start() if following else len(content)
+        if not sections[field]:
+            text = content[match.end():end].strip()
+            sections[field] = text.split("\n", 1)[0].strip() if field == "title" else text
+    return sections
+
+def split_numbered_blocks(text: str, label: str, count: int, strip: bool = True) -> List[Optional[str]]:
+    """Split a batched response into the blocks following 'LABEL 1:', 'LABEL 2:', ...
     
-    return sections
\ No newline at end of file
+    Returns one entry per expected item; items the response skipped are None
+    so callers can fall back for just those. A repeated item keeps its first
+    block, and blocks numbered out of range are ignored. With strip=False a block keeps its leading newline when nothing follows
+    the header on its own line.
+    """
+    header = re.compile(rf"^[ \t>*#]*{re.escape(label)}\s*#?\s*(\d+)\s*[:.)\-]*[ \t*]*", re.IGNORECASE | re.MULTILINE)
+    blocks = [None] * count
+    matches = list(header.finditer(text))
+    for match, following in zip(matches, matches[1:] + [None]):
+        index = int(match.group(1)) - 1
+        end = following.start() if following else len(text)
+        if not 0 <= index < count or blocks[index] is not None:
+            continue
+        block = text[match.end():end]
+        blocks[index] = block.strip() if strip else block.rstrip()
+    return blocks
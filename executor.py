@@ -0,0 +1,128 @@
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable
+from config import MAX_IN_FLIGHT
+
+class DagExecutor:
+    """Run a dependency graph of calls, starting each node as soon as its dependencies finish.
+
+    Each node is a callable that receives the results of its dependencies as
+    positional arguments, in the order the dependencies were declared. Nodes may
+    be added while the graph is running (e.g. one node per cause once the causes
+    are known), so the graph can grow as results arrive. At most
+    ``max_in_flight`` nodes run at the same time; work outside the graph that
+    should count against the same limit runs inside ``with graph.slot():``.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._cond = threading.Condition()
+        self._nodes = {}
+        self._waiting = {}
+        self._dependents = {}
+        self._results = {}
+        self._errors = {}
+        self._ready = []
+        self._outstanding = 0
+        self._pool = None
+
+    def add(self, key: Hashable, fn: Callable[..., Any], deps: Iterable[Hashable] = ()) -> Hashable:
+        """Add a node to the graph; its dependencies must already have been added"""
+        deps = tuple(deps)
+        with self._cond:
+            if key in self._nodes:
+                raise ValueError(f"Duplicate node in analysis graph: {key!r}")
+            missing = [dep for dep in deps if dep not in self._nodes]
+            if missing:
+                raise ValueError(f"Node {key!r} depends on unknown node(s): {missing!r}")
+
+            self._nodes[key] = (fn, deps)
+            self._outstanding += 1
+
+            failed = [dep for dep in deps if dep in self._errors]
+            if failed:
+                # A dependency already failed, so this node can never run
+                self._finish(key, error=self._errors[failed[0]])
+                return key
+
+            pending = {dep for dep in deps if dep not in self._results}
+            if pending:
+                self._waiting[key] = pending
+                for dep in pending:
+                    self._dependents.setdefault(dep, []).append(key)
+            else:
+                self._schedule(key)
+        return key
+
+    def slot(self) -> threading.BoundedSemaphore:
+        """One of the max_in_flight slots, held while a node runs (use as a context manager)"""
+        return self._slots
+
+    def run(self) -> Dict[Hashable, Any]:
+        """Execute the graph and return the result of every node, keyed by node key"""
+        with self._cond:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_in_flight)
+            ready, self._ready = self._ready, []
+            for key in ready:
+                self._schedule(key)
+
+        try:
+            with self._cond:
+                while self._outstanding:
+                    self._cond.wait()
+        finally:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+        if self._errors:
+            # Report the first failure in insertion order
+            first = next(key for key in self._nodes if key in self._errors)
+            raise self._errors[first]
+        return dict(self._results)
+
+    def _schedule(self, key: Hashable):
+        # Caller holds the lock
+        if self._pool is None:
+            self._ready.append(key)
+            return
+        # Run in a copy of the scheduling context so context variables (such as
+        # the analysis trace in metrics.py) follow the work onto pool threads
+        self._pool.submit(contextvars.copy_context().run, self._execute, key)
+
+    def _execute(self, key: Hashable):
+        fn, deps = self._nodes[key]
+        with self._cond:
+            args = [self._results[dep] for dep in deps]
+        try:
+            with self._slots:
+                result = fn(*args)
+        except Exception as e:
+            with self._cond:
+                self._finish(key, error=e)
+        else:
+            with self._cond:
+                self._finish(key, result=result)
+
+    def _finish(self, key: Hashable, result: Any = None, error: Exception = None):
+        # Caller holds the lock
+        if error is not None:
+            self._errors[key] = error
+        else:
+            self._results[key] = result
+
+        for dependent in self._dependents.pop(key, []):
+            if dependent not in self._waiting:
+                continue
+            if error is not None:
+                del self._waiting[dependent]
+                self._finish(dependent, error=error)
+                continue
+            self._waiting[dependent].discard(key)
+            if not self._waiting[dependent]:
+                del self._waiting[dependent]
+                self._schedule(dependent)
+
+        self._outstanding -= 1
+        self._cond.notify_all()
@@ -1,70 +1,131 @@
-import os
+import hmac
 import json
 import time
+from email.utils import parsedate_to_datetime
 from http.server import BaseHTTPRequestHandler
 import urllib.parse
-from config import PROBLEM_STATEMENT
-from report_builder import generate_html_report
-from analysis_levels import get_analysis_config
+from config import PROBLEM_STATEMENT, COMPRESSION_MIN_BYTES, STATIC_MAX_AGE, REPORT_MAX_AGE, METRICS_ENABLED, PROFILE_ADMIN_TOKEN
+from compression import StaticAsset, choose_encoding, compress, iter_compressed
+from report_builder import iter_html_report, render_empty_form_page, css_asset, load_archived_report, cause_tree_to_html, domain_to_html, solution_card_to_html
+from analysis_levels import ANALYSIS_LEVELS, get_analysis_config, analysis_key
+from models import CauseTree, Scores, Solution, dumps
+from jobs import running_analyses, QueueFullError
+from metrics import span, render_prometheus
+from estimator import estimate, estimate_levels, validate_config, budget, budget_error, describe_levels
+
+SSE_KEEPALIVE_SECONDS = 15  # Comment line sent on idle event streams so proxies keep them open
+
+def api_event_lines(job, event, data):
+    """Translate an analysis progress event into the NDJSON lines of the API stream"""
+    if event == "domains":
+        return [{"event": "domain", "index": i, "domain": domain} for i, domain in enumerate(data["domains"])]
+    if event == "tree":
+        tree = CauseTree.from_nested(data["tree"])
+        return [{"event": "cause_node", "tree": data["index"], "node": i, "parent": node.parent,
+                 "depth": node.depth, "cause": node.cause, "pruned": node.pruned}
+                for i, node in enumerate(tree.nodes)]
+    if event == "solution":
+        return [{"event": "solution", "solution": Solution.from_dict(data["solution"])}]
+    if event == "evaluation":
+        solution = data["solution"]
+        return [{"event": "evaluation", "id": solution["id"], "scores": Scores.from_dict(solution["scores"])}]
+    if event == "done":
+        return [{"event": "done", "url": f"/api/analyses/{job.id}"}]
+    return [{"event": event, **data}]
 
 class FormHandler(BaseHTTPRequestHandler):
-    def __init__(self, *args, analyzer=None, **kwargs):
+    # HTTP/1.1 so reports can be sent with chunked transfer encoding; every
+    # response must therefore carry a Content-Length or be chunked
+    protocol_version = 'HTTP/1.1'
+    
+    def __init__(self, *args, analyzer=None, jobs=None, **kwargs):
         self.analyzer = analyzer
+        self.jobs = jobs
         super().__init__(*args, **kwargs)
     
-    def do_GET(self):
-        if self.path == '/style.css':
-            # Serve CSS file
-            css_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")
-            self.send_response(200)
-            self.send_header('Content-type', 'text/css')
-            self.end_headers()
-            with open(css_path, 'rb') as f:
-                self.wfile.write(f.read())
-        elif self.path == '/reset':
-            # Return a clean form without any generated content
-            results = {
-                "problem": PROBLEM_STATEMENT,  # Reset to default problem
-                "domains": [],
-                "cause_trees": [],
-                "solutions": []
-            }
-            
-            # Generate fresh HTML content
-            report_path = generate_html_report(results)
-            
-            # Read the generated HTML and serve it
-            with open(report_path, 'r') as f:
-                html_content = f.read()
-                
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            self.wfile.write(html_content.encode())
-        else:
-            # Serve the main HTML page
-            # Generate report data
-            results = {
-                "problem": PROBLEM_STATEMENT,
-                "domains": [],
-                "cause_trees": [],
-                "solutions": []
-            }
-            
-            # Generate HTML content
-            report_path = generate_html_report(results)
-            
-            # Read the generated HTML file and serve it
-            with open(report_path, 'r') as f:
-                html_content = f.read()
-                
-            # Serve the HTML directly
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            self.wfile.write(html_content.encode())
+    def send_json(self, status, payload, headers=None):
+        """Send a JSON response"""
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
     
-    def do_POST(self):
+    def send_body(self, status, content_type, body, headers=None, variants=None):
+        """Send a complete response body of known length, compressed if the client accepts it.
+        
+        `variants` may hold pre-compressed copies of the body keyed by encoding.
+        """
+        encoding = choose_encoding(self.headers.get('Accept-Encoding')) if len(body) >= COMPRESSION_MIN_BYTES else None
+        if encoding:
+            body = (variants or {}).get(encoding) or compress(body, encoding)
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_asset(self, content_type, asset, cache_control):
+        """Send an unchanging body, or 304 Not Modified when the client already has it"""
+        headers = {'ETag': asset.etag, 'Cache-Control': cache_control}
+        if asset.last_modified:
+            headers['Last-Modified'] = asset.last_modified
+        if not self.is_not_modified(asset):
+            self.send_body(200, content_type, asset.body, headers, asset.variants)
+            return
+        self.send_response(304)
+        self.send_header('Vary', 'Accept-Encoding')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+    
+    def is_not_modified(self, asset):
+        """Check the request's conditional headers against an asset"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            # Weak comparison: the same content matches whatever its encoding
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or asset.etag.removeprefix('W/') in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since and asset.last_modified:
+            try:
+                return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(asset.last_modified)
+            except (TypeError, ValueError):
+                return False
+        return False
+    
+    def send_html_stream(self, chunks):
+        """Send HTML with chunked transfer encoding, writing each chunk as soon as it is rendered"""
+        encoding = choose_encoding(self.headers.get('Accept-Encoding'))
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        body = (chunk.encode() for chunk in chunks)
+        if encoding:
+            body = iter_compressed(body, encoding)
+        for data in body:
+            if data:
+                self.write_chunk(data)
+        self.write_chunk(b"")
+    
+    def write_chunk(self, data):
+        """Write one chunk of a chunked response; an empty chunk ends the response"""
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+    
+    def read_form(self):
+        """Parse the submitted form into (problem, analysis_level, error message or None)"""
         content_length = int(self.headers['Content-Length'])
         post_data = self.rfile.read(content_length).decode('utf-8')
         form_data = urllib.parse.parse_qs(post_data)
@@ -75,11 +136,332 @@ class FormHandler(BaseHTTPRequestHandler):
         # Extract the analysis level
         analysis_level = form_data.get('analysis_level', ['balanced'])[0]
         
+        return new_problem, analysis_level, self.problem_error(new_problem)
+    
+    def profile_requested(self):
+        """True if an admin asked for this request's analysis to be profiled with ?profile=<PROFILE_ADMIN_TOKEN>"""
+        if not PROFILE_ADMIN_TOKEN:
+            return False
+        values = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get('profile', [])
+        return any(hmac.compare_digest(value.encode(), PROFILE_ADMIN_TOKEN.encode()) for value in values)
+    
+    def check_budget(self, problem, config):
+        """The analysis's estimate, and why it would exceed the server budget (or None): (error, estimate)"""
+        prediction = estimate(config, problem)
+        return budget_error(prediction), prediction
+    
+    def problem_error(self, problem):
+        """Why a problem statement cannot be analyzed, or None if it can"""
         # Validate character count
-        if len(new_problem) < 75 or len(new_problem) > 300:
-            self.send_response(400)
-            self.end_headers()
-            self.wfile.write(b'Problem statement must be between 75 and 300 characters.')
+        if len(problem) < 75 or len(problem) > 300:
+            return 'Problem statement must be between 75 and 300 characters.'
+        return None
+    
+    def do_GET(self):
+        if self.path.startswith('/api/'):
+            self.handle_api_get()
+        elif self.path.startswith('/jobs/'):
+            self.handle_job_get()
+        elif urllib.parse.urlsplit(self.path).path == '/style.css':
+            # Serve the in-memory, pre-compressed copy of the CSS file. Pages link
+            # to /style.css?v=<version>, which never changes, so it can be cached for good.
+            if urllib.parse.urlsplit(self.path).query.startswith('v='):
+                cache_control = f'public, max-age={STATIC_MAX_AGE}, immutable'
+            else:
+                cache_control = 'no-cache'
+            self.send_asset('text/css; charset=utf-8', css_asset(), cache_control)
+        elif METRICS_ENABLED and urllib.parse.urlsplit(self.path).path == '/metrics':
+            # Prometheus scrape endpoint
+            self.send_body(200, 'text/plain; version=0.0.4; charset=utf-8', render_prometheus().encode(),
+                           headers={'Cache-Control': 'no-store'})
+        else:
+            # Serve the main HTML page (also used by /reset for a clean form);
+            # it is pre-rendered, so only the timestamp changes
+            self.send_body(200, 'text/html; charset=utf-8', render_empty_form_page(describe_levels()))
+    
+    def handle_job_get(self):
+        """GET /jobs/{id} returns the job status; GET /jobs/{id}/report returns its HTML report"""
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        job = self.jobs.get(parts[1]) if self.jobs and len(parts) >= 2 else None
+        if job is None and parts[-1] == 'report' and len(parts) == 3:
+            # Expired jobs can still be served from the report archive
+            archived = load_archived_report(parts[1])
+            if archived is not None:
+                self.send_asset('text/html; charset=utf-8', StaticAsset(archived), f'private, max-age={REPORT_MAX_AGE}')
+                return
+        if job is None or len(parts) > 3 or (len(parts) == 3 and parts[2] not in ('report', 'events')):
+            self.send_json(404, {"error": "Unknown job"})
+            return
+        
+        if len(parts) == 3 and parts[2] == 'events':
+            self.stream_job_events(job)
+            return
+        
+        if len(parts) == 2:
+            status = job.to_dict()
+            if job.status == "queued":
+                status["queued_ahead"] = self.jobs.queued_ahead(job)
+            self.send_json(200, status)
+            return
+        
+        if job.status != "done":
+            self.send_json(409, {"error": f"Job is {job.status}", "status": job.status})
+            return
+        
+        self.send_asset('text/html; charset=utf-8', job.report(), f'private, max-age={REPORT_MAX_AGE}')
+    
+    def stream_job_events(self, job):
+        """GET /jobs/{id}/events streams the job's progress as server-sent events.
+        
+        Domains, cause trees and solution cards are sent as ready-to-insert HTML
+        so the page can show partial results while the analysis runs. The
+        stream ends with a "done" or "failed" event.
+        """
+        try:
+            sent = int(self.headers.get('Last-Event-ID', 0))
+        except ValueError:
+            sent = 0
+        
+        # The stream has no length, so it ends by closing the connection
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        
+        try:
+            for item in self.follow_job_events(job, sent):
+                if item is None:
+                    self.wfile.write(b': keepalive\n\n')
+                else:
+                    number, event, data = item
+                    payload = json.dumps(self.render_event(event, data))
+                    self.wfile.write(f"id: {number}\nevent: {event}\ndata: {payload}\n\n".encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The browser navigated away; the job itself carries on
+            pass
+    
+    def follow_job_events(self, job, sent=0):
+        """Yield (event number, event, data) as the job publishes progress, until it is done or failed.
+        
+        Yields None after SSE_KEEPALIVE_SECONDS without an event so the caller
+        can keep the connection alive.
+        """
+        while True:
+            events = job.events.since(sent, timeout=SSE_KEEPALIVE_SECONDS)
+            if not events:
+                yield None
+                continue
+            for event, data in events:
+                sent += 1
+                yield sent, event, data
+                if event in ("done", "failed"):
+                    return
+    
+    def render_event(self, event, data):
+        """Turn an analysis progress event into the payload sent to the page"""
+        if event == "domains":
+            return {"domains": data["domains"], "html": ''.join(domain_to_html(d) for d in data["domains"])}
+        if event == "tree":
+            index = data["index"] + 1
+            return {"index": index, "cause": data["tree"]["cause"], "html": cause_tree_to_html(index, data["tree"])}
+        if event in ("solution", "evaluation"):
+            solution = data["solution"]
+            return {"id": solution["id"], "scores": solution["scores"],
+                    "html": solution_card_to_html(solution["id"], solution)}
+        return data
+    
+    def send_api_json(self, status, payload, headers=None):
+        """Send a JSON API response; payloads may contain result model objects"""
+        self.send_body(status, 'application/json', dumps(payload), headers)
+    
+    def handle_api_get(self):
+        """GET /api/analyses/{id} returns an analysis and, once done, its results;
+        GET /api/analyses/{id}/events streams its progress as NDJSON;
+        GET /api/estimates returns the estimated cost of every analysis level"""
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        if parts == ['api', 'estimates']:
+            self.send_api_json(200, {"levels": estimate_levels(), "budget": budget()})
+            return
+        job = self.jobs.get(parts[2]) if self.jobs and len(parts) in (3, 4) and parts[1] == 'analyses' else None
+        if job is None or (len(parts) == 4 and parts[3] != 'events'):
+            self.send_api_json(404, {"error": "Unknown analysis"})
+            return
+        
+        if len(parts) == 4:
+            self.stream_api_events(job)
+            return
+        
+        analysis = job.to_dict()
+        analysis["events_url"] = f"/api/analyses/{job.id}/events"
+        if job.status == "queued":
+            analysis["queued_ahead"] = self.jobs.queued_ahead(job)
+        if job.status == "done":
+            analysis["result"] = job.results
+        self.send_api_json(200, analysis)
+    
+    def read_api_request(self):
+        """The JSON object in the request body, or None once a 400 response has been sent"""
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(content_length) or b'{}')
+        except ValueError:
+            self.send_api_json(400, {"error": "Request body must be JSON"})
+            return None
+        if not isinstance(request, dict):
+            self.send_api_json(400, {"error": "Request body must be a JSON object"})
+            return None
+        return request
+    
+    def api_config(self, request):
+        """The (analysis_level, config overrides, error message or None) of an API request"""
+        analysis_level = request.get('analysis_level', 'balanced')
+        overrides = request.get('config') or {}
+        if analysis_level not in ANALYSIS_LEVELS:
+            return analysis_level, overrides, f"analysis_level must be one of: {', '.join(ANALYSIS_LEVELS)}"
+        return analysis_level, overrides, validate_config(overrides)
+    
+    def handle_api_post(self):
+        """POST /api/analyses queues an analysis from a JSON body.
+        
+        The body is {"problem": ..., "analysis_level": ..., "config": {...}, "stream": false},
+        where the optional "config" overrides the level's knobs (num_domains,
+        num_initial_causes, root_cause_depth, max_leaf_causes, solutions_per_domain).
+        Without "stream" the response is 202 with the analysis URL to poll; with
+        it, the response is the analysis's NDJSON event stream. An analysis whose
+        estimate exceeds the server budget is rejected with 422.
+        """
+        request = self.read_api_request()
+        if request is None:
+            return
+        if not isinstance(request.get('problem'), str):
+            self.send_api_json(400, {"error": "A 'problem' string is required"})
+            return
+        
+        problem = request['problem']
+        analysis_level, overrides, error = self.api_config(request)
+        error = self.problem_error(problem) or error
+        if error:
+            self.send_api_json(400, {"error": error})
+            return
+        config = get_analysis_config(analysis_level)
+        config.update(overrides)
+        error, prediction = self.check_budget(problem, config)
+        if error:
+            self.send_api_json(422, {"error": error, "estimate": prediction, "budget": budget()})
+            return
+        if self.jobs is None:
+            self.send_api_json(503, {"error": "Background analysis is not enabled"})
+            return
+        
+        try:
+            job = self.jobs.submit(problem, analysis_level, profile=self.profile_requested(), overrides=overrides)
+        except QueueFullError as e:
+            self.send_api_json(503, {"error": str(e)}, headers={'Retry-After': '30'})
+            return
+        
+        print(f"Queued API analysis {job.id} ({analysis_level}): {problem}")
+        if request.get('stream'):
+            self.stream_api_events(job)
+            return
+        self.send_api_json(202, {
+            "id": job.id,
+            "status": job.status,
+            "url": f"/api/analyses/{job.id}",
+            "events_url": f"/api/analyses/{job.id}/events"
+        }, headers={'Location': f"/api/analyses/{job.id}"})
+    
+    def handle_estimate_post(self):
+        """POST /api/estimates estimates an analysis without running it.
+        
+        The body is like POST /api/analyses ("problem" is optional and only
+        refines the token counts); the response has the estimate and whether
+        it fits the server budget.
+        """
+        request = self.read_api_request()
+        if request is None:
+            return
+        problem = request.get('problem')
+        analysis_level, overrides, error = self.api_config(request)
+        if error is None and problem is not None and not isinstance(problem, str):
+            error = "'problem' must be a string"
+        if error:
+            self.send_api_json(400, {"error": error})
+            return
+        config = get_analysis_config(analysis_level)
+        config.update(overrides)
+        error, prediction = self.check_budget(problem, config)
+        self.send_api_json(200, {"estimate": prediction, "budget": budget(), "within_budget": error is None, "error": error})
+    
+    def stream_api_events(self, job):
+        """Stream an analysis's progress as newline-delimited JSON, one object per line.
+        
+        Each domain, cause tree node, solution and evaluation is sent as soon as
+        it is produced; the stream ends with a "done" or "failed" line.
+        """
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        
+        try:
+            self.write_chunk(dumps({"event": "queued", "id": job.id, "url": f"/api/analyses/{job.id}"}) + b"\n")
+            for item in self.follow_job_events(job):
+                lines = [{"event": "keepalive"}] if item is None else api_event_lines(job, item[1], item[2])
+                self.write_chunk(b"".join(dumps(line) + b"\n" for line in lines))
+            self.write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; the analysis itself carries on
+            self.close_connection = True
+    
+    def handle_job_post(self):
+        """POST /jobs queues an analysis and immediately returns its job ID"""
+        new_problem, analysis_level, error = self.read_form()
+        if error:
+            self.send_json(400, {"error": error})
+            return
+        error, _ = self.check_budget(new_problem, get_analysis_config(analysis_level))
+        if error:
+            self.send_json(422, {"error": error})
+            return
+        if self.jobs is None:
+            self.send_json(503, {"error": "Background analysis is not enabled"})
+            return
+        
+        try:
+            job = self.jobs.submit(new_problem, analysis_level, profile=self.profile_requested())
+        except QueueFullError as e:
+            self.send_json(503, {"error": str(e)}, headers={'Retry-After': '30'})
+            return
+        
+        print(f"Queued job {job.id} ({analysis_level}): {new_problem}")
+        self.send_json(202, {
+            "id": job.id,
+            "status": job.status,
+            "status_url": f"/jobs/{job.id}",
+            "events_url": f"/jobs/{job.id}/events",
+            "report_url": f"/jobs/{job.id}/report"
+        }, headers={'Location': f"/jobs/{job.id}"})
+    
+    def do_POST(self):
+        if self.path.split('?', 1)[0] == '/api/analyses':
+            self.handle_api_post()
+            return
+        if self.path.split('?', 1)[0] == '/api/estimates':
+            self.handle_estimate_post()
+            return
+        if self.path.split('?', 1)[0] == '/jobs':
+            self.handle_job_post()
+            return
+        
+        new_problem, analysis_level, error = self.read_form()
+        if error is None:
+            error, _ = self.check_budget(new_problem, get_analysis_config(analysis_level))
+        if error:
+            self.send_body(400, 'text/plain; charset=utf-8', error.encode())
             return
         
         print(f"Problem statement: {new_problem}")
@@ -87,14 +469,17 @@ class FormHandler(BaseHTTPRequestHandler):
         
         # Configure analysis parameters based on selected level
         config = get_analysis_config(analysis_level)
+        if self.profile_requested():
+            config['profile'] = True
         
-        # Run the analysis with progress indicators and configuration
-        print("\nAnalyzing problem...\n")
-        results = self.analyzer.analyze_problem(new_problem, config)
-        
-        # Generate HTML report
-        print("\nGenerating HTML report...")
-        report_path = generate_html_report(results)
+        # Run the analysis with progress indicators and configuration; if the same
+        # problem and level are already being analyzed, wait for that run instead
+        key = analysis_key(new_problem, config)
+        if running_analyses.in_flight(key):
+            print("\nIdentical analysis already running, sharing its result...\n")
+        else:
+            print("\nAnalyzing problem...\n")
+        results = running_analyses.do(key, lambda: self.analyzer.analyze_problem(new_problem, config))
         
         # Print a summary to the console
         print("\n=== ANALYSIS COMPLETE ===")
@@ -102,23 +487,21 @@ class FormHandler(BaseHTTPRequestHandler):
         print(f"- Domains: {', '.join(results['domains'])}")
         print(f"- Root causes identified: {len(results['cause_trees'])}")
         print(f"- Solutions generated: {len(results['solutions'])}")
+        if results.get('metrics'):
+            print(f"- Analysis time: {results['metrics']['total_seconds']}s "
+                  f"({len(results['metrics']['calls'])} LLM calls)")
         
-        # Read the generated HTML file and serve it
-        with open(report_path, 'r') as f:
-            html_content = f.read()
-        
-        html_content = html_content.replace('</body>', '''
+        # Hide the processing overlay, if it exists, once the report has loaded
+        hide_overlay = '''
         <script>
         // Hide the processing overlay if it exists
         if (window.hideProcessingOverlay) {
             window.hideProcessingOverlay();
         }
         </script>
-        </body>''')
+        </body>'''
         
-        # Serve the HTML directly
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-        self.wfile.write(html_content.encode())
-    
+        # Stream the report as it is rendered
+        print("\nSending HTML report...")
+        with span("rendering"):  # Rendering is streamed, so this includes sending the report
+            self.send_html_stream(chunk.replace('</body>', hide_overlay) for chunk in iter_html_report(results, descriptions=describe_levels()))
@@ -0,0 +1,194 @@
+import time
+import uuid
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from analysis_levels import get_analysis_config, analysis_key
+from cache import SingleFlight
+from compression import StaticAsset
+from models import AnalysisResult
+from metrics import span
+from estimator import describe_levels
+from report_builder import render_html_report, archive_html_report
+from config import ANALYSIS_WORKERS, MAX_QUEUED_JOBS, JOB_RETENTION_SECONDS, REPORT_ARCHIVE_DIR
+
+# Identical analyses requested at the same time share a single run
+running_analyses = SingleFlight()
+
+class QueueFullError(Exception):
+    """Raised when the job queue already holds MAX_QUEUED_JOBS waiting analyses"""
+
+class EventLog:
+    """Append-only list of (event, data) progress events that readers can wait on"""
+
+    def __init__(self):
+        self._events = []
+        self._changed = threading.Condition()
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        with self._changed:
+            self._events.append((event, data))
+            self._changed.notify_all()
+
+    def since(self, index: int, timeout: float = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Events after the first `index`, waiting up to `timeout` seconds if there are none yet"""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self._events) > index, timeout)
+            return self._events[index:]
+
+class Job:
+    """One queued analysis and, once it has run, its results"""
+
+    def __init__(self, problem: str, analysis_level: str, profile: bool = False, overrides: Dict[str, Any] = None):
+        self.id = uuid.uuid4().hex
+        self.problem = problem
+        self.analysis_level = analysis_level
+        self.config = get_analysis_config(analysis_level)
+        self.config.update(overrides or {})  # Custom knobs on top of the level (see estimator.CONFIG_LIMITS)
+        if profile:
+            # Also keeps a profiled run from sharing an unprofiled one's results
+            self.config["profile"] = True
+        self.status = "queued"  # queued -> running -> done | failed
+        self.results: Optional[AnalysisResult] = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.events = EventLog()  # Progress as the analysis runs, ending with "done" or "failed"
+        self._report = None
+        self._report_lock = threading.Lock()
+
+    def report(self) -> StaticAsset:
+        """The finished job's HTML report, rendered and compressed once (with the estimates as of then)"""
+        with self._report_lock:
+            if self._report is None:
+                with span("rendering"):
+                    html_bytes = render_html_report(self.results.to_dict(), descriptions=describe_levels())
+                    self._report = StaticAsset(html_bytes, self.finished)
+            return self._report
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Status summary suitable for a JSON response"""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "analysis_level": self.analysis_level,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error
+        }
+
+class JobQueue:
+    """Bounded queue of analyses executed by a fixed pool of worker threads.
+
+    submit() returns immediately with a Job the client can poll. At most
+    `workers` analyses run at once and at most `max_queued` wait behind them.
+    Finished jobs are kept for `retention` seconds so their results can be
+    fetched.
+    """
+
+    def __init__(self, analyzer, workers: int = ANALYSIS_WORKERS, max_queued: int = MAX_QUEUED_JOBS,
+                 retention: float = JOB_RETENTION_SECONDS):
+        self.analyzer = analyzer
+        self.retention = retention
+        self._queue = queue.Queue(maxsize=max(1, max_queued))
+        self._jobs = {}
+        self._groups = {}  # analysis_key -> jobs sharing one in-flight run
+        self._lock = threading.Lock()
+        self._workers = [threading.Thread(target=self._work, daemon=True, name=f"analysis-worker-{i}")
+                         for i in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, problem: str, analysis_level: str, profile: bool = False, overrides: Dict[str, Any] = None) -> Job:
+        job = Job(problem, analysis_level, profile, overrides)
+        self._expire_finished()
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFullError("Too many analyses are waiting; please try again shortly.")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queued_ahead(self, job: Job) -> int:
+        """Number of queued jobs submitted before this one"""
+        with self._lock:
+            return sum(1 for other in self._jobs.values() if other.status == "queued" and other.created < job.created)
+
+    def _join_group(self, key: str, job: Job):
+        """Attach a job to the run for `key`, replaying progress that run has already published"""
+        with self._lock:
+            group = self._groups.setdefault(key, [])
+            if group:
+                for event, data in group[0].events.since(0, timeout=0):
+                    if event not in ("done", "failed"):  # Each job reports its own outcome
+                        job.events.publish(event, data)
+            group.append(job)
+
+    def _leave_group(self, key: str, job: Job):
+        with self._lock:
+            group = self._groups.get(key, [])
+            if job in group:
+                group.remove(job)
+            if not group:
+                self._groups.pop(key, None)
+
+    def _publish(self, key: str, event: str, data: Dict[str, Any]):
+        # Every job waiting on the same run sees the same progress
+        with self._lock:
+            for job in self._groups.get(key, []):
+                job.events.publish(event, data)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job.started = time.time()
+            print(f"Job {job.id}: analyzing ({job.analysis_level})...")
+            key = analysis_key(job.problem, job.config)
+            self._join_group(key, job)
+            try:
+                on_event = lambda event, data: self._publish(key, event, data)
+                results = running_analyses.do(key, lambda: self.analyzer.analyze_problem(job.problem, job.config,
+                                                                                         on_event=on_event))
+                # Finished jobs are retained, so keep their results in the compact model
+                job.results = AnalysisResult.from_dict(results)
+                # Set before anything can see the job as done (the report's Last-Modified comes from it)
+                job.finished = time.time()
+                self._archive(job)
+                job.status = "done"
+                job.events.publish("done", {"report_url": f"/jobs/{job.id}/report"})
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                job.error = str(e)
+                job.finished = time.time()
+                job.status = "failed"
+                job.events.publish("failed", {"error": job.error})
+            finally:
+                self._leave_group(key, job)
+                self._queue.task_done()
+
+    def _archive(self, job: Job):
+        if not REPORT_ARCHIVE_DIR:
+            return
+        # A report that cannot be archived is still served from memory
+        try:
+            archive_html_report(job.id, render_html_report(job.results.to_dict(), embed_css=True,
+                                                           descriptions=describe_levels()))
+        except OSError as e:
+            print(f"Error archiving report for job {job.id}: {e}")
+    
+    def _expire_finished(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
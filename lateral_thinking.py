@@ -1,228 +1,540 @@
-from typing import List, Dict, Any
-from langchain_openai import OpenAI as LangchainOpenAI
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from langchain.prompts import PromptTemplate
-import os
 import time
+import asyncio
+import functools
+import itertools
+import re
 import html
+import weakref
+import threading
 from datetime import datetime
 import numpy as np
-from evaluation import parse_evaluation, parse_solution_content
+from evaluation import parse_evaluation, parse_batch_evaluation, parse_solution_content, split_numbered_blocks
+from executor import DagExecutor
+from cache import Memo, TTLCache, ResponseCache
+from pipeline import EvaluationPipeline, AsyncEvaluationPipeline
+from llm_backends import create_llm
+from metrics import span, traced, record_llm_call, record_retry, record_cache_lookup, record_evaluation_batch
+from rate_limiter import get_rate_limiter, estimate_tokens, should_retry, retry_after_seconds
 from config import (
-    OPENAI_API_KEY, 
     NUM_DOMAINS, 
     NUM_INITIAL_CAUSES, 
     ROOT_CAUSE_DEPTH, 
     MAX_LEAF_CAUSES,
     SOLUTIONS_PER_DOMAIN,
-    API_REQUEST_TIMEOUT,
-    API_CALL_DELAY,
+    MAX_IN_FLIGHT,
+    KEY_IDEA_CACHE_TTL,
+    BATCH_WHY_EXPANSION,
+    WHY_BATCH_SIZE,
+    EVALUATION_BATCH_SIZE,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_POLICY,
     ANALYST_TEMPERATURE,
     CHALLENGER_TEMPERATURE,
     EVALUATOR_TEMPERATURE,
-    DOMAIN_TEMPERATURE
+    DOMAIN_TEMPERATURE,
+    LLM_BACKEND
 )
 
+# Prompt templates shared by the synchronous and asynchronous pipelines
+DOMAIN_PROMPT = PromptTemplate(
+    input_variables=["num_domains"],
+    template="""Generate {num_domains} specific knowledge domains or fields.
+    
+    These should be diverse across different areas of human knowledge.
+    DO NOT INCLUDE 'Quantum physics' or 'Astrophysics' or 'Enviromental science'.
+    Format each as a concise domain name (1-4 words) with NO numbering or bullets.
+    """
+)
+
+CAUSE_PROMPT = PromptTemplate(
+    input_variables=["problem", "num_causes"],
+    template="""For the problem: '{problem}'
+
+    Identify EXACTLY {num_causes} potential root cause(s) that might be contributing to the problem.
+    Do NOT provide more than {num_causes} cause(s).
+    Format the cause as a clear, concise statement without numbering.
+    """
+)
+
+WHY_PROMPT = PromptTemplate(
+    input_variables=["problem", "cause"],
+    template="""For the problem: '{problem}'
+    Given the potential cause: '{cause}'
+    Ask why this cause exists. Identify 2 deeper underlying causes that might explain why '{cause}' is happening.
+    """
+)
+
+BATCH_WHY_PROMPT = PromptTemplate(
+    input_variables=["problem", "causes"],
+    template="""For the problem: '{problem}'
+    For EACH numbered potential cause below, ask why this cause exists. Identify 2 deeper underlying causes that might explain why it is happening.
+    
+    {causes}
+    
+    ONLY Format your response as follows, with one block for every cause number and each deeper cause on its own line with NO numbering or bullets:
+    CAUSE 1:
+    [first deeper cause]
+    [second deeper cause]
+    CAUSE 2:
+    [first deeper cause]
+    [second deeper cause]
+    """
+)
+
+KEY_IDEA_PROMPT = PromptTemplate(
+    input_variables=["domain"],
+    template="""Within the field of '{domain}', name one pivotal concept or theory that has strongly influenced subsequent work. Give its title, the scholar(s) most associated with it, and explain—in no more than three sentences—why it is considered foundational.
+    
+    Choose something non-obvious that could provide a fresh perspective on other problems.
+    Explain the key dynamics, patterns, or principles that make this key_idea interesting.
+
+    Consider the concept key idea, originally formulated within '{domain}'.
+
+    Abstract it: Distil the idea to its essential mechanism or principle, stripping away domain-specific terminology.
+
+    Translate it: Restate the abstraction so it can guide the design, governance, or analysis of a social system (e.g., a community network, public service, or organisational culture). 
+
+    For example, if the key_idea is 'The Butterfly Effect' from Chaos Theory, the abstraction might be 'Small changes can lead to large consequences', and the translation could be 'A small change in a community's communication structure can lead to significant shifts in social dynamics'.
+    
+
+    ONLY Format as:
+    KEY_IDEA: [The key idea title and description from {domain} as one string]
+    ABSTRACTION: [How this key idea can be abstracted to a more general level to apply to other domains]
+    TRANSLATION: [How this key idea can be translated to apply to a social system]
+    """
+)
+
+SOLUTION_PROMPT = PromptTemplate(
+    input_variables=["problem", "cause", "key_idea", "solution_num"],
+    template="""For the problem: '{problem}'
+    Addressing this root cause: '{cause}'
+    
+    Consider this key idea:
+    {key_idea}
+    
+    For solution #{solution_num}, create an innovative solution using lateral thinking to apply this key idea to the root cause of the problem.
+
+    The solution should be a new product, service, or public policy idea that is inspired by the key idea. 
+    Be imaginative and bold.
+    The solution should be practical and feasible.
+    Include a description of the role of public and private actors in the social system.
+    Describe how the solution would work in practice, including any necessary steps or processes.
+    
+    
+    ONLY Format your response as:
+    SOLUTION TITLE: [A concise, marketable title for your solution - max 5 words]
+    KEY IDEA APPLICATION: [How the APPLICATION reveals a new perspective on the root cause]
+    IMPLEMENTATION: [A practical public policy idea, a new product, or a service that could be implemented. ONLY write in short paragraphs. DO NOT add additional titles in the response.]
+    """
+)
+
+EVALUATION_PROMPT = PromptTemplate(
+    input_variables=["problem", "root_cause", "solution_content"],
+    template="""For the problem: '{problem}'
+    And root cause: '{root_cause}'
+    Evaluate this solution:
+    
+    {solution_content}
+    
+    Score the solution on a scale of 1-10 for:
+    1. Novelty - how innovative and unique
+    2. Feasibility - how practical to implement
+    3. Impact - potential effectiveness
+    4. Relevance - how well it addresses the root cause
+    
+    Format your response as:
+    NOVELTY: [score]
+    FEASIBILITY: [score]
+    IMPACT: [score]
+    RELEVANCE: [score]
+    OVERALL: [average score]
+    """
+)
+
+WHY_BRANCHING = 2  # Deeper causes requested by WHY_PROMPT for each cause
+WHY_TOKENS_PER_CAUSE = 120  # Completion allowance per cause in a batched "why" call
+EVALUATION_TOKENS_PER_SOLUTION = 60  # Completion allowance per solution in a batched evaluation
+
+BATCH_EVALUATION_PROMPT = PromptTemplate(
+    input_variables=["problem", "solutions"],
+    template="""For the problem: '{problem}'
+    Evaluate each of the numbered solutions below. Each one states the root cause it addresses.
+    
+    {solutions}
+    
+    Score EACH solution on a scale of 1-10 for:
+    1. Novelty - how innovative and unique
+    2. Feasibility - how practical to implement
+    3. Impact - potential effectiveness
+    4. Relevance - how well it addresses the root cause
+    
+    Format your response as follows, with one block for every solution number:
+    EVALUATION 1:
+    NOVELTY: [score]
+    FEASIBILITY: [score]
+    IMPACT: [score]
+    RELEVANCE: [score]
+    OVERALL: [average score]
+    EVALUATION 2:
+    ...
+    """
+)
+
+FALLBACK_DOMAINS = ["Biology", "Magical Realism", "Game Theory", "Neuroscience", "Mycology"]
+FALLBACK_CAUSES = ["Market prioritizes profit over social needs", "Regulatory barriers"]
+
+# Key ideas shared across analyses when KEY_IDEA_CACHE_TTL is set
+_shared_key_ideas = TTLCache(KEY_IDEA_CACHE_TTL) if KEY_IDEA_CACHE_TTL > 0 else None
+
+def split_lines(text: str) -> List[str]:
+    """Split an LLM response into its non-empty, stripped lines"""
+    return [line.strip() for line in text.strip().split('\n') if line.strip()]
+
+def format_numbered_causes(causes: List[str]) -> str:
+    """Render causes as the numbered list used by BATCH_WHY_PROMPT.
+    
+    They are numbered "[1]" rather than like the "CAUSE 1:" answer headers,
+    so a model is less tempted to echo the cause on its header line.
+    """
+    return "\n".join(f"[{i}] {cause}" for i, cause in enumerate(causes, 1))
+
+def parse_batched_why(text: str, count: int) -> List[Optional[List[str]]]:
+    """Parse a BATCH_WHY_PROMPT response into sub-causes per cause (None where malformed).
+    
+    Text on a "CAUSE n:" header line is not a sub-cause: the format puts each
+    deeper cause on its own line, and models that write something there are
+    echoing the cause being answered.
+    """
+    parsed = []
+    for block in split_numbered_blocks(text, "CAUSE", count, strip=False):
+        lines = (block or "").split("\n", 1)
+        lines = split_lines(lines[1] if len(lines) > 1 else "")
+        # Models sometimes add bullets despite the instructions
+        sub_causes = [re.sub(r"^(?:[-*\u2022]|\d+[.)])\s*", "", line) for line in lines]
+        sub_causes = [sub_cause for sub_cause in sub_causes if sub_cause]
+        parsed.append(sub_causes[:WHY_BRANCHING] if sub_causes else None)
+    return parsed
+
+def format_numbered_solutions(solutions: List[Dict[str, Any]]) -> str:
+    """Render solutions as the numbered list used by BATCH_EVALUATION_PROMPT"""
+    return "\n\n".join(
+        f"SOLUTION {i}:\nRoot cause: {solution['root_cause']}\n{solution['content'].strip()}"
+        for i, solution in enumerate(solutions, 1)
+    )
+
+def notify(on_event: Optional[Callable[[str, Dict[str, Any]], Any]], event: str, data: Dict[str, Any]):
+    """Report analysis progress to an optional listener without letting it break the analysis"""
+    if on_event is None:
+        return
+    try:
+        on_event(event, data)
+    except Exception as e:
+        print(f"Error publishing {event} event: {e}")
+
+def make_cause_node(cause: str) -> Dict[str, Any]:
+    """Build an unexpanded cause tree node"""
+    return {"cause": cause, "children": []}
+
+def select_for_expansion(frontier: List[Tuple[Dict[str, Any], int]], budget: int = None) -> List[Tuple[Dict[str, Any], int]]:
+    """Pick the frontier nodes worth asking 'why' about next.
+    
+    The frontier holds a tree's undecided nodes left to right, each with the
+    number of levels still allowed below it. Leaves are consumed left to right,
+    and a node with r levels below it yields at most WHY_BRANCHING ** r leaves,
+    so only the unexpanded nodes in the shortest prefix of the frontier that can
+    fill the leaf budget are picked. Nothing is pruned here: when an answer has
+    fewer causes than that, the next call reaches further along the frontier.
+    """
+    if budget is None:
+        return [entry for entry in frontier if entry[1] > 0]
+    selected, capacity = [], 0
+    for entry in frontier:
+        if capacity >= budget:
+            break
+        capacity += WHY_BRANCHING ** entry[1]
+        if entry[1] > 0:
+            selected.append(entry)
+    return selected
+
+def advance_frontier(frontier: List[Tuple[Dict[str, Any], int]],
+                     expanded: List[Tuple[Dict[str, Any], int]]) -> List[Tuple[Dict[str, Any], int]]:
+    """Replace the expanded nodes with their children; one that got no children is a leaf now"""
+    expanded_ids = {id(node) for node, _ in expanded}
+    advanced = []
+    for node, remaining_depth in frontier:
+        if id(node) not in expanded_ids:
+            advanced.append((node, remaining_depth))
+        elif node["children"]:
+            advanced.extend((child, remaining_depth - 1) for child in node["children"])
+        else:
+            advanced.append((node, 0))
+    return advanced
+
+def prune_frontier(frontier: List[Tuple[Dict[str, Any], int]], budget: int = None):
+    """Once nothing is left to expand, mark every node past the first `budget` leaves pruned"""
+    if budget is None:
+        return
+    for node, _ in frontier[max(budget, 0):]:
+        node["pruned"] = True
+
+def extract_leaf_causes(cause_tree: Dict[str, Any], max_leaf_causes: int = MAX_LEAF_CAUSES) -> List[str]:
+    """Return the deepest causes of a tree, left to right, limited to max_leaf_causes"""
+    def extract_leaf_nodes(node):
+        if node.get("pruned"):
+            return []  # Not expanded because its leaves would never be used
+        if not node["children"]:
+            return [node["cause"]]
+        leaves = []
+        for child in node["children"]:
+            leaves.extend(extract_leaf_nodes(child))
+        return leaves
+    
+    leaf_causes = extract_leaf_nodes(cause_tree)
+    # Limit to max leaf causes
+    return leaf_causes[:max_leaf_causes]
+
+def make_solution(leaf_cause: str, domain: str, solution_num: int, key_idea: str, content: str) -> Dict[str, Any]:
+    """Build the solution record shared by every generation path.
+    
+    The content is parsed into its sections here, once, so the report and
+    any exporters can use the fields directly.
+    """
+    sections = parse_solution_content(content)
+    return {
+        "root_cause": leaf_cause,
+        "type": "domain_inspired",
+        "domain": domain,
+        "solution_number": solution_num,
+        "key_idea": key_idea,
+        "content": content,
+        "title": sections["title"],
+        "key_idea_application": sections["key_idea_application"],
+        "implementation": sections["implementation"],
+        "scores": {"overall": 5.0}  # Default score, will be replaced
+    }
+
+def rank_solutions(solutions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sort solutions by overall score, best first"""
+    return sorted(solutions, key=lambda x: x["scores"].get("overall", 0), reverse=True)
+
 class LateralThinkingEnhanced:
-    def __init__(self):
-        # Validate API key
-        if not OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY not found in environment variables")
-            
-        # Set the OpenAI API key
-        os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
-        
-        # Initialize different language models with timeouts
-        self.analyst_llm = LangchainOpenAI(
-            temperature=ANALYST_TEMPERATURE,
-            request_timeout=API_REQUEST_TIMEOUT,
-            openai_api_key=os.environ.get("OPENAI_API_KEY")
-        )
-        self.challenger_llm = LangchainOpenAI(
-            temperature=CHALLENGER_TEMPERATURE,
-            request_timeout=API_REQUEST_TIMEOUT,
-            openai_api_key=os.environ.get("OPENAI_API_KEY")
-        )
-        self.evaluator_llm = LangchainOpenAI(
-            temperature=EVALUATOR_TEMPERATURE,
-            request_timeout=API_REQUEST_TIMEOUT,
-            openai_api_key=os.environ.get("OPENAI_API_KEY")
-        )
-        self.domain_llm = LangchainOpenAI(
-            temperature=DOMAIN_TEMPERATURE,
-            request_timeout=API_REQUEST_TIMEOUT,
-            openai_api_key=os.environ.get("OPENAI_API_KEY")
-        )
+    def __init__(self, backend: str = LLM_BACKEND):
+        # Initialize a language model for each role on the configured backend
+        # (OpenAI by default, which needs OPENAI_API_KEY; see llm_backends.py)
+        self.analyst_llm = create_llm("analyst", ANALYST_TEMPERATURE, backend)
+        self.challenger_llm = create_llm("challenger", CHALLENGER_TEMPERATURE, backend)
+        self.evaluator_llm = create_llm("evaluator", EVALUATOR_TEMPERATURE, backend)
+        self.domain_llm = create_llm("domain", DOMAIN_TEMPERATURE, backend)
+        
+        # Shared with every analyzer in the process, since they spend the same
+        # provider quota; an analyzer on a simulated backend can swap in its own
+        self.rate_limiters = {role: get_rate_limiter(role) for role in ("analyst", "challenger", "evaluator", "domain")}
+        
+        # One semaphore per event loop running async analyses, created lazily
+        # (loops in different threads may look theirs up at the same time)
+        self._slots = weakref.WeakKeyDictionary()
+        self._slots_lock = threading.Lock()
+        
+        self.response_cache = ResponseCache(RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_BYTES) if RESPONSE_CACHE_ENABLED else None
+    
+    def _cache_key(self, role: str, llm, prompt_text: str, max_tokens: int = None) -> Optional[str]:
+        """Key for the persistent response cache, or None if this role bypasses it"""
+        if self.response_cache is None or not RESPONSE_CACHE_POLICY.get(role, {}).get("enabled"):
+            return None
+        return ResponseCache.make_key(role, getattr(llm, "model_name", ""), getattr(llm, "temperature", None),
+                                      prompt_text, max_tokens)
+    
+    def _invoke(self, role: str, prompt: PromptTemplate, inputs: Dict[str, Any], max_tokens: int = None) -> str:
+        """Run one prompt against the LLM for a role, respecting the shared rate limits"""
+        llm = getattr(self, f"{role}_llm")
+        prompt_text = prompt.format(**inputs)
+        llm_kwargs = {"max_tokens": max_tokens} if max_tokens else {}
+        
+        cache_key = self._cache_key(role, llm, prompt_text, max_tokens)
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            record_cache_lookup(role, cached is not None)
+            if cached is not None:
+                return cached
+        
+        limiter = self.rate_limiters[role]
+        attempt = 0
+        while True:
+            # Only waits when the role's request or token budget is nearly spent
+            limiter.acquire(estimate_tokens(prompt_text, max_tokens or 256))
+            started = time.monotonic()
+            try:
+                response = llm.invoke(prompt_text, **llm_kwargs)
+            except Exception as e:
+                record_llm_call(role, started, prompt_text, error=e)
+                if not should_retry(e, attempt):
+                    raise
+                record_retry(role)
+                delay = limiter.backoff(attempt, retry_after_seconds(e))
+                print(f"Rate limited on {role} LLM, backing off for {delay:.1f}s...")
+                attempt += 1
+                continue
+            record_llm_call(role, started, prompt_text, response)
+            if cache_key:
+                self.response_cache.put(cache_key, role, response, RESPONSE_CACHE_POLICY[role]["ttl"])
+            return response
     
     def generate_random_domains(self, num_domains: int = NUM_DOMAINS) -> List[str]:
         """Generate random knowledge domains for cross-pollination of ideas"""
         
-        domain_prompt = PromptTemplate(
-            input_variables=[],
-            template=f"""Generate {num_domains} specific knowledge domains or fields.
-            
-            These should be diverse across different areas of human knowledge.
-            DO NOT INCLUDE 'Quantum physics' or 'Astrophysics' or 'Enviromental science'.
-            Format each as a concise domain name (1-4 words) with NO numbering or bullets.
-            """
-        )
-        
-        # Use pipe operator instead of LLMChain
-        domains_chain = domain_prompt | self.domain_llm
         try:
-            domains_result = domains_chain.invoke({})
-            domains = [domain.strip() for domain in domains_result.strip().split('\n') if domain.strip()]
-            return domains[:num_domains]
+            domains_result = self._invoke("domain", DOMAIN_PROMPT, {"num_domains": num_domains})
+            return split_lines(domains_result)[:num_domains]
         except Exception as e:
             print(f"Error generating domains: {e}")
-            return ["Biology", "Magical Realism", "Game Theory", "Neuroscience", "Mycology"]  # Fallback domains
+            return list(FALLBACK_DOMAINS)  # Fallback domains
     
     def identify_initial_causes(self, problem: str, num_causes: int = NUM_INITIAL_CAUSES) -> List[str]:
         """Identify the initial set of potential root causes for the problem"""
         
-        cause_prompt = PromptTemplate(
-            input_variables=["problem", "num_causes"],
-            template="""For the problem: '{problem}'
-
-            Identify EXACTLY {num_causes} potential root cause(s) that might be contributing to the problem.
-            Do NOT provide more than {num_causes} cause(s).
-            Format the cause as a clear, concise statement without numbering.
-            """
-        )
-        
-        # Use pipe operator
-        cause_chain = cause_prompt | self.analyst_llm
         try:
-            causes_result = cause_chain.invoke({"problem": problem, "num_causes": num_causes})
-            causes = [cause.strip() for cause in causes_result.strip().split('\n') if cause.strip()]
-            # Add this right before returning causes:
-            if len(causes) > num_causes:
-                causes = causes[:num_causes]  # Take only the first num_causes items
-            return causes
+            causes_result = self._invoke("analyst", CAUSE_PROMPT, {"problem": problem, "num_causes": num_causes})
+            return split_lines(causes_result)[:num_causes]  # Take only the first num_causes items
         except Exception as e:
             print(f"Error identifying causes: {e}")
-            return ["Market prioritizes profit over social needs", "Regulatory barriers"]
+            return list(FALLBACK_CAUSES)
     
-    def dig_deeper(self, problem: str, cause: str, depth: int = ROOT_CAUSE_DEPTH) -> Dict[str, Any]:
-        """Recursively ask 'why' to dig deeper into root causes"""
+    def ask_why(self, problem: str, cause: str) -> List[str]:
+        """Ask why a cause exists, returning up to two deeper causes ([] on error)"""
+        try:
+            sub_causes_result = self._invoke("analyst", WHY_PROMPT, {"problem": problem, "cause": cause})
+            return split_lines(sub_causes_result)[:WHY_BRANCHING]  # Limit to 2 sub-causes to reduce API calls
+        except Exception as e:
+            print(f"Error in dig_deeper for cause '{cause}': {e}")
+            return []
+    
+    def dig_deeper(self, problem: str, cause: str, depth: int = ROOT_CAUSE_DEPTH,
+                   max_leaf_causes: int = None) -> Dict[str, Any]:
+        """Ask 'why' level by level to dig deeper into root causes.
         
-        if depth <= 0:
-            return {"cause": cause, "children": []}
+        When max_leaf_causes is given, only nodes whose descendants can be among
+        the first max_leaf_causes leaves are expanded; the rest are kept in the
+        tree marked "pruned" instead of paying for "why" calls nobody reads.
+        The leaves are the same as expanding every node and keeping the first
+        max_leaf_causes, even when some answers have fewer causes than asked for.
+        """
+        root = make_cause_node(cause)
+        frontier = [(root, depth)]
         
-        why_prompt = PromptTemplate(
-            input_variables=["problem", "cause"],
-            template="""For the problem: '{problem}'
-            Given the potential cause: '{cause}'
-            Ask why this cause exists. Identify 2 deeper underlying causes that might explain why '{cause}' is happening.
-            """
-        )
+        while True:
+            to_expand = select_for_expansion(frontier, max_leaf_causes)
+            if not to_expand:
+                break
+            for node, _ in to_expand:
+                node["children"] = [make_cause_node(sub_cause) for sub_cause in self.ask_why(problem, node["cause"])]
+            frontier = advance_frontier(frontier, to_expand)
         
-        # Use pipe operator
-        why_chain = why_prompt | self.analyst_llm
+        prune_frontier(frontier, max_leaf_causes)
+        return root
+    
+    def ask_why_batch(self, problem: str, causes: List[str]) -> List[List[str]]:
+        """Ask 'why' for many causes with one call per WHY_BATCH_SIZE causes.
         
-        try:
-            sub_causes_result = why_chain.invoke({"problem": problem, "cause": cause})
-            sub_causes = [sc.strip() for sc in sub_causes_result.strip().split('\n') if sc.strip()]
-            sub_causes = sub_causes[:2]  # Limit to 2 sub-causes to reduce API calls
-            
-            # Add delay to avoid rate limiting
-            time.sleep(API_CALL_DELAY)
-            
-            # Build the tree recursively with reduced complexity
-            children = []
-            for sub_cause in sub_causes:
-                child_tree = self.dig_deeper(problem, sub_cause, depth - 1)
-                children.append(child_tree)
-            
-            return {"cause": cause, "children": children}
-        except Exception as e:
-            print(f"Error in dig_deeper for cause '{cause}': {e}")
-            return {"cause": cause, "children": []}
+        Any cause the batched response leaves out or garbles falls back to its
+        own ask_why call.
+        """
+        sub_causes = [None] * len(causes)
+        for start in range(0, len(causes), WHY_BATCH_SIZE):
+            chunk = causes[start:start + WHY_BATCH_SIZE]
+            if len(chunk) == 1:
+                continue  # Nothing to batch; the fallback below asks directly
+            try:
+                response = self._invoke("analyst", BATCH_WHY_PROMPT, {
+                    "problem": problem,
+                    "causes": format_numbered_causes(chunk)
+                }, max_tokens=WHY_TOKENS_PER_CAUSE * len(chunk))
+                sub_causes[start:start + len(chunk)] = parse_batched_why(response, len(chunk))
+            except Exception as e:
+                print(f"Error in batched dig_deeper for {len(chunk)} causes: {e}")
+        
+        for i, cause in enumerate(causes):
+            if sub_causes[i] is None:
+                sub_causes[i] = self.ask_why(problem, cause)
+        return sub_causes
+    
+    def dig_deeper_forest(self, problem: str, causes: List[str], depth: int = ROOT_CAUSE_DEPTH,
+                          max_leaf_causes: int = None) -> List[Dict[str, Any]]:
+        """Build the cause trees for several root causes together, one batched 'why' call per level.
+        
+        Equivalent to calling dig_deeper for each cause (including the leaf
+        budget applied to each tree), but the round trips grow with the depth
+        rather than with the number of nodes (plus one per level where a short
+        answer means further nodes must be asked).
+        """
+        roots = [make_cause_node(cause) for cause in causes]
+        frontiers = [[(root, depth)] for root in roots]
+        
+        while True:
+            to_expand = [select_for_expansion(frontier, max_leaf_causes) for frontier in frontiers]
+            level = [node for entries in to_expand for node, _ in entries]
+            if not level:
+                break
+            for node, sub_causes in zip(level, self.ask_why_batch(problem, [node["cause"] for node in level])):
+                node["children"] = [make_cause_node(sub_cause) for sub_cause in sub_causes]
+            frontiers = [advance_frontier(frontier, entries) for frontier, entries in zip(frontiers, to_expand)]
+        
+        for frontier in frontiers:
+            prune_frontier(frontier, max_leaf_causes)
+        return roots
+    
+    def generate_key_idea(self, domain: str, key_ideas: Memo = None) -> str:
+        """Generate the key idea for a domain, at most once per analysis.
+        
+        The KEY_IDEA prompt depends only on the domain, so its response is shared
+        by every leaf cause and solution number. Pass the same `key_ideas` memo
+        for a whole analysis; concurrent callers for one domain wait for a single
+        call. With KEY_IDEA_CACHE_TTL set, key ideas are also reused across analyses.
+        """
+        def compute():
+            if _shared_key_ideas is not None:
+                cached = _shared_key_ideas.get(domain.casefold())
+                if cached is not None:
+                    return cached
+            key_idea = self._invoke("challenger", KEY_IDEA_PROMPT, {"domain": domain})
+            if _shared_key_ideas is not None:
+                _shared_key_ideas.set(domain.casefold(), key_idea)
+            return key_idea
+        
+        if key_ideas is None:
+            return compute()
+        return key_ideas.get_or_compute(domain, compute)
     
     def challenge_assumptions(self, problem: str, cause_tree: Dict[str, Any], domains: List[str], 
-                              max_leaf_causes=MAX_LEAF_CAUSES, solutions_per_domain=SOLUTIONS_PER_DOMAIN) -> List[Dict[str, Any]]:
-        """Generate solutions using Random Word Stimulation, a creative thinking tool where a random word or image is used to spark new ideas and perspectives"""
-        
-        # Extract leaf nodes (deepest causes)
-        def extract_leaf_nodes(node):
-            if not node["children"]:
-                return [node["cause"]]
-            leaves = []
-            for child in node["children"]:
-                leaves.extend(extract_leaf_nodes(child))
-            return leaves
-        
-        leaf_causes = extract_leaf_nodes(cause_tree)
-        # Limit to max leaf causes
-        if len(leaf_causes) > max_leaf_causes:
-            leaf_causes = leaf_causes[:max_leaf_causes]
+                              max_leaf_causes=MAX_LEAF_CAUSES, solutions_per_domain=SOLUTIONS_PER_DOMAIN,
+                              key_ideas: Memo = None, on_solution: Callable[[Dict[str, Any]], Any] = None) -> List[Dict[str, Any]]:
+        """Generate solutions using Random Word Stimulation, a creative thinking tool where a random word or image is used to spark new ideas and perspectives
+        
+        If on_solution is given it is called with each solution the moment it
+        is generated, e.g. to start evaluating it straight away.
+        """
         
+        leaf_causes = extract_leaf_causes(cause_tree, max_leaf_causes)
         solutions = []
         
+        # Share key ideas between leaf causes (and with other trees if a memo is passed in)
+        if key_ideas is None:
+            key_ideas = Memo()
+        
         for leaf_cause in leaf_causes:
             # Use ALL domains instead of just the first one
             for domain in domains:
                 # Generate multiple solutions per domain-cause pair
                 for solution_num in range(1, solutions_per_domain + 1):
-                    # STEP 1: Generate a powerful key_idea from the domain
-                    key_idea_prompt = PromptTemplate(
-                        input_variables=["domain"],
-                        template="""Within the field of '{domain}', name one pivotal concept or theory that has strongly influenced subsequent work. Give its title, the scholar(s) most associated with it, and explain—in no more than three sentences—why it is considered foundational.
-                        
-                        Choose something non-obvious that could provide a fresh perspective on other problems.
-                        Explain the key dynamics, patterns, or principles that make this key_idea interesting.
-
-                        Consider the concept key idea, originally formulated within '{domain}'.
-
-                        Abstract it: Distil the idea to its essential mechanism or principle, stripping away domain-specific terminology.
-
-                        Translate it: Restate the abstraction so it can guide the design, governance, or analysis of a social system (e.g., a community network, public service, or organisational culture). 
-
-                        For example, if the key_idea is 'The Butterfly Effect' from Chaos Theory, the abstraction might be 'Small changes can lead to large consequences', and the translation could be 'A small change in a community's communication structure can lead to significant shifts in social dynamics'.
-                        
-
-                        ONLY Format as:
-                        KEY_IDEA: [The key idea title and description from {domain} as one string]
-                        ABSTRACTION: [How this key idea can be abstracted to a more general level to apply to other domains]
-                        TRANSLATION: [How this key idea can be translated to apply to a social system]
-                        """
-                    )
-                    
                     try:
-                        # Generate the key_idea first
-                        key_idea_chain = key_idea_prompt | self.challenger_llm
-                        key_idea_response = key_idea_chain.invoke({"domain": domain})
-                        
-                        # Add delay to avoid rate limiting
-                        time.sleep(API_CALL_DELAY)
+                        # STEP 1: Generate a powerful key_idea from the domain (once per domain)
+                        key_idea_response = self.generate_key_idea(domain, key_ideas)
                         
                         # STEP 2: Apply the key_idea to generate a creative solution
-                        solution_prompt = PromptTemplate(
-                            input_variables=["problem", "cause", "key_idea", "solution_num"],
-                            template="""For the problem: '{problem}'
-                            Addressing this root cause: '{cause}'
-                            
-                            Consider this key idea:
-                            {key_idea}
-                            
-                            For solution #{solution_num}, create an innovative solution using lateral thinking to apply this key idea to the root cause of the problem.
-            
-                            The solution should be a new product, service, or public policy idea that is inspired by the key idea. 
-                            Be imaginative and bold.
-                            The solution should be practical and feasible.
-                            Include a description of the role of public and private actors in the social system.
-                            Describe how the solution would work in practice, including any necessary steps or processes.
-                            
-                            
-                            ONLY Format your response as:
-                            SOLUTION TITLE: [A concise, marketable title for your solution - max 5 words]
-                            KEY IDEA APPLICATION: [How the APPLICATION reveals a new perspective on the root cause]
-                            IMPLEMENTATION: [A practical public policy idea, a new product, or a service that could be implemented. ONLY write in short paragraphs. DO NOT add additional titles in the response.]
-                            """
-                        )
-                        
-                        # Use the key_idea to generate the solution
-                        solution_chain = solution_prompt | self.challenger_llm
-                        solution_response = solution_chain.invoke({
+                        solution_response = self._invoke("challenger", SOLUTION_PROMPT, {
                             "problem": problem,
                             "cause": leaf_cause,
                             "key_idea": key_idea_response,
@@ -230,80 +542,95 @@ class LateralThinkingEnhanced:
                         })
                         
                         # Store both the key_idea and the solution
-                        solution = {
-                            "root_cause": leaf_cause,
-                            "type": "domain_inspired",
-                            "domain": domain,
-                            "solution_number": solution_num,
-                            "key_idea": key_idea_response,
-                            "content": solution_response,
-                            "scores": {"overall": 5.0}  # Default score, will be replaced
-                        }
+                        solution = make_solution(leaf_cause, domain, solution_num, key_idea_response, solution_response)
                         solutions.append(solution)
-                        
-                        # Add delay to avoid rate limiting
-                        time.sleep(API_CALL_DELAY)
+                        if on_solution:
+                            on_solution(solution)
                         
                     except Exception as e:
                         print(f"Error generating key_ideaical solution for {domain}: {e}")
         
         return solutions
     
-    def evaluate_solutions(self, problem: str, solutions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Evaluate and score each solution on multiple dimensions"""
-        print("5. Evaluating solutions...")
-        
-        for i, solution in enumerate(solutions):
-            print(f"   Evaluating solution {i+1}/{len(solutions)}...")
+    def evaluate_solution(self, problem: str, solution: Dict[str, Any]) -> Dict[str, Any]:
+        """Score a single solution on multiple dimensions, updating it in place"""
+        try:
+            # Generate evaluation
+            eval_result = self._invoke("evaluator", EVALUATION_PROMPT, {
+                "problem": problem,
+                "root_cause": solution["root_cause"],
+                "solution_content": solution["content"]
+            })
             
-            evaluation_prompt = PromptTemplate(
-                input_variables=["problem", "root_cause", "solution_content"],
-                template="""For the problem: '{problem}'
-                And root cause: '{root_cause}'
-                Evaluate this solution:
-                
-                {solution_content}
-                
-                Score the solution on a scale of 1-10 for:
-                1. Novelty - how innovative and unique
-                2. Feasibility - how practical to implement
-                3. Impact - potential effectiveness
-                4. Relevance - how well it addresses the root cause
-                
-                Format your response as:
-                NOVELTY: [score]
-                FEASIBILITY: [score]
-                IMPACT: [score]
-                RELEVANCE: [score]
-                OVERALL: [average score]
-                """
-            )
+            # Parse scores using imported function
+            solution["scores"] = parse_evaluation(eval_result)
             
-            try:
-                # Generate evaluation
-                eval_chain = evaluation_prompt | self.evaluator_llm
-                eval_result = eval_chain.invoke({
-                    "problem": problem,
-                    "root_cause": solution["root_cause"],
-                    "solution_content": solution["content"]
-                })
-                
-                # Parse scores using imported function
-                scores = parse_evaluation(eval_result)
+        except Exception as e:
+            print(f"Error evaluating solution: {e}")
+            # Keep default scores if evaluation fails
+        
+        return solution
+    
+    def evaluate_solution_batch(self, problem: str, solutions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score several solutions with one evaluator call, updating them in place.
+        
+        The problem statement is sent once for the whole batch. Solutions the
+        response does not score cleanly are re-evaluated one at a time.
+        """
+        if len(solutions) == 1:
+            return [self.evaluate_solution(problem, solutions[0])]
+        
+        try:
+            eval_result = self._invoke("evaluator", BATCH_EVALUATION_PROMPT, {
+                "problem": problem,
+                "solutions": format_numbered_solutions(solutions)
+            }, max_tokens=EVALUATION_TOKENS_PER_SOLUTION * len(solutions))
+            batch_scores = parse_batch_evaluation(eval_result, len(solutions))
+        except Exception as e:
+            print(f"Error evaluating batch of {len(solutions)} solutions: {e}")
+            batch_scores = [None] * len(solutions)
+        
+        for solution, scores in zip(solutions, batch_scores):
+            if scores is None:
+                self.evaluate_solution(problem, solution)
+            else:
                 solution["scores"] = scores
-                
-                # Add delay to avoid rate limiting
-                time.sleep(API_CALL_DELAY)
-                
-            except Exception as e:
-                print(f"Error evaluating solution: {e}")
-                # Keep default scores if evaluation fails
+        return solutions
+    
+    def evaluate_solutions(self, problem: str, solutions: List[Dict[str, Any]],
+                           batch_size: int = EVALUATION_BATCH_SIZE) -> List[Dict[str, Any]]:
+        """Evaluate and score each solution on multiple dimensions"""
+        print("5. Evaluating solutions...")
+        
+        batch_size = max(1, batch_size)
+        for start in range(0, len(solutions), batch_size):
+            batch = solutions[start:start + batch_size]
+            print(f"   Evaluating solutions {start+1}-{start+len(batch)}/{len(solutions)}...")
+            self.evaluate_solution_batch(problem, batch)
         
         # Sort solutions by overall score
-        return sorted(solutions, key=lambda x: x["scores"].get("overall", 0), reverse=True)
+        return rank_solutions(solutions)
 
-    def analyze_problem(self, problem: str, config=None) -> Dict[str, Any]:
-        """Complete analysis with evaluation"""
+    @traced
+    def analyze_problem(self, problem: str, config=None, on_event=None) -> Dict[str, Any]:
+        """Complete analysis with evaluation.
+        
+        The analysis is run as a dependency graph: domains and initial causes are
+        generated concurrently, each cause tree is built as soon as the causes are
+        known, and solutions for a tree start once both the tree and the domains
+        exist. Independent steps run in parallel, bounded by ``max_in_flight``.
+        Every solution is handed to an evaluation pipeline the moment it is
+        generated, so scoring overlaps with generation and the ranking is
+        complete as soon as the last evaluation lands.
+        
+        If on_event is given it is called as on_event(event, data) as results
+        arrive: "domains", "causes", "tree" (one per root cause), "solution"
+        (one per solution, each with an "id") and "evaluation" (once that
+        solution is scored). It may be called from several threads.
+        
+        The results also hold a "metrics" trace of every stage and LLM call
+        (see metrics.py).
+        """
         # Use provided config or default to global constants
         cfg = config or {}
         num_domains = cfg.get('num_domains', NUM_DOMAINS)  # Add this line for domains
@@ -311,29 +638,97 @@ class LateralThinkingEnhanced:
         root_cause_depth = cfg.get('root_cause_depth', ROOT_CAUSE_DEPTH)
         max_leaf_causes = cfg.get('max_leaf_causes', MAX_LEAF_CAUSES)
         solutions_per_domain = cfg.get('solutions_per_domain', SOLUTIONS_PER_DOMAIN)
+        max_in_flight = cfg.get('max_in_flight', MAX_IN_FLIGHT)
+        batch_why = cfg.get('batch_why', BATCH_WHY_EXPANSION)
+        evaluation_batch_size = max(1, cfg.get('evaluation_batch_size', EVALUATION_BATCH_SIZE))
         
-        print("1. Generating knowledge domains...")
-        domains = self.generate_random_domains(num_domains)  # Use configurable value
+        graph = DagExecutor(max_in_flight)
+        key_ideas = Memo()  # One key idea per domain, shared by every tree
+        def evaluate_batch(batch):
+            record_evaluation_batch(len(batch))
+            # Evaluations share the graph's max_in_flight limit on concurrent LLM work
+            with graph.slot(), span("evaluation", solutions=len(batch)):
+                return self.evaluate_solution_batch(problem, batch)
         
-        print("2. Identifying initial causes...")
-        initial_causes = self.identify_initial_causes(problem, num_initial_causes)
+        evaluations = EvaluationPipeline(evaluate_batch, batch_size=evaluation_batch_size,
+                                         on_evaluated=lambda solution: notify(on_event, "evaluation", {"solution": solution}))
+        solution_ids = itertools.count(1)
+        
+        def generate_domains():
+            print("1. Generating knowledge domains...")
+            with span("domains"):
+                domains = self.generate_random_domains(num_domains)  # Use configurable value
+            notify(on_event, "domains", {"domains": domains})
+            # Start the key ideas straight away so they overlap with tree building
+            for domain in dict.fromkeys(domains):
+                graph.add(("key_idea", domain), functools.partial(warm_key_idea, domain))
+            return domains
+        
+        def warm_key_idea(domain):
+            try:
+                with span("key_idea", domain=domain):
+                    return self.generate_key_idea(domain, key_ideas)
+            except Exception as e:
+                # challenge_assumptions retries and reports the failure per solution
+                print(f"Error generating key idea for {domain}: {e}")
+        
+        def identify_causes():
+            print("2. Identifying initial causes...")
+            with span("causes"):
+                causes = self.identify_initial_causes(problem, num_initial_causes)
+            notify(on_event, "causes", {"causes": causes})
+            
+            print("3. Building root cause trees...")
+            if batch_why:
+                # One "why" call per tree level across every root cause
+                graph.add("trees", functools.partial(build_forest, causes))
+            for i, cause in enumerate(causes):
+                if batch_why:
+                    graph.add(("tree", i), functools.partial(take_tree, i), deps=["trees"])
+                else:
+                    graph.add(("tree", i), functools.partial(build_tree, i, cause, len(causes)))
+                graph.add(("solutions", i), functools.partial(generate_solutions, i, len(causes)),
+                          deps=[("tree", i), "domains"])
+            return causes
         
-        print("3. Building root cause trees...")
-        cause_trees = []
-        for i, cause in enumerate(initial_causes):
-            print(f"   Analyzing cause {i+1}/{len(initial_causes)}: {cause[:30]}...")
-            tree = self.dig_deeper(problem, cause, depth=root_cause_depth)
-            cause_trees.append(tree)
+        def build_forest(causes):
+            print(f"   Analyzing {len(causes)} causes level by level...")
+            with span("trees", trees=len(causes)):
+                return self.dig_deeper_forest(problem, causes, depth=root_cause_depth, max_leaf_causes=max_leaf_causes)
         
-        print("4. Generating solutions...")
-        all_solutions = []
-        for i, tree in enumerate(cause_trees):
-            print(f"   Generating solutions for tree {i+1}/{len(cause_trees)}...")
-            solutions = self.challenge_assumptions(problem, tree, domains, max_leaf_causes, solutions_per_domain)
-            all_solutions.extend(solutions)
+        def take_tree(i, trees):
+            notify(on_event, "tree", {"index": i, "tree": trees[i]})
+            return trees[i]
         
-        # Add evaluation step
-        evaluated_solutions = self.evaluate_solutions(problem, all_solutions)
+        def build_tree(i, cause, total):
+            print(f"   Analyzing cause {i+1}/{total}: {cause[:30]}...")
+            with span("tree", index=i):
+                tree = self.dig_deeper(problem, cause, depth=root_cause_depth, max_leaf_causes=max_leaf_causes)
+            notify(on_event, "tree", {"index": i, "tree": tree})
+            return tree
+        
+        def generate_solutions(i, total, tree, domains):
+            print(f"4. Generating solutions for tree {i+1}/{total}...")
+            with span("solutions", index=i):
+                return self.challenge_assumptions(problem, tree, domains, max_leaf_causes, solutions_per_domain,
+                                                  key_ideas, on_solution=submit_solution)
+        
+        def submit_solution(solution):
+            solution["id"] = next(solution_ids)
+            notify(on_event, "solution", {"solution": solution})
+            evaluations.submit(solution)
+        
+        graph.add("domains", generate_domains)
+        graph.add("causes", identify_causes)
+        try:
+            results = graph.run()
+        finally:
+            print("5. Finishing solution evaluations...")
+            evaluated_solutions = evaluations.close()  # Already sorted by overall score
+        
+        domains = results["domains"]
+        num_trees = len(results["causes"])
+        cause_trees = [results[("tree", i)] for i in range(num_trees)]
         
         return {
             "problem": problem,
@@ -342,9 +737,349 @@ class LateralThinkingEnhanced:
             "solutions": evaluated_solutions  # Now sorted by score
         }
     
+    # ------------------------------------------------------------------
+    # Asynchronous pipeline
+    #
+    # These mirror the synchronous methods above but are built on LangChain's
+    # ainvoke, so many analyses can share one event loop. Concurrency is
+    # bounded by a semaphore shared by every analysis this analyzer runs on
+    # the same event loop, and calls wait on the same rate limiters as the sync path.
+    # ------------------------------------------------------------------
+    
+    def _async_slots(self) -> asyncio.Semaphore:
+        """Return the semaphore bounding in-flight LLM calls on the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._slots_lock:
+            slots = self._slots.get(loop)
+            if slots is None:
+                slots = self._slots[loop] = asyncio.Semaphore(MAX_IN_FLIGHT)
+            return slots
+    
+    async def _ainvoke(self, role: str, prompt: PromptTemplate, inputs: Dict[str, Any], max_tokens: int = None) -> str:
+        """Async variant of _invoke that does not block the event loop"""
+        llm = getattr(self, f"{role}_llm")
+        prompt_text = prompt.format(**inputs)
+        llm_kwargs = {"max_tokens": max_tokens} if max_tokens else {}
+        
+        # SQLite lookups take well under a millisecond, so they run inline
+        cache_key = self._cache_key(role, llm, prompt_text, max_tokens)
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            record_cache_lookup(role, cached is not None)
+            if cached is not None:
+                return cached
+        
+        limiter = self.rate_limiters[role]
+        attempt = 0
+        while True:
+            await limiter.acquire_async(estimate_tokens(prompt_text, max_tokens or 256))
+            started = time.monotonic()
+            try:
+                async with self._async_slots():
+                    started = time.monotonic()  # Time the call itself, not the wait for a slot
+                    response = await llm.ainvoke(prompt_text, **llm_kwargs)
+            except Exception as e:
+                record_llm_call(role, started, prompt_text, error=e)
+                if not should_retry(e, attempt):
+                    raise
+                record_retry(role)
+                delay = limiter.backoff(attempt, retry_after_seconds(e))
+                print(f"Rate limited on {role} LLM, backing off for {delay:.1f}s...")
+                attempt += 1
+                continue
+            record_llm_call(role, started, prompt_text, response)
+            if cache_key:
+                self.response_cache.put(cache_key, role, response, RESPONSE_CACHE_POLICY[role]["ttl"])
+            return response
+    
+    async def generate_random_domains_async(self, num_domains: int = NUM_DOMAINS) -> List[str]:
+        """Async variant of generate_random_domains"""
+        try:
+            domains_result = await self._ainvoke("domain", DOMAIN_PROMPT, {"num_domains": num_domains})
+            return split_lines(domains_result)[:num_domains]
+        except Exception as e:
+            print(f"Error generating domains: {e}")
+            return list(FALLBACK_DOMAINS)
+    
+    async def identify_initial_causes_async(self, problem: str, num_causes: int = NUM_INITIAL_CAUSES) -> List[str]:
+        """Async variant of identify_initial_causes"""
+        try:
+            causes_result = await self._ainvoke("analyst", CAUSE_PROMPT, {"problem": problem, "num_causes": num_causes})
+            return split_lines(causes_result)[:num_causes]
+        except Exception as e:
+            print(f"Error identifying causes: {e}")
+            return list(FALLBACK_CAUSES)
+    
+    async def ask_why_async(self, problem: str, cause: str) -> List[str]:
+        """Async variant of ask_why"""
+        try:
+            sub_causes_result = await self._ainvoke("analyst", WHY_PROMPT, {"problem": problem, "cause": cause})
+            return split_lines(sub_causes_result)[:WHY_BRANCHING]
+        except Exception as e:
+            print(f"Error in dig_deeper for cause '{cause}': {e}")
+            return []
+    
+    async def dig_deeper_async(self, problem: str, cause: str, depth: int = ROOT_CAUSE_DEPTH,
+                               max_leaf_causes: int = None) -> Dict[str, Any]:
+        """Async variant of dig_deeper; each level's nodes are expanded concurrently"""
+        root = make_cause_node(cause)
+        frontier = [(root, depth)]
+        
+        while True:
+            to_expand = select_for_expansion(frontier, max_leaf_causes)
+            if not to_expand:
+                break
+            sub_causes = await asyncio.gather(*(self.ask_why_async(problem, node["cause"]) for node, _ in to_expand))
+            for (node, _), node_sub_causes in zip(to_expand, sub_causes):
+                node["children"] = [make_cause_node(sub_cause) for sub_cause in node_sub_causes]
+            frontier = advance_frontier(frontier, to_expand)
+        
+        prune_frontier(frontier, max_leaf_causes)
+        return root
+    
+    async def ask_why_batch_async(self, problem: str, causes: List[str]) -> List[List[str]]:
+        """Async variant of ask_why_batch; chunks and fallbacks run concurrently"""
+        async def ask_chunk(chunk):
+            if len(chunk) == 1:
+                return [None]
+            try:
+                response = await self._ainvoke("analyst", BATCH_WHY_PROMPT, {
+                    "problem": problem,
+                    "causes": format_numbered_causes(chunk)
+                }, max_tokens=WHY_TOKENS_PER_CAUSE * len(chunk))
+                return parse_batched_why(response, len(chunk))
+            except Exception as e:
+                print(f"Error in batched dig_deeper for {len(chunk)} causes: {e}")
+                return [None] * len(chunk)
+        
+        chunks = await asyncio.gather(*(ask_chunk(causes[start:start + WHY_BATCH_SIZE])
+                                        for start in range(0, len(causes), WHY_BATCH_SIZE)))
+        sub_causes = [item for chunk in chunks for item in chunk]
+        
+        async def fallback(i):
+            if sub_causes[i] is None:
+                sub_causes[i] = await self.ask_why_async(problem, causes[i])
+        
+        await asyncio.gather(*(fallback(i) for i in range(len(causes))))
+        return sub_causes
+    
+    async def dig_deeper_forest_async(self, problem: str, causes: List[str], depth: int = ROOT_CAUSE_DEPTH,
+                                      max_leaf_causes: int = None) -> List[Dict[str, Any]]:
+        """Async variant of dig_deeper_forest"""
+        roots = [make_cause_node(cause) for cause in causes]
+        frontiers = [[(root, depth)] for root in roots]
+        
+        while True:
+            to_expand = [select_for_expansion(frontier, max_leaf_causes) for frontier in frontiers]
+            level = [node for entries in to_expand for node, _ in entries]
+            if not level:
+                break
+            level_sub_causes = await self.ask_why_batch_async(problem, [node["cause"] for node in level])
+            for node, sub_causes in zip(level, level_sub_causes):
+                node["children"] = [make_cause_node(sub_cause) for sub_cause in sub_causes]
+            frontiers = [advance_frontier(frontier, entries) for frontier, entries in zip(frontiers, to_expand)]
+        
+        for frontier in frontiers:
+            prune_frontier(frontier, max_leaf_causes)
+        return roots
+    
+    async def generate_key_idea_async(self, domain: str, key_ideas: Dict[str, asyncio.Future] = None) -> str:
+        """Async variant of generate_key_idea; `key_ideas` maps each domain to its pending call"""
+        async def compute():
+            if _shared_key_ideas is not None:
+                cached = _shared_key_ideas.get(domain.casefold())
+                if cached is not None:
+                    return cached
+            key_idea = await self._ainvoke("challenger", KEY_IDEA_PROMPT, {"domain": domain})
+            if _shared_key_ideas is not None:
+                _shared_key_ideas.set(domain.casefold(), key_idea)
+            return key_idea
+        
+        if key_ideas is None:
+            return await compute()
+        future = key_ideas.get(domain)
+        if future is None or (future.done() and future.exception() is not None):
+            future = key_ideas[domain] = asyncio.ensure_future(compute())
+        return await asyncio.shield(future)
+    
+    async def challenge_assumptions_async(self, problem: str, cause_tree: Dict[str, Any], domains: List[str],
+                                          max_leaf_causes=MAX_LEAF_CAUSES, solutions_per_domain=SOLUTIONS_PER_DOMAIN,
+                                          key_ideas: Dict[str, asyncio.Future] = None,
+                                          on_solution: Callable[[Dict[str, Any]], Any] = None) -> List[Dict[str, Any]]:
+        """Async variant of challenge_assumptions; every (cause, domain, solution) combination runs concurrently"""
+        if key_ideas is None:
+            key_ideas = {}
+        
+        async def generate(leaf_cause, domain, solution_num):
+            try:
+                key_idea_response = await self.generate_key_idea_async(domain, key_ideas)
+                solution_response = await self._ainvoke("challenger", SOLUTION_PROMPT, {
+                    "problem": problem,
+                    "cause": leaf_cause,
+                    "key_idea": key_idea_response,
+                    "solution_num": solution_num
+                })
+                solution = make_solution(leaf_cause, domain, solution_num, key_idea_response, solution_response)
+                if on_solution:
+                    on_solution(solution)
+                return solution
+            except Exception as e:
+                print(f"Error generating key_ideaical solution for {domain}: {e}")
+                return None
+        
+        results = await asyncio.gather(*(
+            generate(leaf_cause, domain, solution_num)
+            for leaf_cause in extract_leaf_causes(cause_tree, max_leaf_causes)
+            for domain in domains
+            for solution_num in range(1, solutions_per_domain + 1)
+        ))
+        return [solution for solution in results if solution is not None]
+    
+    async def evaluate_solution_async(self, problem: str, solution: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of evaluate_solution"""
+        try:
+            eval_result = await self._ainvoke("evaluator", EVALUATION_PROMPT, {
+                "problem": problem,
+                "root_cause": solution["root_cause"],
+                "solution_content": solution["content"]
+            })
+            solution["scores"] = parse_evaluation(eval_result)
+        except Exception as e:
+            print(f"Error evaluating solution: {e}")
+            # Keep default scores if evaluation fails
+        return solution
+    
+    async def evaluate_solution_batch_async(self, problem: str, solutions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Async variant of evaluate_solution_batch; fallbacks run concurrently"""
+        if len(solutions) == 1:
+            return [await self.evaluate_solution_async(problem, solutions[0])]
+        
+        try:
+            eval_result = await self._ainvoke("evaluator", BATCH_EVALUATION_PROMPT, {
+                "problem": problem,
+                "solutions": format_numbered_solutions(solutions)
+            }, max_tokens=EVALUATION_TOKENS_PER_SOLUTION * len(solutions))
+            batch_scores = parse_batch_evaluation(eval_result, len(solutions))
+        except Exception as e:
+            print(f"Error evaluating batch of {len(solutions)} solutions: {e}")
+            batch_scores = [None] * len(solutions)
+        
+        fallbacks = []
+        for solution, scores in zip(solutions, batch_scores):
+            if scores is None:
+                fallbacks.append(self.evaluate_solution_async(problem, solution))
+            else:
+                solution["scores"] = scores
+        await asyncio.gather(*fallbacks)
+        return solutions
+    
+    async def evaluate_solutions_async(self, problem: str, solutions: List[Dict[str, Any]],
+                                       batch_size: int = EVALUATION_BATCH_SIZE) -> List[Dict[str, Any]]:
+        """Async variant of evaluate_solutions; all batches are scored concurrently"""
+        if not solutions:
+            return []
+        
+        print(f"5. Evaluating {len(solutions)} solutions...")
+        batch_size = max(1, batch_size)
+        await asyncio.gather(*(
+            self.evaluate_solution_batch_async(problem, solutions[start:start + batch_size])
+            for start in range(0, len(solutions), batch_size)
+        ))
+        return rank_solutions(solutions)
+    
+    @traced
+    async def analyze_problem_async(self, problem: str, config=None, on_event=None) -> Dict[str, Any]:
+        """Async variant of analyze_problem.
+        
+        Domains and causes are generated concurrently, the cause trees are built
+        together (level-batched or concurrently per tree), each tree's
+        solutions start as soon as that tree and the domains are ready, and
+        each solution is evaluated as soon as it is generated. on_event receives
+        the same progress events as in analyze_problem.
+        """
+        cfg = config or {}
+        num_domains = cfg.get('num_domains', NUM_DOMAINS)
+        num_initial_causes = cfg.get('num_initial_causes', NUM_INITIAL_CAUSES)
+        root_cause_depth = cfg.get('root_cause_depth', ROOT_CAUSE_DEPTH)
+        max_leaf_causes = cfg.get('max_leaf_causes', MAX_LEAF_CAUSES)
+        solutions_per_domain = cfg.get('solutions_per_domain', SOLUTIONS_PER_DOMAIN)
+        batch_why = cfg.get('batch_why', BATCH_WHY_EXPANSION)
+        evaluation_batch_size = cfg.get('evaluation_batch_size', EVALUATION_BATCH_SIZE)
+        
+        key_ideas = {}
+        async def evaluate_batch(batch):
+            record_evaluation_batch(len(batch))
+            with span("evaluation", solutions=len(batch)):
+                return await self.evaluate_solution_batch_async(problem, batch)
+        
+        evaluations = AsyncEvaluationPipeline(evaluate_batch, batch_size=evaluation_batch_size,
+                                              on_evaluated=lambda solution: notify(on_event, "evaluation", {"solution": solution}))
+        solution_ids = itertools.count(1)
+        
+        def submit_solution(solution):
+            solution["id"] = next(solution_ids)
+            notify(on_event, "solution", {"solution": solution})
+            evaluations.submit(solution)
+        
+        async def generate_domains():
+            with span("domains"):
+                domains = await self.generate_random_domains_async(num_domains)
+            notify(on_event, "domains", {"domains": domains})
+            # Start the key ideas straight away so they overlap with tree building
+            for domain in domains:
+                if domain not in key_ideas:
+                    key_ideas[domain] = asyncio.ensure_future(warm_key_idea(domain))
+            return domains
+        
+        async def warm_key_idea(domain):
+            with span("key_idea", domain=domain):
+                return await self.generate_key_idea_async(domain)
+        
+        async def solve(i, cause=None, tree=None):
+            if tree is None:
+                with span("tree", index=i):
+                    tree = await self.dig_deeper_async(problem, cause, depth=root_cause_depth, max_leaf_causes=max_leaf_causes)
+            notify(on_event, "tree", {"index": i, "tree": tree})
+            domains = await domains_task
+            with span("solutions", index=i):
+                solutions = await self.challenge_assumptions_async(problem, tree, domains, max_leaf_causes, solutions_per_domain,
+                                                                   key_ideas, on_solution=submit_solution)
+            return tree, solutions
+        
+        domains_task = asyncio.ensure_future(generate_domains())
+        try:
+            with span("causes"):
+                initial_causes = await self.identify_initial_causes_async(problem, num_initial_causes)
+            notify(on_event, "causes", {"causes": initial_causes})
+            
+            if batch_why:
+                with span("trees", trees=len(initial_causes)):
+                    trees = await self.dig_deeper_forest_async(problem, initial_causes, depth=root_cause_depth, max_leaf_causes=max_leaf_causes)
+                per_tree = await asyncio.gather(*(solve(i, tree=tree) for i, tree in enumerate(trees)))
+            else:
+                per_tree = await asyncio.gather(*(solve(i, cause) for i, cause in enumerate(initial_causes)))
+            domains = await domains_task
+        finally:
+            evaluated_solutions = await evaluations.close()  # Already sorted by overall score
+            # Key ideas no solution ended up using (and work left behind by a
+            # failure) must not outlive the analysis or go unretrieved
+            leftovers = [domains_task, *key_ideas.values()]
+            for future in leftovers:
+                future.cancel()
+            await asyncio.gather(*leftovers, return_exceptions=True)
+        
+        cause_trees = [tree for tree, _ in per_tree]
+        
+        return {
+            "problem": problem,
+            "domains": domains,
+            "cause_trees": cause_trees,
+            "solutions": evaluated_solutions
+        }
+    
     def visualize_tree(self, tree, indent=0):
         """Pretty print the root cause tree"""
-        print("  " * indent + f"- {tree['cause']}")
+        print("  " * indent + f"- {tree['cause']}" + (" (not explored)" if tree.get("pruned") else ""))
         for child in tree['children']:
             self.visualize_tree(child, indent + 1)
             
@@ -0,0 +1,295 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from cache import ResponseCache
+from evaluation import split_numbered_blocks
+from config import (
+    OPENAI_API_KEY,
+    API_REQUEST_TIMEOUT,
+    LLM_BACKEND,
+    LLM_CASSETTE_PATH,
+    LLM_REPLAY_SPEED,
+    FAKE_LLM_LATENCY,
+    FAKE_LLM_JITTER,
+    FAKE_LLM_ERROR_RATE,
+    FAKE_LLM_RATE_LIMIT_RATE,
+    FAKE_LLM_SEED
+)
+
+# Every backend offers the same interface as LangChain's OpenAI LLM:
+# invoke(prompt, **kwargs) -> str, async ainvoke(prompt, **kwargs) -> str,
+# and model_name / temperature attributes (used in response cache keys).
+LLM_BACKENDS = ("openai", "fake", "record", "replay")
+
+class FakeLLMError(Exception):
+    """A simulated LLM failure"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code  # 429 exercises the rate limiter's backoff
+
+class CassetteMissError(KeyError):
+    """Replay found no recorded response for a prompt"""
+
+FAKE_DOMAINS = [
+    "Mycology", "Game Theory", "Origami", "Jazz Improvisation", "Epidemiology", "Beekeeping",
+    "Urban Planning", "Linguistics", "Swarm Robotics", "Cartography", "Permaculture", "Typography",
+    "Immunology", "Choreography", "Seismology", "Cryptography", "Ornithology", "Theatre Design"
+]
+FAKE_SUBJECTS = ["Local supply chains", "Public funding rules", "Retail incentives", "Transport links",
+                 "Household budgets", "Community networks", "Planning policy", "Information gaps"]
+FAKE_PROBLEMS = ["favour short-term returns", "overlook low-income areas", "are fragmented across agencies",
+                 "lack reliable data", "reward scale over access", "depend on volunteer capacity"]
+
+class FakeLLM:
+    """Offline stand-in for an LLM that answers every prompt used by the analysis in the expected format.
+
+    Responses are derived from a hash of the prompt, so the same prompt always
+    gets the same answer. Each call waits `latency` seconds plus or minus up to
+    `jitter`, and fails with probability `error_rate` (or with a 429 with
+    probability `rate_limit_rate`).
+    """
+
+    def __init__(self, temperature: float = 0.0, latency: float = FAKE_LLM_LATENCY, jitter: float = FAKE_LLM_JITTER,
+                 error_rate: float = FAKE_LLM_ERROR_RATE, rate_limit_rate: float = FAKE_LLM_RATE_LIMIT_RATE,
+                 seed: int = FAKE_LLM_SEED):
+        self.model_name = "fake"
+        self.temperature = temperature
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self) -> Tuple[float, Optional[FakeLLMError]]:
+        """This call's simulated latency and failure, if any"""
+        with self._lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return delay, FakeLLMError("Simulated rate limit", status_code=429)
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay, FakeLLMError("Simulated LLM failure")
+        return delay, None
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        delay, error = self._draw()
+        time.sleep(delay)
+        if error:
+            raise error
+        return self.respond(prompt)
+
+    async def ainvoke(self, prompt: str, **kwargs) -> str:
+        delay, error = self._draw()
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return self.respond(prompt)
+
+    def respond(self, prompt: str) -> str:
+        """The response to a prompt, in the format that prompt asks for"""
+        rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+        cause = lambda: f"{rng.choice(FAKE_SUBJECTS)} {rng.choice(FAKE_PROBLEMS)}"
+        scores = lambda: "\n".join([f"NOVELTY: {rng.randint(4, 9)}", f"FEASIBILITY: {rng.randint(3, 9)}",
+                                    f"IMPACT: {rng.randint(4, 9)}", f"RELEVANCE: {rng.randint(5, 10)}"])
+
+        # Checked in this order because later prompts embed earlier formats
+        # (evaluations quote solutions, solutions quote key ideas)
+        if "Evaluate each of the numbered solutions" in prompt:
+            count = len(re.findall(r"^\s*SOLUTION \d+:", prompt, re.MULTILINE))
+            return "\n".join(f"EVALUATION {i}:\n{scores()}" for i in range(1, count + 1))
+        if "Evaluate this solution" in prompt:
+            return scores()
+        if "SOLUTION TITLE:" in prompt:
+            return (f"SOLUTION TITLE: {rng.choice(FAKE_DOMAINS)} {rng.choice(['Exchange', 'Commons', 'Network', 'Lab'])}\n"
+                    f"KEY IDEA APPLICATION: Treats {cause().lower()} as a system that can be rewired.\n"
+                    f"IMPLEMENTATION: A local authority partners with retailers to pilot the scheme.\n\n"
+                    f"Community groups run it day to day, and results are reviewed after six months.")
+        if "KEY_IDEA:" in prompt:
+            domain = re.search(r"field of '([^']*)'", prompt)
+            return (f"KEY_IDEA: A foundational principle of {domain.group(1) if domain else 'the field'}\n"
+                    f"ABSTRACTION: Small local interactions produce robust system-wide behaviour.\n"
+                    f"TRANSLATION: Services can be designed as networks of small, connected local actors.")
+        if "knowledge domains" in prompt:
+            count = int(re.search(r"Generate (\d+)", prompt).group(1))
+            return "\n".join(rng.sample(FAKE_DOMAINS, min(count, len(FAKE_DOMAINS))))
+        if "For EACH numbered potential cause" in prompt:
+            count = len(re.findall(r"^\s*\[\d+\] \S", prompt, re.MULTILINE))
+            return "\n".join(f"CAUSE {i}:\n{cause()}\n{cause()}" for i in range(1, count + 1))
+        if "Identify EXACTLY" in prompt:
+            count = int(re.search(r"Identify EXACTLY (\d+)", prompt).group(1))
+            return "\n".join(cause() for _ in range(count))
+        if "Ask why this cause exists" in prompt:
+            return f"{cause()}\n{cause()}"
+        return cause()
+
+class Cassette:
+    """Recorded LLM responses, stored as JSON lines so several runs can append to one file.
+
+    A prompt recorded more than once (e.g. for a creative role) replays its
+    responses in the order they were recorded, then repeats the last one.
+    
+    Which solutions share a batched evaluation depends on timing, so
+    evaluations are also indexed per solution: an evaluation prompt that was
+    never recorded as a whole is answered from the solutions' own scores.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._played: Dict[str, int] = {}
+        self._evaluations: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+
+    def _add(self, entry: Dict[str, Any]):
+        self._entries.setdefault(entry["key"], []).append(entry)
+        solutions = _evaluated_solutions(entry["prompt"])
+        if solutions and len(solutions) == 1 and "EVALUATION 1:" not in entry["response"]:
+            self._evaluations[solutions[0]] = entry["response"].strip()
+        elif solutions:
+            for solution, evaluation in zip(solutions, split_numbered_blocks(entry["response"], "EVALUATION", len(solutions))):
+                if evaluation:
+                    self._evaluations[solution] = evaluation
+
+    @staticmethod
+    def make_key(role: str, temperature: float, prompt: str, max_tokens: Optional[int] = None) -> str:
+        return ResponseCache.make_key(role, "", temperature, prompt, max_tokens)
+
+    def record(self, key: str, role: str, prompt: str, response: str, elapsed: float):
+        entry = {"key": key, "role": role, "prompt": prompt, "response": response, "elapsed": round(elapsed, 3)}
+        with self._lock:
+            self._add(entry)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def play(self, key: str, prompt: str = "") -> Dict[str, Any]:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                response = self._assemble_evaluations(prompt)
+                if response is None:
+                    raise CassetteMissError(f"No recorded response for this prompt in {self.path}")
+                return {"response": response, "elapsed": 0.0}
+            index = self._played.get(key, 0)
+            self._played[key] = index + 1
+            return entries[min(index, len(entries) - 1)]
+
+    def _assemble_evaluations(self, prompt: str) -> Optional[str]:
+        solutions = _evaluated_solutions(prompt)
+        if not solutions or not all(solution in self._evaluations for solution in solutions):
+            return None
+        if "Evaluate this solution" in prompt:
+            return self._evaluations[solutions[0]]
+        return "\n".join(f"EVALUATION {i}:\n{self._evaluations[solution]}" for i, solution in enumerate(solutions, 1))
+
+def _evaluated_solutions(prompt: str) -> Optional[List[str]]:
+    """Identify each solution in an evaluation prompt by its root cause and first lines"""
+    if "Evaluate this solution" in prompt:
+        root_cause = re.search(r"And root cause: '(.*)'", prompt)
+        blocks = [f"Root cause: {root_cause.group(1) if root_cause else ''}\n{prompt.split('Evaluate this solution:', 1)[1]}"]
+    elif "Evaluate each of the numbered solutions" in prompt:
+        count = len(re.findall(r"^\s*SOLUTION \d+:", prompt, re.MULTILINE))
+        blocks = split_numbered_blocks(prompt, "SOLUTION", count)
+        if not all(blocks):
+            return None
+    else:
+        return None
+    # Solutions run on into the rest of the prompt, so compare leading lines only
+    return ["\n".join([line.strip() for line in block.splitlines() if line.strip()][:3]) for block in blocks]
+
+class RecordingLLM:
+    """Wraps a real LLM and saves every response it returns to a cassette"""
+
+    def __init__(self, llm, role: str, cassette: Cassette):
+        self.llm = llm
+        self.role = role
+        self.cassette = cassette
+        self.model_name = getattr(llm, "model_name", "")
+        self.temperature = getattr(llm, "temperature", None)
+
+    def _record(self, prompt: str, kwargs: Dict[str, Any], response: str, started: float):
+        key = Cassette.make_key(self.role, self.temperature, prompt, kwargs.get("max_tokens"))
+        self.cassette.record(key, self.role, prompt, response, time.monotonic() - started)
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        started = time.monotonic()
+        response = self.llm.invoke(prompt, **kwargs)
+        self._record(prompt, kwargs, response, started)
+        return response
+
+    async def ainvoke(self, prompt: str, **kwargs) -> str:
+        started = time.monotonic()
+        response = await self.llm.ainvoke(prompt, **kwargs)
+        self._record(prompt, kwargs, response, started)
+        return response
+
+class ReplayLLM:
+    """Answers from a cassette instead of calling an API, optionally at the recorded speed"""
+
+    def __init__(self, role: str, temperature: float, cassette: Cassette, speed: float = LLM_REPLAY_SPEED):
+        self.role = role
+        self.model_name = "replay"
+        self.temperature = temperature
+        self.cassette = cassette
+        self.speed = speed  # 1.0 waits as long as the recorded call took; 0 answers instantly
+
+    def _play(self, prompt: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return self.cassette.play(Cassette.make_key(self.role, self.temperature, prompt, kwargs.get("max_tokens")), prompt)
+
+    def invoke(self, prompt: str, **kwargs) -> str:
+        entry = self._play(prompt, kwargs)
+        if self.speed:
+            time.sleep(entry["elapsed"] * self.speed)
+        return entry["response"]
+
+    async def ainvoke(self, prompt: str, **kwargs) -> str:
+        entry = self._play(prompt, kwargs)
+        if self.speed:
+            await asyncio.sleep(entry["elapsed"] * self.speed)
+        return entry["response"]
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+def get_cassette(path: str = LLM_CASSETTE_PATH) -> Cassette:
+    """The process-wide cassette for a path, shared by every role"""
+    with _cassettes_lock:
+        if path not in _cassettes:
+            _cassettes[path] = Cassette(path)
+        return _cassettes[path]
+
+def create_llm(role: str, temperature: float, backend: str = LLM_BACKEND):
+    """Build the LLM for a role (analyst, challenger, evaluator, domain) on the configured backend"""
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{backend}'; expected one of: {', '.join(LLM_BACKENDS)}")
+    if backend == "fake":
+        return FakeLLM(temperature)
+    if backend == "replay":
+        return ReplayLLM(role, temperature, get_cassette())
+
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+    from langchain_openai import OpenAI as LangchainOpenAI
+    llm = LangchainOpenAI(
+        temperature=temperature,
+        request_timeout=API_REQUEST_TIMEOUT,
+        openai_api_key=OPENAI_API_KEY
+    )
+    if backend == "record":
+        return RecordingLLM(llm, role, get_cassette())
+    return llm
@@ -1,18 +1,24 @@
 import os
 import time
+import argparse
 import threading
-from http.server import HTTPServer
+from http.server import ThreadingHTTPServer
 from lateral_thinking import LateralThinkingEnhanced
 from form_handler import FormHandler
-from config import PROBLEM_STATEMENT
+from jobs import JobQueue
+from batch import run_batch
+from benchmark import run_benchmarks
+from analysis_levels import ANALYSIS_LEVELS
+from config import PROBLEM_STATEMENT, BATCH_CONCURRENCY, FAKE_LLM_LATENCY
 
-def main():
-    # Initialize the analyzer
-    analyzer = LateralThinkingEnhanced()
+def serve(analyzer):
     
-    # Create a custom handler class that has access to the analyzer
+    # Background workers that run queued analyses
+    jobs = JobQueue(analyzer)
+    
+    # Create a custom handler class that has access to the analyzer and job queue
     def handler_factory(*args, **kwargs):
-        return FormHandler(*args, analyzer=analyzer, **kwargs)
+        return FormHandler(*args, analyzer=analyzer, jobs=jobs, **kwargs)
     
     # Get port from environment variable or use default
     port = int(os.environ.get('PORT', 8000))
@@ -23,7 +29,9 @@ def main():
     if is_production:
         # Production mode: bind to all interfaces
         host = '0.0.0.0'
-        server = HTTPServer((host, port), handler_factory)
+        # One thread per connection so a long analysis never blocks other visitors
+        server = ThreadingHTTPServer((host, port), handler_factory)
+        server.daemon_threads = True
         print(f'Starting server at http://{host}:{port} (production mode)')
         server.serve_forever()
     else:
@@ -31,7 +39,8 @@ def main():
         host = 'localhost'
         
         def run_server():
-            server = HTTPServer((host, port), handler_factory)
+            server = ThreadingHTTPServer((host, port), handler_factory)
+            server.daemon_threads = True
             print(f'Starting server at http://{host}:{port} (development mode)')
             server.serve_forever()
         
@@ -50,5 +59,47 @@ def main():
         except KeyboardInterrupt:
             print("\nShutting down...")
 
+def main():
+    parser = argparse.ArgumentParser(description="De Bono lateral thinking tool")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="Run the web application (the default)")
+    batch_parser = commands.add_parser("batch", help="Analyze every problem in a CSV or JSONL file")
+    batch_parser.add_argument("input", help="CSV file with a 'problem' column, or JSONL of problems")
+    batch_parser.add_argument("-o", "--output", required=True,
+                              help="JSONL file for the results; rerun with the same file to resume")
+    batch_parser.add_argument("--level", choices=ANALYSIS_LEVELS, default="balanced",
+                              help="Analysis level for problems that do not set their own")
+    batch_parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                              help=f"Problems analyzed at once (default: {BATCH_CONCURRENCY})")
+    bench_parser = commands.add_parser("benchmark", help="Benchmark the analysis levels, report rendering and "
+                                                         "web server against a simulated LLM")
+    bench_parser.add_argument("-o", "--output", default="benchmark.json", help="JSON file for the results")
+    bench_parser.add_argument("--baseline", help="Earlier results file to compare against")
+    bench_parser.add_argument("--levels", nargs="+", choices=ANALYSIS_LEVELS, default=list(ANALYSIS_LEVELS))
+    bench_parser.add_argument("--runs", type=int, default=3, help="Analyses per level (default: 3)")
+    bench_parser.add_argument("--latency", type=float, default=FAKE_LLM_LATENCY,
+                              help=f"Simulated seconds per LLM call (default: {FAKE_LLM_LATENCY})")
+    bench_parser.add_argument("--async", dest="use_async", action="store_true",
+                              help="Benchmark analyze_problem_async instead of analyze_problem")
+    bench_parser.add_argument("--clients", type=int, default=8, help="Concurrent clients in the load test")
+    bench_parser.add_argument("--requests", type=int, default=2, help="Analyses per client in the load test")
+    bench_parser.add_argument("--server-level", choices=ANALYSIS_LEVELS, default="fastest")
+    bench_parser.add_argument("--skip", nargs="+", choices=("levels", "micro", "server"), default=[])
+    args = parser.parse_args()
+    
+    if args.command == "benchmark":
+        # Uses its own analyzers on the fake backend, so no API key is needed
+        run_benchmarks(args.output, args.levels, args.runs, args.clients, args.requests, args.server_level,
+                       latency=args.latency, use_async=args.use_async, skip=args.skip, baseline_path=args.baseline)
+        return
+    
+    # Initialize the analyzer
+    analyzer = LateralThinkingEnhanced()
+    
+    if args.command == "batch":
+        run_batch(analyzer, args.input, args.output, args.level, args.concurrency)
+    else:
+        serve(analyzer)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
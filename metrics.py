@@ -0,0 +1,322 @@
+import time
+import asyncio
+import bisect
+import functools
+import threading
+import contextlib
+import contextvars
+import inspect
+from typing import Any, Dict, List, Optional, Tuple
+from stats import percentile
+from profiling import start_session, finish_session, enter_stage
+from config import METRICS_TOKEN_ENCODING
+
+try:
+    import tiktoken
+except ImportError:  # Optional: token counts fall back to an estimate
+    tiktoken = None
+
+# Latency buckets in seconds: LLM calls take from under a second to a minute,
+# whole analyses up to several minutes
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+class Metric:
+    """A Prometheus metric with a fixed set of label names"""
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._render_value(key, value))
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_value(self, key, value) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {value:g}"]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def summary(self, **labels) -> Tuple[int, float]:
+        """The number of observations and their sum"""
+        with self._lock:
+            counts, total = self._values.get(self._key(labels), ([0], 0.0))
+            return sum(counts), total
+
+    def quantile(self, fraction: float, **labels) -> Optional[float]:
+        """Estimate a quantile by interpolating within its bucket (None without observations)"""
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+            counts = list(counts)
+        target = fraction * sum(counts)
+        if not target:
+            return None
+        cumulative, lower = 0, 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and cumulative + count >= target:
+                return lower + (bound - lower) * (target - cumulative) / count
+            cumulative += count
+            lower = bound
+        return self.buckets[-1]  # In the +Inf bucket; the largest finite bound is the best estimate
+
+    def _render_value(self, key, value) -> List[str]:
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+            lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {total:.6f}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REGISTRY: List[Metric] = []
+
+ANALYSES = Counter("lateral_analyses_total", "Analyses finished, by outcome", ("outcome",))
+STAGE_SECONDS = Histogram("lateral_stage_seconds", "Time spent in each analysis stage", ("stage",))
+LLM_CALLS = Counter("lateral_llm_calls_total", "LLM calls made, by role and outcome", ("role", "outcome"))
+LLM_CALL_SECONDS = Histogram("lateral_llm_call_seconds", "Latency of each LLM call", ("role",))
+LLM_RETRIES = Counter("lateral_llm_retries_total", "LLM calls retried after an error", ("role",))
+LLM_TOKENS = Counter("lateral_llm_tokens_total", "Prompt and completion tokens", ("role", "kind"))
+CACHE_LOOKUPS = Counter("lateral_response_cache_lookups_total", "Response cache lookups", ("role", "result"))
+EVALUATION_BATCHES = Histogram("lateral_evaluation_batch_solutions", "Solutions scored per evaluation batch",
+                               buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32))
+
+def render_prometheus() -> str:
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+@functools.lru_cache(maxsize=None)
+def _encoding(name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # get_encoding downloads its tables on first use, which fails offline
+        print(f"Token counts will be estimated; tiktoken encoding unavailable: {e}")
+        return None
+
+def count_tokens(text: str) -> int:
+    """Tokens in text with tiktoken, or about four characters per token without it"""
+    encoding = _encoding(METRICS_TOKEN_ENCODING)
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+class AnalysisTrace:
+    """Stage timings and LLM usage for one analysis.
+
+    Spans and calls are recorded with their start time relative to the start
+    of the analysis, so a trace shows which steps overlapped.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.spans = []
+        self.calls = []
+        self.retries = {}
+        self.cache_hits = {}
+        self.profile = None  # Time accounting and profile files, when the analysis was profiled
+        self._lock = threading.Lock()
+
+    def offset(self, moment: float) -> float:
+        return round(moment - self.started, 3)
+
+    def add_span(self, name: str, started: float, seconds: float, attributes: Dict[str, Any]):
+        with self._lock:
+            self.spans.append({"name": name, "start": self.offset(started), "seconds": round(seconds, 3), **attributes})
+
+    def add_call(self, call: Dict[str, Any]):
+        with self._lock:
+            self.calls.append(call)
+
+    def add_retry(self, role: str):
+        with self._lock:
+            self.retries[role] = self.retries.get(role, 0) + 1
+
+    def add_cache_hit(self, role: str):
+        with self._lock:
+            self.cache_hits[role] = self.cache_hits.get(role, 0) + 1
+
+    def llm_seconds(self) -> float:
+        with self._lock:
+            return sum(call["seconds"] for call in self.calls)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start"])
+            calls = sorted(self.calls, key=lambda call: call["start"])
+            roles = {}
+            for call in calls:
+                stats = roles.setdefault(call["role"], {"calls": 0, "errors": 0, "prompt_tokens": 0,
+                                                        "completion_tokens": 0, "latencies": []})
+                stats["calls"] += 1
+                stats["errors"] += call["outcome"] != "ok"
+                stats["prompt_tokens"] += call["prompt_tokens"]
+                stats["completion_tokens"] += call["completion_tokens"]
+                stats["latencies"].append(call["seconds"])
+            for role in set(self.retries) | set(self.cache_hits):
+                roles.setdefault(role, {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                        "latencies": []})
+            for role, stats in roles.items():
+                latencies = stats.pop("latencies")
+                stats["retries"] = self.retries.get(role, 0)
+                stats["cache_hits"] = self.cache_hits.get(role, 0)
+                stats["seconds"] = round(sum(latencies), 3)
+                stats["p50_seconds"] = percentile(latencies, 0.5) if latencies else None
+                stats["max_seconds"] = max(latencies) if latencies else None
+            trace = {
+                "total_seconds": self.offset(time.monotonic()),
+                "spans": spans,
+                "llm": roles,
+                "calls": calls
+            }
+            if self.profile is not None:
+                trace["profile"] = self.profile
+            return trace
+
+current_trace: contextvars.ContextVar = contextvars.ContextVar("analysis_trace", default=None)
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """Time a stage, both in the Prometheus histogram and in the current analysis's trace.
+
+    If the analysis is being profiled, the thread running the stage is profiled too.
+    """
+    started = time.monotonic()
+    session = enter_stage()
+    try:
+        yield
+    except Exception:
+        attributes["error"] = True
+        raise
+    finally:
+        if session is not None:
+            session.exit()
+        seconds = time.monotonic() - started
+        STAGE_SECONDS.observe(seconds, stage=name)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add_span(name, started, seconds, attributes)
+
+@contextlib.contextmanager
+def analysis_trace(config: Optional[Dict[str, Any]] = None):
+    """Trace one analysis, profiling it too if its config or PROFILE_SAMPLE_RATE says so"""
+    trace = AnalysisTrace()
+    token = current_trace.set(trace)
+    profiling = start_session(config)
+    try:
+        with span("analysis"):
+            yield trace
+    except Exception:
+        ANALYSES.inc(outcome="failed")
+        raise
+    finally:
+        if profiling is not None:
+            trace.profile = finish_session(profiling, trace.llm_seconds())
+        current_trace.reset(token)
+
+def traced(analyze):
+    """Record an analysis's trace and attach it to its results as results["metrics"].
+
+    The trace is held in a context variable so every step of the analysis,
+    on whichever thread or task it runs, records into it.
+    """
+    signature = inspect.signature(analyze)
+
+    def config_of(args, kwargs) -> Optional[Dict[str, Any]]:
+        return signature.bind(*args, **kwargs).arguments.get("config")
+
+    def finish(trace: AnalysisTrace, results: Dict[str, Any]) -> Dict[str, Any]:
+        results["metrics"] = trace.to_dict()
+        ANALYSES.inc(outcome="done")
+        return results
+
+    if asyncio.iscoroutinefunction(analyze):
+        @functools.wraps(analyze)
+        async def run_async(*args, **kwargs):
+            with analysis_trace(config_of(args, kwargs)) as trace:
+                results = await analyze(*args, **kwargs)
+            return finish(trace, results)
+        return run_async
+
+    @functools.wraps(analyze)
+    def run(*args, **kwargs):
+        with analysis_trace(config_of(args, kwargs)) as trace:
+            results = analyze(*args, **kwargs)
+        return finish(trace, results)
+    return run
+
+def record_llm_call(role: str, started: float, prompt: str, response: Optional[str] = None,
+                    error: Optional[Exception] = None):
+    """Record one LLM call that began at `started` (time.monotonic()) and has just ended"""
+    seconds = time.monotonic() - started
+    outcome = "ok" if error is None else type(error).__name__
+    prompt_tokens = count_tokens(prompt)
+    completion_tokens = count_tokens(response) if response else 0
+    LLM_CALLS.inc(role=role, outcome=outcome)
+    LLM_CALL_SECONDS.observe(seconds, role=role)
+    LLM_TOKENS.inc(prompt_tokens, role=role, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, role=role, kind="completion")
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_call({"role": role, "start": trace.offset(started), "seconds": round(seconds, 3),
+                        "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "outcome": outcome})
+
+def record_evaluation_batch(size: int):
+    EVALUATION_BATCHES.observe(size)
+
+def record_retry(role: str):
+    LLM_RETRIES.inc(role=role)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add_retry(role)
+
+def record_cache_lookup(role: str, hit: bool):
+    CACHE_LOOKUPS.inc(role=role, result="hit" if hit else "miss")
+    trace = current_trace.get()
+    if trace is not None and hit:
+        trace.add_cache_hit(role)
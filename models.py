@@ -0,0 +1,177 @@
+import json
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # Optional: fall back to the standard library
+    orjson = None
+
+SCORE_FIELDS = ("novelty", "feasibility", "impact", "relevance", "overall")
+
+@dataclass(slots=True)
+class Scores:
+    """Evaluator scores out of 10; None until the solution has been scored on that dimension"""
+    novelty: Optional[float] = None
+    feasibility: Optional[float] = None
+    impact: Optional[float] = None
+    relevance: Optional[float] = None
+    overall: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, scores: Dict[str, Any]) -> "Scores":
+        return cls(**{name: scores[name] for name in SCORE_FIELDS if name in scores})
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in SCORE_FIELDS if getattr(self, name) is not None}
+
+@dataclass(slots=True)
+class Solution:
+    root_cause: str
+    domain: str
+    key_idea: str
+    content: str
+    title: str = ""
+    key_idea_application: str = ""
+    implementation: str = ""
+    scores: Scores = field(default_factory=Scores)
+    type: str = "domain_inspired"
+    solution_number: int = 1
+    id: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, solution: Dict[str, Any], strings: Dict[str, str] = None) -> "Solution":
+        """Build from a solution record; `strings` lets solutions share one copy of repeated text"""
+        strings = {} if strings is None else strings
+        share = lambda text: strings.setdefault(text, text)
+        return cls(
+            root_cause=share(solution["root_cause"]),
+            domain=share(solution.get("domain", "")),
+            key_idea=share(solution.get("key_idea", "")),
+            content=solution["content"],
+            title=solution.get("title", ""),
+            key_idea_application=solution.get("key_idea_application", ""),
+            implementation=solution.get("implementation", ""),
+            scores=Scores.from_dict(solution.get("scores", {})),
+            type=share(solution.get("type", "domain_inspired")),
+            solution_number=solution.get("solution_number", 1),
+            id=solution.get("id")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        solution = {
+            "root_cause": self.root_cause,
+            "type": self.type,
+            "domain": self.domain,
+            "solution_number": self.solution_number,
+            "key_idea": self.key_idea,
+            "content": self.content,
+            "title": self.title,
+            "key_idea_application": self.key_idea_application,
+            "implementation": self.implementation,
+            "scores": self.scores.to_dict()
+        }
+        if self.id is not None:
+            solution["id"] = self.id
+        return solution
+
+@dataclass(slots=True)
+class CauseNode:
+    cause: str
+    parent: int  # Index of the parent node in CauseTree.nodes; -1 for the root cause
+    depth: int
+    pruned: bool = False  # Not explored because its leaves would never be used
+
+@dataclass(slots=True)
+class CauseTree:
+    """A cause tree stored as a flat, depth-first list of nodes with parent indices.
+
+    `leaves` holds the indices of the unpruned leaf nodes, left to right, so
+    the deepest causes can be read without walking the tree.
+    """
+    nodes: List[CauseNode] = field(default_factory=list)
+    leaves: List[int] = field(default_factory=list)
+
+    @property
+    def cause(self) -> str:
+        return self.nodes[0].cause
+
+    def leaf_causes(self, limit: int = None) -> List[str]:
+        return [self.nodes[i].cause for i in self.leaves[:limit]]
+
+    def children(self, index: int) -> List[int]:
+        return [i for i in range(index + 1, len(self.nodes)) if self.nodes[i].parent == index]
+
+    @classmethod
+    def from_nested(cls, root: Dict[str, Any]) -> "CauseTree":
+        """Flatten a nested {"cause", "children"} tree"""
+        tree = cls()
+        stack = [(root, -1, 0)]
+        while stack:
+            node, parent, depth = stack.pop()
+            index = len(tree.nodes)
+            pruned = bool(node.get("pruned"))
+            tree.nodes.append(CauseNode(node["cause"], parent, depth, pruned))
+            if not node["children"] and not pruned:
+                tree.leaves.append(index)
+            # Reversed so children are visited, and numbered, left to right
+            stack.extend((child, index, depth + 1) for child in reversed(node["children"]))
+        return tree
+
+    def to_nested(self) -> Dict[str, Any]:
+        """The nested {"cause", "children"} form used by the report"""
+        nested = []
+        for node in self.nodes:
+            entry = {"cause": node.cause, "children": []}
+            if node.pruned:
+                entry["pruned"] = True
+            nested.append(entry)
+            if node.parent >= 0:
+                nested[node.parent]["children"].append(entry)
+        return nested[0]
+
+@dataclass(slots=True)
+class AnalysisResult:
+    problem: str
+    domains: List[str] = field(default_factory=list)
+    cause_trees: List[CauseTree] = field(default_factory=list)
+    solutions: List[Solution] = field(default_factory=list)  # Best first
+    metrics: Dict[str, Any] = field(default_factory=dict)  # Stage and LLM call trace (see metrics.py)
+
+    @classmethod
+    def from_dict(cls, results: Dict[str, Any]) -> "AnalysisResult":
+        """Convert the dict returned by analyze_problem"""
+        strings = {}  # Many solutions share a domain, key idea and root cause
+        return cls(
+            problem=results["problem"],
+            domains=list(results["domains"]),
+            cause_trees=[CauseTree.from_nested(tree) for tree in results["cause_trees"]],
+            solutions=[Solution.from_dict(solution, strings) for solution in results["solutions"]],
+            metrics=results.get("metrics", {})
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The plain dict form returned by analyze_problem and used by the report"""
+        results = {
+            "problem": self.problem,
+            "domains": list(self.domains),
+            "cause_trees": [tree.to_nested() for tree in self.cause_trees],
+            "solutions": [solution.to_dict() for solution in self.solutions]
+        }
+        if self.metrics:
+            results["metrics"] = self.metrics
+        return results
+
+def dumps(value: Any) -> bytes:
+    """Serialize a model (or any JSON-compatible value) to JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_to_json).encode()
+
+def _to_json(value: Any) -> Any:
+    if hasattr(value, "__dataclass_fields__"):
+        return asdict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
@@ -0,0 +1,163 @@
+import time
+import queue
+import asyncio
+import bisect
+import threading
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from config import EVALUATION_BATCH_SIZE, EVALUATION_WORKERS, EVALUATION_BATCH_LINGER
+
+_DONE = object()  # Queue sentinel telling a worker to stop
+
+def _score_key(solution: Dict[str, Any]) -> Tuple[float, int]:
+    # Equal scores rank in generation order (by solution id), however the evaluations finish
+    return -solution["scores"].get("overall", 0), solution.get("id", 0)
+
+class RankedSolutions:
+    """Solutions kept sorted by overall score (best first) as each evaluation lands"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._solutions = []
+
+    def add(self, solution: Dict[str, Any]):
+        key = _score_key(solution)
+        with self._lock:
+            # Insert after equal keys so solutions without ids keep their arrival order
+            index = bisect.bisect_right(self._keys, key)
+            self._keys.insert(index, key)
+            self._solutions.insert(index, solution)
+
+    def top(self, n: int = None) -> List[Dict[str, Any]]:
+        """The best n solutions evaluated so far (all of them when n is None)"""
+        with self._lock:
+            return list(self._solutions[:n])
+
+    def __len__(self):
+        with self._lock:
+            return len(self._solutions)
+
+class EvaluationPipeline:
+    """Evaluate solutions on worker threads while the rest are still being generated.
+
+    Producers call submit() the moment a solution exists. Each worker takes the
+    next solution, lingers up to `linger` seconds for more to fill a batch of
+    `batch_size`, and passes the batch to `evaluate_batch`, which scores the
+    solutions in place. on_evaluated, if given, is called with each solution
+    once it has been scored. close() waits for the queue to drain and returns
+    the ranked solutions.
+    """
+
+    def __init__(self, evaluate_batch: Callable[[List[Dict[str, Any]]], Any],
+                 workers: int = EVALUATION_WORKERS, batch_size: int = EVALUATION_BATCH_SIZE,
+                 linger: float = EVALUATION_BATCH_LINGER,
+                 on_evaluated: Callable[[Dict[str, Any]], Any] = None):
+        self.evaluate_batch = evaluate_batch
+        self.on_evaluated = on_evaluated
+        self.batch_size = max(1, batch_size)
+        self.linger = linger
+        self.ranked = RankedSolutions()
+        self._queue = queue.Queue()
+        # Workers run in a copy of the creator's context, like DagExecutor nodes
+        self._workers = [threading.Thread(target=contextvars.copy_context().run, args=(self._work,), daemon=True)
+                         for _ in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, solution: Dict[str, Any]):
+        self._queue.put(solution)
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Wait for every submitted solution to be evaluated and return them best first"""
+        for _ in self._workers:
+            self._queue.put(_DONE)
+        for worker in self._workers:
+            worker.join()
+        return self.ranked.top()
+
+    def _work(self):
+        while True:
+            first = self._queue.get()
+            if first is _DONE:
+                return
+            batch, done = self._fill_batch(first)
+            try:
+                self.evaluate_batch(batch)
+            except Exception as e:
+                # Keep default scores; the solutions still need to be ranked
+                print(f"Error evaluating solutions: {e}")
+            for solution in batch:
+                self.ranked.add(solution)
+                if self.on_evaluated:
+                    self.on_evaluated(solution)
+            if done:
+                return
+
+    def _fill_batch(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+class AsyncEvaluationPipeline:
+    """Async variant of EvaluationPipeline using worker tasks on the running event loop"""
+
+    def __init__(self, evaluate_batch: Callable[[List[Dict[str, Any]]], Awaitable[Any]],
+                 workers: int = EVALUATION_WORKERS, batch_size: int = EVALUATION_BATCH_SIZE,
+                 linger: float = EVALUATION_BATCH_LINGER,
+                 on_evaluated: Callable[[Dict[str, Any]], Any] = None):
+        self.evaluate_batch = evaluate_batch
+        self.on_evaluated = on_evaluated
+        self.batch_size = max(1, batch_size)
+        self.linger = linger
+        self.ranked = RankedSolutions()
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(max(1, workers))]
+
+    def submit(self, solution: Dict[str, Any]):
+        self._queue.put_nowait(solution)
+
+    async def close(self) -> List[Dict[str, Any]]:
+        """Wait for every submitted solution to be evaluated and return them best first"""
+        for _ in self._workers:
+            self._queue.put_nowait(_DONE)
+        await asyncio.gather(*self._workers)
+        return self.ranked.top()
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            if first is _DONE:
+                return
+            batch, done = [first], False
+            deadline = loop.time() + self.linger
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining) if remaining > 0 else self._queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+            try:
+                await self.evaluate_batch(batch)
+            except Exception as e:
+                print(f"Error evaluating solutions: {e}")
+            for solution in batch:
+                self.ranked.add(solution)
+                if self.on_evaluated:
+                    self.on_evaluated(solution)
+            if done:
+                return
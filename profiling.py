@@ -0,0 +1,275 @@
+import os
+import sys
+import time
+import json
+import uuid
+import random
+import pstats
+import cProfile
+import threading
+import contextvars
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from config import PROFILE_SAMPLE_RATE, PROFILE_DIR, PROFILE_STACK_INTERVAL
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# From Python 3.12 cProfile is built on sys.monitoring: only one profiler can be
+# active in the process at a time, and it sees every thread. A session then
+# runs a single profiler from start to finish instead of one per thread.
+SHARED_PROFILER = sys.version_info >= (3, 12)
+
+class _ThreadProfile:
+    """One thread's share of a profiled analysis"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.profile = None if SHARED_PROFILER else cProfile.Profile()
+        self.depth = 0  # Nested stages the thread is currently inside
+        self.cpu = 0.0
+        self.wall = 0.0
+        self.cpu_started = 0.0
+        self.wall_started = 0.0
+        self.samples: List[Tuple[List[int], float]] = []
+
+class ProfileSession:
+    """Profiles one analysis across every thread that works on it.
+
+    A thread is profiled with its own cProfile.Profile while it is inside the
+    analysis or one of its stages (see metrics.span), and its wall-clock and
+    CPU time there are accounted. A sampler thread records those threads'
+    call stacks every `interval` seconds for a speedscope flame graph.
+    Async analyses share their event loop thread, so its profile also
+    includes anything else running on that loop.
+
+    With SHARED_PROFILER (Python 3.12+) one profiler covers the whole session,
+    so the pstats file also includes other threads busy at the same time,
+    and the LLM time is taken from the analysis threads' stack samples. If a
+    profiler cannot be enabled (e.g. another profiled analysis holds the only
+    one), the session carries on with stack samples alone.
+    """
+
+    def __init__(self, interval: float = PROFILE_STACK_INTERVAL):
+        self.id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.interval = interval
+        self.started = time.monotonic()
+        self._threads: Dict[int, _ThreadProfile] = {}
+        self._frames: Dict[Tuple[str, str, int], int] = {}
+        self._lock = threading.Lock()
+        self.profile_error = None
+        self._profile = self._enable(cProfile.Profile()) if SHARED_PROFILER else None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True, name=f"profiler-{self.id}")
+        self._sampler.start()
+
+    def _enable(self, profile: cProfile.Profile) -> Optional[cProfile.Profile]:
+        """Enable a profiler, or note why it cannot be; profiling must never break an analysis"""
+        try:
+            profile.enable()
+            return profile
+        except ValueError as e:  # "Another profiling tool is already active"
+            self.profile_error = str(e)
+            return None
+
+    def enter(self):
+        """Start (or continue) profiling the calling thread"""
+        ident = threading.get_ident()
+        with self._lock:
+            thread = self._threads.get(ident)
+            if thread is None:
+                thread = self._threads[ident] = _ThreadProfile(threading.current_thread().name)
+        thread.depth += 1
+        if thread.depth == 1:
+            thread.cpu_started = time.thread_time()
+            thread.wall_started = time.monotonic()
+            if thread.profile is not None:
+                thread.profile = self._enable(thread.profile)
+
+    def exit(self):
+        thread = self._threads[threading.get_ident()]
+        thread.depth -= 1
+        if thread.depth == 0:
+            if thread.profile is not None:
+                thread.profile.disable()
+            thread.cpu += time.thread_time() - thread.cpu_started
+            thread.wall += time.monotonic() - thread.wall_started
+
+    def _frame_index(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frames.get(key)
+        if index is None:
+            index = self._frames[key] = len(self._frames)
+        return index
+
+    def _sample(self):
+        last = time.monotonic()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, thread in self._threads.items():
+                    frame = frames.get(ident)
+                    if thread.depth <= 0 or frame is None:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(self._frame_index(frame.f_code))
+                        frame = frame.f_back
+                    thread.samples.append((stack[::-1], now - last))
+            last = now
+
+    def finish(self, llm_call_seconds: float = 0.0) -> Dict[str, Any]:
+        """Stop profiling, write the pstats and speedscope files and return the time accounting.
+
+        Profiled thread time is split into local CPU, blocking LLM calls,
+        time.sleep and other waiting. It is in thread-seconds, so concurrent
+        threads can add up to more than the wall-clock time. Async LLM calls
+        do not block a thread, so their time is only in llm_call_seconds (the
+        summed duration of every call, from the metrics trace).
+        """
+        self.exit()  # The thread that started the session
+        if self._profile is not None:
+            self._profile.disable()
+        self._stop.set()
+        self._sampler.join()
+        wall = time.monotonic() - self.started
+
+        stats = None
+        profiles = [self._profile] if SHARED_PROFILER else [thread.profile for thread in self._threads.values()]
+        for profile in profiles:
+            if profile is None:
+                continue
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            except TypeError:
+                pass  # Nothing was recorded on this thread
+
+        thread_seconds = sum(thread.wall for thread in self._threads.values())
+        cpu_seconds = sum(thread.cpu for thread in self._threads.values())
+        if SHARED_PROFILER or stats is None:
+            # The profile may include other threads; the samples are this analysis's own.
+            # time.sleep is invisible to them, so sleeping counts as waiting.
+            llm_seconds, sleep_seconds = self.sampled_llm_time(), 0.0
+        else:
+            llm_seconds, sleep_seconds = llm_time(stats), sleep_time(stats)
+        summary = {
+            "id": self.id,
+            "profiler": "shared" if SHARED_PROFILER else "per-thread",
+            "wall_seconds": round(wall, 3),
+            "threads": len(self._threads),
+            "thread_seconds": round(thread_seconds, 3),
+            "cpu_seconds": round(cpu_seconds, 3),
+            "llm_seconds": round(llm_seconds, 3),
+            "sleep_seconds": round(sleep_seconds, 3),
+            # Blocked on locks, queues and other threads, or awaiting async I/O
+            "waiting_seconds": round(max(0.0, thread_seconds - cpu_seconds - llm_seconds - sleep_seconds), 3),
+            "llm_call_seconds": round(llm_call_seconds, 3),
+            "top_functions": top_functions(stats) if stats else []
+        }
+        if self.profile_error:
+            summary["profile_error"] = self.profile_error
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base_path = os.path.join(PROFILE_DIR, self.id)
+        if stats:
+            stats.dump_stats(f"{base_path}.pstats")
+            summary["pstats"] = f"{base_path}.pstats"
+        with open(f"{base_path}.speedscope.json", "w", encoding="utf-8") as f:
+            json.dump(self.speedscope(), f)
+        summary["speedscope"] = f"{base_path}.speedscope.json"
+
+        print(f"Profile {self.id}: {summary['wall_seconds']}s wall, {summary['thread_seconds']} thread-seconds "
+              f"({summary['llm_seconds']}s in LLM calls, {summary['sleep_seconds']}s sleeping, {summary['cpu_seconds']}s CPU, "
+              f"{summary['waiting_seconds']}s waiting); written to {base_path}.*")
+        return summary
+
+    def sampled_llm_time(self) -> float:
+        """Seconds of stack samples inside an invoke() called by the analyzer's _invoke"""
+        names = {index: name for (name, _, _), index in self._frames.items()}
+        total = 0.0
+        for thread in self._threads.values():
+            for stack, weight in thread.samples:
+                if any(names[caller] == "_invoke" and names[callee] == "invoke" for caller, callee in zip(stack, stack[1:])):
+                    total += weight
+        return total
+
+    def speedscope(self) -> Dict[str, Any]:
+        """The sampled call stacks in speedscope's file format, one profile per thread"""
+        frames = [None] * len(self._frames)
+        for (name, filename, line), index in self._frames.items():
+            frames[index] = {"name": name, "file": filename, "line": line}
+        profiles = []
+        for thread in self._threads.values():
+            if not thread.samples:
+                continue
+            weights = [round(weight, 6) for _, weight in thread.samples]
+            profiles.append({
+                "type": "sampled",
+                "name": thread.name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 6),
+                "samples": [stack for stack, _ in thread.samples],
+                "weights": weights
+            })
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": f"Analysis {self.id}",
+            "exporter": "lateral-thinking profiling.py",
+            "shared": {"frames": frames},
+            "profiles": profiles
+        }
+
+def llm_time(stats: pstats.Stats) -> float:
+    """Seconds spent in blocking LLM calls, i.e. in the invoke() called by the analyzer's _invoke"""
+    total = 0.0
+    for (filename, line, name), (_, _, _, _, callers) in stats.stats.items():
+        if name == "invoke":
+            total += sum(caller_stats[3] for caller, caller_stats in callers.items() if caller[2] == "_invoke")
+    return total
+
+def sleep_time(stats: pstats.Stats) -> float:
+    """Seconds spent in time.sleep, except inside LLM backends (the fake backend's simulated latency)"""
+    total = 0.0
+    for (filename, line, name), (_, _, _, _, callers) in stats.stats.items():
+        if name == "<built-in method time.sleep>":
+            total += sum(caller_stats[3] for caller, caller_stats in callers.items()
+                         if not caller[0].endswith("llm_backends.py"))
+    return total
+
+def top_functions(stats: pstats.Stats, limit: int = 10) -> List[Dict[str, Any]]:
+    """The functions with the most time spent in their own code"""
+    entries = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [{"function": f"{os.path.basename(filename)}:{line}({name})", "calls": calls,
+             "own_seconds": round(own, 4), "cumulative_seconds": round(cumulative, 4)}
+            for (filename, line, name), (_, calls, own, cumulative, _) in entries]
+
+current_session: contextvars.ContextVar = contextvars.ContextVar("profile_session", default=None)
+
+def start_session(config: Optional[Dict[str, Any]]) -> Optional[Tuple[ProfileSession, contextvars.Token]]:
+    """Profile this analysis if its config asks for it ("profile": True) or it is picked at random.
+
+    PROFILE_SAMPLE_RATE is the fraction of analyses picked, so profiling can
+    stay enabled in production at a small average cost.
+    """
+    requested = bool((config or {}).get("profile"))
+    if not requested and not (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE):
+        return None
+    session = ProfileSession()
+    session.enter()
+    return session, current_session.set(session)
+
+def finish_session(started: Tuple[ProfileSession, contextvars.Token], llm_call_seconds: float) -> Dict[str, Any]:
+    session, token = started
+    current_session.reset(token)
+    return session.finish(llm_call_seconds)
+
+def enter_stage() -> Optional[ProfileSession]:
+    """Profile the calling thread if it is working on a profiled analysis"""
+    session = current_session.get()
+    if session is not None:
+        session.enter()
+    return session
@@ -0,0 +1,112 @@
+import time
+import random
+import asyncio
+import threading
+from typing import Dict, Optional
+from config import RATE_LIMITS, RATE_LIMIT_MAX_RETRIES, RATE_LIMIT_BACKOFF_BASE, RATE_LIMIT_BACKOFF_MAX
+
+class TokenBucket:
+    """A bucket holding up to `capacity` units that refills at `capacity` per minute"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` from the bucket and return how long the caller must wait for it.
+
+        The level may go negative: later callers then queue up behind this
+        reservation instead of racing for the same refill.
+        """
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # Never reserve more than a full bucket, or a single huge call could never run
+        self.level -= min(amount, self.capacity)
+        if self.level >= 0:
+            return 0.0
+        return -self.level / self.rate
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for one LLM role.
+
+    Callers only wait when a limit is about to be exceeded. When the provider
+    answers with a 429 the whole limiter is paused, so every caller backs off
+    rather than just the one that was rejected.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self._requests:
+                wait = max(wait, self._requests.reserve(1, now))
+            if self._tokens and tokens:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+            return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a request of roughly `tokens` tokens may be sent; returns the time waited"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """Async variant of acquire"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Pause the limiter after a 429 and return the delay before retrying"""
+        if retry_after is None:
+            delay = min(RATE_LIMIT_BACKOFF_MAX, RATE_LIMIT_BACKOFF_BASE * (2 ** attempt))
+            delay *= random.uniform(0.5, 1.0)  # Jitter so waiting callers do not retry in lockstep
+        else:
+            delay = retry_after
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(role: str) -> RateLimiter:
+    """Return the process-wide rate limiter for an LLM role (analyst, challenger, evaluator, domain)"""
+    with _limiters_lock:
+        if role not in _limiters:
+            limits = RATE_LIMITS.get(role, {})
+            _limiters[role] = RateLimiter(limits.get("requests_per_minute"), limits.get("tokens_per_minute"))
+        return _limiters[role]
+
+def estimate_tokens(prompt_text: str, completion_tokens: int = 256) -> int:
+    """Rough token count for a call: ~4 characters per prompt token plus the completion allowance"""
+    return len(prompt_text) // 4 + completion_tokens
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True if an exception from an LLM call is a 429 from the provider"""
+    if type(error).__name__ == "RateLimitError":
+        return True
+    return getattr(error, "status_code", None) == 429
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After header from a 429 response, if the provider sent one"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def should_retry(error: Exception, attempt: int) -> bool:
+    """True if a failed call should be retried after backing off"""
+    return is_rate_limit_error(error) and attempt < RATE_LIMIT_MAX_RETRIES
@@ -1,14 +1,25 @@
 import os
+import re
 import html
+import hashlib
+import threading
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional
 from evaluation import parse_solution_content
-from config import PROBLEM_STATEMENT
+from compression import StaticAsset
+from analysis_levels import LEVEL_SUMMARIES
+from config import PROBLEM_STATEMENT, REPORT_ARCHIVE_DIR, EMBED_CSS
+
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")
 
 def tree_to_html(tree, level=0):
     """Helper method to convert a cause tree to HTML"""
     html_content = f'<div style="margin-left: {level*20}px">\n'
-    html_content += f'<p>{html.escape(tree["cause"])}</p>\n'
+    if tree.get("pruned"):
+        # Left unexplored because its leaves were beyond the leaf-cause budget
+        html_content += f'<p class="pruned-cause" title="Not explored further">{html.escape(tree["cause"])}</p>\n'
+    else:
+        html_content += f'<p>{html.escape(tree["cause"])}</p>\n'
     
     if tree['children']:
         html_content += '<div class="cause-node">\n'
@@ -19,17 +30,101 @@ def tree_to_html(tree, level=0):
     html_content += '</div>\n'
     return html_content
 
-def generate_html_report(results: Dict[str, Any], show_loading=False) -> str:
-    """Generate an HTML report with embedded CSS"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def cause_tree_to_html(index, tree):
+    """Render one root cause and its tree as a card"""
+    html_content = f'<div class="cause-tree" id="cause-tree-{index}" data-index="{index}">\n<h3>Root Cause {index}: {html.escape(tree["cause"])}</h3>\n'
     
-    # Read the CSS file and embed it
-    css_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")
-    with open(css_path, 'r') as css_file:
-        css_content = css_file.read()
+    # Create a container for the children only
+    html_content += '<div class="cause-node">\n'
+    for child in tree['children']:
+        html_content += tree_to_html(child)
+    html_content += '</div>\n'
+    
+    html_content += '</div>\n'
+    return html_content
+
+def domain_to_html(domain):
+    """Render a knowledge domain tag"""
+    return f'<div class="domain-tag">{html.escape(domain)}</div>\n'
+
+def solution_sections(solution):
+    """The parsed sections of a solution, parsing its content only for records made before they were stored"""
+    if "title" in solution:
+        return solution
+    return parse_solution_content(solution["content"])
+
+def solution_card_to_html(index, solution):
+    """Render one solution with its scores as a card"""
+    overall_score = solution['scores'].get('overall', 0)
     
-    # Create HTML content with embedded CSS
-    html_content = f"""
+    sections = solution_sections(solution)
+    display_title = sections["title"] or f"Solution {index}"
+    card_id = f' id="solution-{solution["id"]}"' if "id" in solution else ""
+    
+    html_content = f'''
+        <div class="solution-card"{card_id}>
+            <h3>{html.escape(display_title)}</h3>
+            
+            <div class="tags-container">
+                <div class="solution-type">Based on: {html.escape(solution['root_cause'][:40])}{"..." if len(solution['root_cause']) > 40 else ""}</div>
+    '''
+    
+    if solution['type'] == 'domain_inspired':
+        html_content += f'<div class="domain-inspiration">Inspired by: {html.escape(solution["domain"])}</div>'
+    
+    html_content += f'''
+            </div>
+            
+            <div class="score-grid">
+                <div class="score-item">
+                    <div class="score-label">Novelty:</div>
+                    <div class="score-value">{solution['scores'].get('novelty', 'N/A')}</div>
+                </div>
+                <div class="score-item">
+                    <div class="score-label">Feasibility:</div>
+                    <div class="score-value">{solution['scores'].get('feasibility', 'N/A')}</div>
+                </div>
+                <div class="score-item">
+                    <div class="score-label">Impact:</div>
+                    <div class="score-value">{solution['scores'].get('impact', 'N/A')}</div>
+                </div>
+                <div class="score-item">
+                    <div class="score-label">Relevance:</div>
+                    <div class="score-value">{solution['scores'].get('relevance', 'N/A')}</div>
+                </div>
+                <div class="score-item inverted">
+                    <div class="score-label">Overall:</div>
+                    <div class="score-value">{overall_score:.1f}/10</div>
+                </div>
+            </div>
+            
+            <div class="solution-content">
+    '''
+    
+    key_idea = sections["key_idea_application"]
+    if key_idea:
+        html_content += f'''
+                <div class="section-content">
+                    <strong>KEY IDEA APPLICATION:</strong> {html.escape(key_idea)}
+                </div>
+        '''
+    
+    implementation = sections["implementation"]
+    if implementation:
+        html_content += f'''
+                <div class="section-content">
+                    <strong>IMPLEMENTATION:</strong> {html.escape(implementation)}
+                </div>
+        '''
+    
+    html_content += '''
+            </div>
+        </div>
+    '''
+    return html_content
+
+# Static page shell, built once; only the {fields} change between pages
+PAGE_HEAD_TEMPLATE = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -39,10 +134,11 @@ def generate_html_report(results: Dict[str, Any], show_loading=False) -> str:
         <link rel="preconnect" href="https://fonts.googleapis.com">
         <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
         <link href="https://fonts.googleapis.com/css2?family=DM+Serif+Text&family=Lexend:wght@300;400&display=swap" rel="stylesheet">
-        <style>
-        {css_content}
-        </style>
+        {style}
     </head>
+"""
+
+PAGE_TOP_TEMPLATE = """
     <body>
         <div class="top-bar"></div>
         <header class="header">
@@ -63,7 +159,7 @@ def generate_html_report(results: Dict[str, Any], show_loading=False) -> str:
                             required 
                             minlength="75" 
                             maxlength="300" 
-                            placeholder="Describe the problem...">{html.escape(results['problem'])}</textarea>
+                            placeholder="Describe the problem...">{problem}</textarea>
                         <div class="character-count">
                             <span id="charCount">0</span>/300 characters (75 minimum)
                         </div>
@@ -75,21 +171,21 @@ def generate_html_report(results: Dict[str, Any], show_loading=False) -> str:
                                 <input type="radio" name="analysis_level" value="fastest" checked>
                                 <div class="option-content">
                                     <span class="option-name">Fastest</span>
-                                    <span class="option-desc">Quick analysis generates four ideas in about 30 seconds</span>
+                                    <span class="option-desc">{descriptions[fastest]}</span>
                                 </div>
                             </label>
                             <label class="level-option">
                                 <input type="radio" name="analysis_level" value="balanced">
                                 <div class="option-content">
                                     <span class="option-name">Balanced</span>
-                                    <span class="option-desc">Standard depth analysis generates 27 ideas in 3-4 minutes</span>
+                                    <span class="option-desc">{descriptions[balanced]}</span>
                                 </div>
                             </label>
                             <label class="level-option">
                                 <input type="radio" name="analysis_level" value="deepest">
                                 <div class="option-content">
                                     <span class="option-name">Deepest</span>
-                                    <span class="option-desc">Thorough analysis generates 64 ideas in around 8 minutes</span>
+                                    <span class="option-desc">{descriptions[deepest]}</span>
                                 </div>
                             </label>
                         </div>
@@ -108,11 +204,95 @@ def generate_html_report(results: Dict[str, Any], show_loading=False) -> str:
         </div>
 
         <div class="main-container">
+"""
+
+_css_lock = threading.Lock()
+_css_cache = {"mtime": None, "css": "", "version": "", "asset": None, "heads": {}, "empty_pages": {}}
+
+def _refresh_css():
+    """Reload style.css, and drop everything rendered from it, when the file has changed"""
+    mtime = os.stat(CSS_PATH).st_mtime_ns
+    if mtime != _css_cache["mtime"]:
+        with open(CSS_PATH, 'r') as css_file:
+            css = css_file.read()
+        version = hashlib.sha256(css.encode()).hexdigest()[:12]
+        _css_cache.update(mtime=mtime, css=css, version=version, asset=None, heads={}, empty_pages={})
+
+def load_css() -> str:
+    """The contents of style.css, re-read only when the file changes on disk"""
+    with _css_lock:
+        _refresh_css()
+        return _css_cache["css"]
+
+def css_asset() -> StaticAsset:
+    """style.css with its validators and pre-compressed copies, rebuilt when the file changes"""
+    with _css_lock:
+        _refresh_css()
+        if _css_cache["asset"] is None:
+            _css_cache["asset"] = StaticAsset(_css_cache["css"].encode(), _css_cache["mtime"] / 1e9)
+        return _css_cache["asset"]
+
+def head_html(embed_css: bool) -> str:
+    """The page head, with style.css embedded or linked"""
+    with _css_lock:
+        _refresh_css()
+        heads = _css_cache["heads"]
+        if embed_css not in heads:
+            # The version changes with the file, so browsers can cache each version indefinitely
+            if embed_css:
+                style = f"<style>\n{_css_cache['css']}\n</style>"
+            else:
+                style = f'<link rel="stylesheet" href="/style.css?v={_css_cache["version"]}">'
+            heads[embed_css] = PAGE_HEAD_TEMPLATE.format(style=style)
+        return heads[embed_css]
+
+def render_empty_form_page(descriptions: Dict[str, str] = None) -> bytes:
+    """The page with just the form, as served for GET / and /reset.
+    
+    It only differs between requests in its timestamp and the analysis level
+    descriptions (form_handler passes in the estimated ideas and durations,
+    which change with observed latencies), so it is rendered once per set of
+    descriptions (and again whenever style.css changes) and the timestamp is
+    filled in.
+    """
+    descriptions = descriptions or LEVEL_SUMMARIES
+    key = (EMBED_CSS, tuple(descriptions.values()))
+    with _css_lock:
+        _refresh_css()
+        pages = _css_cache["empty_pages"]
+        page = pages.get(key)
+    if page is None:
+        marker = "\0timestamp\0"
+        results = {"problem": PROBLEM_STATEMENT, "domains": [], "cause_trees": [], "solutions": []}
+        html_content = ''.join(iter_html_report(results, timestamp=marker, descriptions=descriptions))
+        page = tuple(part.encode() for part in html_content.split(marker, 1))
+        with _css_lock:
+            # Only the current descriptions are worth keeping
+            _css_cache["empty_pages"] = {k: v for k, v in _css_cache["empty_pages"].items() if k[1] == key[1]}
+            _css_cache["empty_pages"][key] = page
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S").encode()
+    return page[0] + timestamp + page[1]
+
+def iter_html_report(results: Dict[str, Any], show_loading=False, embed_css: bool = None,
+                     timestamp: str = None, descriptions: Dict[str, str] = None) -> Iterator[str]:
+    """Yield the HTML report with embedded CSS section by section.
+    
+    The head comes first so a browser can start fetching fonts while the cause
+    trees, domains and solution cards are still being rendered. The form's
+    analysis levels are described by `descriptions`, or just LEVEL_SUMMARIES.
     """
+    if timestamp is None:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    # Head with the CSS embedded from the cached copy, or linked to /style.css
+    yield head_html(EMBED_CSS if embed_css is None else embed_css)
+    
+    yield PAGE_TOP_TEMPLATE.format(timestamp=timestamp, problem=html.escape(results['problem']),
+                                   descriptions=descriptions or LEVEL_SUMMARIES)
     
     # 1. Root Causes Section - display with loading state if needed
     if not results['cause_trees'] and show_loading:
-        html_content += """
+        yield """
             <section>
                 <h2>Systemic Root Causes</h2>
                 <p class="section-intro">By repeatedly asking "why," we identify deeper systemic causes behind the problem. Each branch explores a different causal pathway.</p>
@@ -120,31 +300,25 @@ def generate_html_report(results: Dict[str, Any], show_loading=False) -> str:
             </section>
         """
     else:
-        html_content += """
+        yield """
             <section>
                 <h2>Systemic Root Causes</h2>
                 <p class="section-intro">By repeatedly asking "why," we identify deeper systemic causes behind the problem. Each branch explores a different causal pathway.</p>
         """
         
         # Add root cause trees
+        yield '<div id="cause-trees">\n'
         for i, tree in enumerate(results['cause_trees'], 1):
-            html_content += f'<div class="cause-tree">\n<h3>Root Cause {i}: {html.escape(tree["cause"])}</h3>\n'
-            
-            # Create a container for the children only
-            html_content += '<div class="cause-node">\n'
-            for child in tree['children']:
-                html_content += tree_to_html(child)
-            html_content += '</div>\n'
-            
-            html_content += '</div>\n'
+            yield cause_tree_to_html(i, tree)
+        yield '</div>\n'
         
-        html_content += """
+        yield """
             </section>
         """
     
     # 2. Knowledge Domains Section - display with loading state if needed
     if not results['domains'] and show_loading:
-        html_content += """
+        yield """
             <section>
                 <h2>Knowledge Domains</h2>
                 <p class="section-intro">These domains provide cross-disciplinary inspiration for innovative solutions, encouraging lateral thinking that breaks conventional problem-solving patterns.</p>
@@ -152,25 +326,25 @@ def generate_html_report(results: Dict[str, Any], show_loading=False) -> str:
             </section>
         """
     else:
-        html_content += """
+        yield """
             <section>
                 <h2>Knowledge Domains</h2>
                 <p class="section-intro">These domains provide cross-disciplinary inspiration for innovative solutions, encouraging lateral thinking that breaks conventional problem-solving patterns.</p>
-                <div class="domains-section">
+                <div class="domains-section" id="domains">
         """
         
         # Add domains
         for domain in results['domains']:
-            html_content += f'<div class="domain-tag">{html.escape(domain)}</div>\n'
+            yield domain_to_html(domain)
         
-        html_content += """
+        yield """
                 </div>
             </section>
         """
     
     # 3. Solutions Section - display with loading state if needed
     if not results['solutions'] and show_loading:
-        html_content += """
+        yield """
             <section>
                 <h2>Ideas</h2>
                 <p class="section-intro">These solutions draw inspiration from diverse knowledge domains to tackle the problem. Each solution addresses specific root causes identified in our analysis.</p>
@@ -178,126 +352,28 @@ def generate_html_report(results: Dict[str, Any], show_loading=False) -> str:
             </section>
         """
     else:
-        html_content += """
+        yield """
             <section>
                 <h2>Ideas</h2>
                 <p class="section-intro">These solutions draw inspiration from diverse knowledge domains to tackle the problem. Each solution addresses specific root causes identified in our analysis.</p>
-                <div class="solutions-grid">
+                <div class="solutions-grid" id="solutions">
         """
         
         # Add solutions
         for i, solution in enumerate(results['solutions'], 1):
-            overall_score = solution['scores'].get('overall', 0)
-            
-            # Parse solution content into sections
-            sections = parse_solution_content(solution['content'])
-            
-            # Extract the title from the solution title field (not from sections)
-            solution_title = ""
-            content_lines = solution["content"].strip().split('\n')
-            for line in content_lines:
-                if line.startswith("SOLUTION TITLE:"):
-                    solution_title = line.replace("SOLUTION TITLE:", "").strip()
-                    break
-            
-            display_title = solution_title if solution_title else f"Solution {i}"
-            
-            html_content += f'''
-                <div class="solution-card">
-                    <h3>{display_title}</h3>
-                    
-                    <div class="tags-container">
-                        <div class="solution-type">Based on: {html.escape(solution['root_cause'][:40])}{"..." if len(solution['root_cause']) > 40 else ""}</div>
-            '''
-            
-            if solution['type'] == 'domain_inspired':
-                html_content += f'<div class="domain-inspiration">Inspired by: {html.escape(solution["domain"])}</div>'
-            
-            html_content += f'''
-                    </div>
-                    
-                    <div class="score-grid">
-                        <div class="score-item">
-                            <div class="score-label">Novelty:</div>
-                            <div class="score-value">{solution['scores'].get('novelty', 'N/A')}</div>
-                        </div>
-                        <div class="score-item">
-                            <div class="score-label">Feasibility:</div>
-                            <div class="score-value">{solution['scores'].get('feasibility', 'N/A')}</div>
-                        </div>
-                        <div class="score-item">
-                            <div class="score-label">Impact:</div>
-                            <div class="score-value">{solution['scores'].get('impact', 'N/A')}</div>
-                        </div>
-                        <div class="score-item">
-                            <div class="score-label">Relevance:</div>
-                            <div class="score-value">{solution['scores'].get('relevance', 'N/A')}</div>
-                        </div>
-                        <div class="score-item inverted">
-                            <div class="score-label">Overall:</div>
-                            <div class="score-value">{overall_score:.1f}/10</div>
-                        </div>
-                    </div>
-                    
-                    <div class="solution-content">
-            '''
-            
-            # Process KEY IDEA APPLICATION section
-            key_idea = ""
-            content_lines = solution["content"].strip().split('\n')
-            for i, line in enumerate(content_lines):
-                if line.startswith("KEY IDEA APPLICATION:"):
-                    key_idea = line[len("KEY IDEA APPLICATION:"):].strip()
-                    # Look for multi-line content
-                    next_idx = i + 1
-                    while next_idx < len(content_lines) and not content_lines[next_idx].startswith("IMPLEMENTATION:"):
-                        key_idea += " " + content_lines[next_idx].strip()
-                        next_idx += 1
-                    break
-            
-            if key_idea:
-                html_content += f'''
-                        <div class="section-content">
-                            <strong>KEY IDEA APPLICATION:</strong> {html.escape(key_idea)}
-                        </div>
-                '''
-            
-            # Process IMPLEMENTATION section
-            implementation = ""
-            start_collecting = False
-            for line in content_lines:
-                if start_collecting:
-                    # Check if we've reached a new section
-                    if any(line.startswith(section) for section in ["SOLUTION TITLE:", "KEY IDEA APPLICATION:"]):
-                        break
-                    implementation += " " + line.strip()
-                elif line.startswith("IMPLEMENTATION:"):
-                    implementation = line[len("IMPLEMENTATION:"):].strip()
-                    start_collecting = True
-            
-            if implementation:
-                html_content += f'''
-                        <div class="section-content">
-                            <strong>IMPLEMENTATION:</strong> {html.escape(implementation)}
-                        </div>
-                '''
-            
-            html_content += f'''
-                    </div>
-                </div>
-            '''
+            yield solution_card_to_html(i, solution)
         
-        html_content += """
+        yield """
                 </div>
             </section>
         """
     
-    html_content += """
+    yield """
         </div>
     """
 
     # Add JavaScript for character counting, validation, and processing overlay
-    html_content += """
+    yield """
         <script>
             document.addEventListener('DOMContentLoaded', function() {
                 const textarea = document.getElementById('problemInput');
@@ -332,6 +408,13 @@ def generate_html_report(results: Dict[str, Any], show_loading=False) -> str:
                         
                         // Store the hideOverlay function so it can be called when response is received
                         window.hideProcessingOverlay = hideOverlay;
+                        
+                        // Queue the analysis as a background job and poll for the report,
+                        // falling back to a normal form post in browsers without fetch
+                        if (window.fetch) {
+                            e.preventDefault();
+                            submitAsJob(form, hideOverlay);
+                        }
                     }
                 });
                 
@@ -340,15 +423,137 @@ def generate_html_report(results: Dict[str, Any], show_loading=False) -> str:
                 textarea.setSelectionRange(textarea.value.length, textarea.value.length);
             });
 
+            function showReport(html) {
+                document.open();
+                document.write(html);
+                document.close();
+            }
+
+            function submitAsJob(form, hideOverlay) {
+                // Pass on the page's query string, e.g. an admin ?profile=<token>
+                fetch('/jobs' + window.location.search, { method: 'POST', body: new URLSearchParams(new FormData(form)) })
+                    .then(response => response.json().then(data => ({ ok: response.ok, data: data })))
+                    .then(({ ok, data }) => {
+                        if (!ok) {
+                            throw new Error(data.error || 'The analysis could not be started.');
+                        }
+                        // Stream progress when the browser supports it, otherwise poll for the report
+                        if (window.EventSource) {
+                            followJob(data.events_url, hideOverlay);
+                        } else {
+                            pollJob(data.status_url, data.report_url, hideOverlay);
+                        }
+                    })
+                    .catch(error => {
+                        hideOverlay();
+                        alert(error.message);
+                    });
+            }
+
+            function pollJob(statusUrl, reportUrl, hideOverlay) {
+                fetch(statusUrl)
+                    .then(response => response.json())
+                    .then(job => {
+                        if (job.status === 'done') {
+                            return fetch(reportUrl).then(response => response.text()).then(showReport);
+                        }
+                        if (job.status === 'failed') {
+                            throw new Error(job.error || 'The analysis failed.');
+                        }
+                        setTimeout(() => pollJob(statusUrl, reportUrl, hideOverlay), 2000);
+                    })
+                    .catch(error => {
+                        hideOverlay();
+                        alert(error.message);
+                    });
+            }
+
+            function followJob(eventsUrl, hideOverlay) {
+                const source = new EventSource(eventsUrl);
+                let showingResults = false;
+                
+                // Swap the overlay for the (empty) result sections once there is something to show
+                function showResults() {
+                    if (showingResults) {
+                        return;
+                    }
+                    showingResults = true;
+                    hideOverlay();
+                    ['cause-trees', 'domains', 'solutions'].forEach(id => {
+                        document.getElementById(id).innerHTML = '';
+                    });
+                    const banner = document.createElement('div');
+                    banner.className = 'progress-banner';
+                    banner.id = 'progressBanner';
+                    document.querySelector('.main-container').prepend(banner);
+                }
+                
+                function setProgress(step, message) {
+                    setProcessingStep(step, message);
+                    const banner = document.getElementById('progressBanner');
+                    if (banner) {
+                        banner.textContent = message;
+                    }
+                }
+                
+                source.addEventListener('domains', event => {
+                    const data = JSON.parse(event.data);
+                    showResults();
+                    document.getElementById('domains').innerHTML = data.html;
+                    setProgress(1, 'Identifying root causes...');
+                });
+                source.addEventListener('causes', event => {
+                    setProgress(2, 'Planting root cause trees...');
+                });
+                source.addEventListener('tree', event => {
+                    const data = JSON.parse(event.data);
+                    showResults();
+                    const trees = document.getElementById('cause-trees');
+                    const existing = document.getElementById(`cause-tree-${data.index}`);
+                    if (existing) {
+                        existing.outerHTML = data.html;
+                    } else {
+                        // Trees can finish out of order; keep them in root cause order
+                        const later = Array.from(trees.children).find(el => Number(el.dataset.index) > data.index);
+                        trees.insertAdjacentHTML('beforeend', data.html);
+                        if (later) {
+                            trees.insertBefore(trees.lastElementChild, later);
+                        }
+                    }
+                    setProgress(3, 'Generating and evaluating ideas...');
+                });
+                ['solution', 'evaluation'].forEach(name => {
+                    source.addEventListener(name, event => {
+                        const data = JSON.parse(event.data);
+                        showResults();
+                        const existing = document.getElementById(`solution-${data.id}`);
+                        if (existing) {
+                            existing.outerHTML = data.html;
+                        } else {
+                            document.getElementById('solutions').insertAdjacentHTML('beforeend', data.html);
+                        }
+                    });
+                });
+                source.addEventListener('done', event => {
+                    source.close();
+                    // Replace the partial results with the finished, ranked report
+                    const data = JSON.parse(event.data);
+                    fetch(data.report_url)
+                        .then(response => response.text())
+                        .then(showReport);
+                });
+                source.addEventListener('failed', event => {
+                    source.close();
+                    hideOverlay();
+                    alert(JSON.parse(event.data).error || 'The analysis failed.');
+                });
+            }
+
             function resetForm() {
                 // Fetch a clean form from the server
                 fetch('/reset')
                     .then(response => response.text())
-                    .then(html => {
-                        document.open();
-                        document.write(html);
-                        document.close();
-                    })
+                    .then(showReport)
                     .catch(error => {
                         console.error('Error:', error);
                         // Fallback to page reload if fetch fails
@@ -403,51 +608,65 @@ def generate_html_report(results: Dict[str, Any], show_loading=False) -> str:
                 overlay.appendChild(steps);
                 document.body.appendChild(overlay);
                 
-                // Use variable timing for each step to better match the actual process
-                let currentStep = 0;
-                const stepTimes = [3000, 7000, 10000, 15000]; 
-                
-                function advanceStep() {
-                    if (currentStep < stepsList.length - 1) {
-                        currentStep++;
-                        document.querySelectorAll('.processing-step').forEach(el => el.classList.remove('active'));
-                        document.getElementById(`process-step-${currentStep}`).classList.add('active');
-                        
-                        // If we've reached the generation step, update the status text
-                        if (currentStep === 3) {
-                            status.textContent = 'Creating innovative solutions...';
-                        }
-                        
-                        // Schedule next step with appropriate timing
-                        if (currentStep < stepsList.length - 1) {
-                            setTimeout(advanceStep, stepTimes[currentStep]);
-                        }
-                    }
-                }
-                
-                // Start the progression
-                setTimeout(advanceStep, stepTimes[0]);
-                
+                // Steps are advanced by setProcessingStep as progress events arrive
                 return () => {
-                    // Clear any pending timeouts by using a more comprehensive approach
-                    let id = window.setTimeout(function() {}, 0);
-                    while (id--) {
-                        window.clearTimeout(id);
-                    }
-                    
                     if (document.body.contains(overlay)) {
                         document.body.removeChild(overlay);
                     }
                 };
             }
+
+            function setProcessingStep(index, message) {
+                const step = document.getElementById(`process-step-${index}`);
+                if (!step) {
+                    return;
+                }
+                document.querySelectorAll('.processing-step').forEach(el => el.classList.remove('active'));
+                step.classList.add('active');
+                document.querySelector('.processing-status').textContent = message;
+            }
         </script>
     </body>
     </html>
     """
+
+def render_html_report(results: Dict[str, Any], show_loading=False, embed_css: bool = None,
+                       descriptions: Dict[str, str] = None) -> bytes:
+    """Render the whole HTML report in memory"""
+    return ''.join(iter_html_report(results, show_loading, embed_css, descriptions=descriptions)).encode()
+
+def generate_html_report(results: Dict[str, Any], show_loading=False, report_path: str = None) -> str:
+    """Generate an HTML report with embedded CSS and save it to a file (de_bono_report.html by default)"""
+    if report_path is None:
+        report_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "de_bono_report.html")
+    with open(report_path, 'wb') as f:
+        f.write(render_html_report(results, show_loading, embed_css=True))
     
-    # Save the HTML content to a file
-    report_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "de_bono_report.html")
-    with open(report_path, 'w') as f:
-        f.write(html_content)
-    
-    return report_path
\ No newline at end of file
+    return report_path
+
+def archived_report_path(job_id: str) -> Optional[str]:
+    """Where a job's report is archived, or None when archiving is disabled or the ID is not a job ID"""
+    if not REPORT_ARCHIVE_DIR or not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        return None
+    return os.path.join(REPORT_ARCHIVE_DIR, f"{job_id}.html")
+
+def archive_html_report(job_id: str, html_bytes: bytes) -> Optional[str]:
+    """Save a rendered report under its job ID in REPORT_ARCHIVE_DIR, if configured"""
+    report_path = archived_report_path(job_id)
+    if report_path is None:
+        return None
+    os.makedirs(REPORT_ARCHIVE_DIR, exist_ok=True)
+    # Write then rename so a reader never sees a half-written report
+    temp_path = f"{report_path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(html_bytes)
+    os.replace(temp_path, report_path)
+    return report_path
+
+def load_archived_report(job_id: str) -> Optional[bytes]:
+    """An archived report's HTML, or None if there is none"""
+    report_path = archived_report_path(job_id)
+    if report_path is None or not os.path.exists(report_path):
+        return None
+    with open(report_path, 'rb') as f:
+        return f.read()
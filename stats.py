@@ -0,0 +1,6 @@
+from typing import List
+
+def percentile(values: List[float], fraction: float) -> float:
+    """The value below which `fraction` of the values fall (nearest rank; values must not be empty)"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
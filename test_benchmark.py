@@ -0,0 +1,22 @@
+import unittest
+from unittest import mock
+import benchmark
+from analysis_levels import get_analysis_config
+
+def unbatched_config(level):
+    # How solutions group into evaluation batches depends on timing, so score
+    # each on its own to make every role's call count deterministic
+    return {**get_analysis_config(level), "evaluation_batch_size": 1}
+
+class BenchLevelsTest(unittest.TestCase):
+    def test_back_to_back_runs_make_the_same_calls(self):
+        # Simulated calls must not spend the shared rate limits and throttle later runs
+        with mock.patch.object(benchmark, "get_analysis_config", unbatched_config):
+            first = benchmark.bench_levels(["deepest"], runs=2, latency=0.0, jitter=0.0)["deepest"]
+            second = benchmark.bench_levels(["deepest"], runs=2, latency=0.0, jitter=0.0)["deepest"]
+        self.assertEqual(first["calls_per_run"], second["calls_per_run"])
+        self.assertEqual(second["calls_per_run"]["evaluator"], second["solutions"])
+        self.assertLess(second["wall_seconds"]["max"], 5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from cache import ResponseCache
+
+class ResponseCacheEvictionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_evicts_least_recently_used_without_scanning_on_every_put(self):
+        cache = ResponseCache(os.path.join(self.directory, "responses.sqlite3"), max_bytes=10_000, evict_every=1000)
+        evictions = []
+        evict = ResponseCache._evict
+        with mock.patch.object(ResponseCache, "_evict", lambda self, conn, now: evictions.append(now) or evict(self, conn, now)):
+            for i in range(500):
+                cache.put(f"key{i}", "analyst", "x" * 100, ttl=60)
+        self.assertLessEqual(cache._stored_bytes(cache._connect()), 10_000)
+        self.assertLess(len(evictions), 50)
+        self.assertIsNone(cache.get("key0"))
+        self.assertEqual(cache.get("key499"), "x" * 100)
+
+    def test_periodic_check_drops_expired_entries(self):
+        cache = ResponseCache(os.path.join(self.directory, "responses.sqlite3"), max_bytes=10_000, evict_every=3)
+        cache.put("old", "analyst", "x", ttl=-1)
+        cache.put("a", "analyst", "x", ttl=60)
+        self.assertEqual(cache._stored_bytes(cache._connect()), 2)
+        cache.put("b", "analyst", "x", ttl=60)
+        self.assertEqual(cache._stored_bytes(cache._connect()), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+import gc
+import asyncio
+import threading
+import unittest
+from lateral_thinking import LateralThinkingEnhanced, extract_leaf_causes, format_numbered_causes, parse_batched_why
+from analysis_levels import get_analysis_config
+from evaluation import parse_batch_evaluation, parse_solution_content, split_numbered_blocks
+
+def stub_analyzer(short_answers=()):
+    """An analyzer whose 'why' answers are "<cause>.1" and "<cause>.2" without calling an LLM.
+
+    Causes in short_answers get only their first sub-cause. Every cause asked
+    about is recorded in analyzer.asked.
+    """
+    analyzer = LateralThinkingEnhanced.__new__(LateralThinkingEnhanced)
+    analyzer.asked = []
+
+    def ask_why(problem, cause):
+        analyzer.asked.append(cause)
+        sub_causes = [f"{cause}.1", f"{cause}.2"]
+        return sub_causes[:1] if cause in short_answers else sub_causes
+
+    async def ask_why_async(problem, cause):
+        return ask_why(problem, cause)
+
+    analyzer.ask_why = ask_why
+    analyzer.ask_why_async = ask_why_async
+    analyzer.ask_why_batch = lambda problem, causes: [ask_why(problem, cause) for cause in causes]
+    analyzer.ask_why_batch_async = lambda problem, causes: ask_why_async_batch(ask_why_async, problem, causes)
+    return analyzer
+
+async def ask_why_async_batch(ask_why_async, problem, causes):
+    return [await ask_why_async(problem, cause) for cause in causes]
+
+def full_leaves(cause, depth, max_leaf_causes, short_answers=()):
+    """The first max_leaf_causes leaves of the fully expanded tree"""
+    tree = stub_analyzer(short_answers).dig_deeper("problem", cause, depth=depth)
+    return extract_leaf_causes(tree, max_leaf_causes)
+
+class LazyExpansionTest(unittest.TestCase):
+    def test_expands_only_what_the_leaf_budget_needs(self):
+        analyzer = stub_analyzer()
+        tree = analyzer.dig_deeper("problem", "root", depth=2, max_leaf_causes=3)
+        self.assertEqual(extract_leaf_causes(tree, 3), ["root.1.1", "root.1.2", "root.2.1"])
+        self.assertEqual(analyzer.asked, ["root", "root.1", "root.2"])
+
+    def test_short_answer_expands_pruned_sibling(self):
+        analyzer = stub_analyzer(short_answers={"root.1"})
+        tree = analyzer.dig_deeper("problem", "root", depth=3, max_leaf_causes=4)
+        self.assertEqual(extract_leaf_causes(tree, 4), full_leaves("root", 3, 4, {"root.1"}))
+        self.assertEqual(extract_leaf_causes(tree, 4), ["root.1.1.1", "root.1.1.2", "root.2.1.1", "root.2.1.2"])
+
+    def test_short_answer_on_last_level(self):
+        analyzer = stub_analyzer(short_answers={"root.1.1"})
+        tree = analyzer.dig_deeper("problem", "root", depth=3, max_leaf_causes=4)
+        self.assertEqual(extract_leaf_causes(tree, 4), full_leaves("root", 3, 4, {"root.1.1"}))
+
+    def test_empty_answer_becomes_leaf(self):
+        analyzer = stub_analyzer()
+        analyzer.ask_why = lambda problem, cause: [] if cause == "root.1" else [f"{cause}.1", f"{cause}.2"]
+        tree = analyzer.dig_deeper("problem", "root", depth=2, max_leaf_causes=3)
+        self.assertEqual(extract_leaf_causes(tree, 3), ["root.1", "root.2.1", "root.2.2"])
+
+    def test_forest_and_async_variants_match(self):
+        short = {"a.1", "b.2.1"}
+        expected = [full_leaves(cause, 3, 4, short) for cause in ("a", "b")]
+        forest = stub_analyzer(short).dig_deeper_forest("problem", ["a", "b"], depth=3, max_leaf_causes=4)
+        self.assertEqual([extract_leaf_causes(tree, 4) for tree in forest], expected)
+        forest = asyncio.run(stub_analyzer(short).dig_deeper_forest_async("problem", ["a", "b"], depth=3, max_leaf_causes=4))
+        self.assertEqual([extract_leaf_causes(tree, 4) for tree in forest], expected)
+        tree = asyncio.run(stub_analyzer(short).dig_deeper_async("problem", "a", depth=3, max_leaf_causes=4))
+        self.assertEqual(extract_leaf_causes(tree, 4), expected[0])
+
+class BatchedWhyParsingTest(unittest.TestCase):
+    def test_well_formed(self):
+        text = "CAUSE 1:\nA\nB\nCAUSE 2:\n- C\n2. D\nE"
+        self.assertEqual(parse_batched_why(text, 2), [["A", "B"], ["C", "D"]])
+
+    def test_echoed_header_is_not_a_sub_cause(self):
+        text = "CAUSE 1: Funding is short\nGrants favour cities\nDonors fatigue\nCAUSE 2: Staff leave\nPay is low\nHours are long"
+        self.assertEqual(parse_batched_why(text, 2), [["Grants favour cities", "Donors fatigue"],
+                                                      ["Pay is low", "Hours are long"]])
+
+    def test_missing_blocks_are_none(self):
+        text = "CAUSE 2:\nC\nD"
+        self.assertEqual(parse_batched_why(text, 3), [None, ["C", "D"], None])
+
+    def test_garbled_blocks_are_none(self):
+        self.assertEqual(parse_batched_why("I cannot answer that.", 2), [None, None])
+        # Empty, repeated and out-of-range blocks
+        text = "CAUSE 1: only an echo\nCAUSE 2:\nC\nCAUSE 2:\nX\nCAUSE 7:\nY"
+        self.assertEqual(parse_batched_why(text, 2), [None, ["C"]])
+
+    def test_inputs_are_not_numbered_like_answers(self):
+        listed = format_numbered_causes(["Funding is short", "Staff leave"])
+        self.assertEqual(listed, "[1] Funding is short\n[2] Staff leave")
+        self.assertEqual(parse_batched_why(listed, 2), [None, None])
+
+class AsyncAnalysisTest(unittest.TestCase):
+    def test_event_loops_in_different_threads_get_their_own_slots(self):
+        analyzer = LateralThinkingEnhanced(backend="fake")
+        slots = []
+
+        async def take_slot():
+            held = analyzer._async_slots()
+            async with held:
+                await asyncio.sleep(0.05)  # While the other loops create theirs
+                slots.append((held, analyzer._async_slots()))
+
+        threads = [threading.Thread(target=asyncio.run, args=(take_slot(),)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(slots), 4)
+        for held, current in slots:
+            self.assertIs(current, held)
+        self.assertEqual(len({id(held) for held, _ in slots}), 4)
+
+    def test_failed_analysis_retrieves_its_key_ideas(self):
+        analyzer = LateralThinkingEnhanced(backend="fake")
+        analyzer.response_cache = None
+        errors = []
+
+        async def fail_key_idea(*args, **kwargs):
+            raise RuntimeError("key idea failed")
+
+        async def fail_causes(*args, **kwargs):
+            await asyncio.sleep(0.05)  # Long enough for the key ideas to start (and fail)
+            raise RuntimeError("causes failed")
+
+        analyzer.domain_llm.latency = analyzer.domain_llm.jitter = 0.0
+        analyzer.challenger_llm.ainvoke = fail_key_idea
+        analyzer.identify_initial_causes_async = fail_causes
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            loop.set_exception_handler(lambda loop, context: errors.append(context["message"]))
+            with self.assertRaisesRegex(RuntimeError, "causes failed"):
+                await analyzer.analyze_problem_async("problem", get_analysis_config("fastest"))
+            gc.collect()  # Unretrieved exceptions are reported when their tasks are collected
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+        self.assertEqual(errors, [])
+
+SCORES = "NOVELTY: 8\nFEASIBILITY: 6\nIMPACT: 7\nRELEVANCE: 9\nOVERALL: 7.5"
+
+class NumberedBlocksTest(unittest.TestCase):
+    def test_well_formed(self):
+        text = "**EVALUATION 1:**\n" + SCORES + "\n\nEvaluation #2)\n" + SCORES
+        scores = parse_batch_evaluation(text, 2)
+        self.assertEqual(scores[0], {"novelty": 8, "feasibility": 6, "impact": 7, "relevance": 9, "overall": 7.5})
+        self.assertEqual(scores[1], scores[0])
+
+    def test_partial_blocks_are_none(self):
+        # A block cut off before all four criteria must be re-evaluated
+        text = "EVALUATION 1:\n" + SCORES + "\nEVALUATION 2:\nNOVELTY: 8\nFEASIBILITY: 6"
+        self.assertEqual(parse_batch_evaluation(text, 3)[1:], [None, None])
+
+    def test_repeated_item_keeps_first_block(self):
+        text = "ITEM 1: first\nITEM 2: second\nITEM 1: again"
+        self.assertEqual(split_numbered_blocks(text, "ITEM", 2), ["first", "second"])
+
+    def test_out_of_range_blocks_are_ignored(self):
+        text = "ITEM 0: zero\nITEM 1: one\nITEM 3: three"
+        self.assertEqual(split_numbered_blocks(text, "ITEM", 2), ["one", None])
+
+class SolutionContentTest(unittest.TestCase):
+    def test_well_formed(self):
+        content = ("Intro\nSOLUTION TITLE: Shared Pantry\nKEY IDEA APPLICATION: Pooling stock\n"
+                   "spreads risk.\nIMPLEMENTATION: Councils fund\n\nlocal hubs.")
+        self.assertEqual(parse_solution_content(content), {
+            "title": "Shared Pantry",
+            "key_idea_application": "Pooling stock\nspreads risk.",
+            "implementation": "Councils fund\n\nlocal hubs.",
+            "other": "Intro"
+        })
+
+    def test_markdown_headers_and_title_first_line(self):
+        content = "## **Solution Title:** Shared Pantry\nA tagline\n> **Implementation**: Hubs"
+        sections = parse_solution_content(content)
+        self.assertEqual((sections["title"], sections["implementation"]), ("Shared Pantry", "Hubs"))
+
+    def test_partial(self):
+        sections = parse_solution_content("KEY IDEA APPLICATION: Only this")
+        self.assertEqual(sections, {"title": "", "key_idea_application": "Only this", "implementation": "", "other": ""})
+
+    def test_no_headers_goes_to_other(self):
+        self.assertEqual(parse_solution_content("  Free text  ")["other"], "Free text")
+
+    def test_repeated_header_keeps_first(self):
+        content = "IMPLEMENTATION: First plan\nIMPLEMENTATION: Second plan"
+        self.assertEqual(parse_solution_content(content)["implementation"], "First plan")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import time
+import asyncio
+import threading
+import unittest
+from executor import DagExecutor
+from pipeline import EvaluationPipeline, AsyncEvaluationPipeline
+
+class ConcurrencyGauge:
+    """Counts how many calls are running at once"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def run(self, seconds: float = 0.02):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(seconds)
+        with self._lock:
+            self.running -= 1
+
+def solution(solution_id, overall):
+    return {"id": solution_id, "scores": {"overall": overall}}
+
+class InFlightBoundTest(unittest.TestCase):
+    def test_nodes_respect_max_in_flight(self):
+        gauge = ConcurrencyGauge()
+        graph = DagExecutor(max_in_flight=2)
+        for i in range(8):
+            graph.add(i, gauge.run)
+        graph.run()
+        self.assertEqual(gauge.peak, 2)
+
+    def test_evaluation_batches_share_the_graph_bound(self):
+        # As in analyze_problem: nodes submit solutions that are evaluated off-graph while other nodes run
+        gauge = ConcurrencyGauge()
+        graph = DagExecutor(max_in_flight=2)
+
+        def evaluate_batch(batch):
+            with graph.slot():
+                gauge.run()
+
+        evaluations = EvaluationPipeline(evaluate_batch, workers=4, batch_size=1, linger=0)
+
+        def generate(i):
+            gauge.run()
+            evaluations.submit(solution(i, 5.0))
+
+        for i in range(8):
+            graph.add(i, lambda *_, i=i: generate(i), deps=[i - 1] if i % 2 else [])
+        graph.run()
+        self.assertEqual(len(evaluations.close()), 8)
+        self.assertLessEqual(gauge.peak, 2)
+
+class RankingOrderTest(unittest.TestCase):
+    def test_ties_rank_by_id_when_evaluations_finish_out_of_order(self):
+        def evaluate_batch(batch):
+            # Later solutions finish first
+            time.sleep(0.01 * (6 - batch[0]["id"]))
+            batch[0]["scores"]["overall"] = 9.0 if batch[0]["id"] == 4 else 7.0
+
+        evaluations = EvaluationPipeline(evaluate_batch, workers=6, batch_size=1, linger=0)
+        for i in range(6):
+            evaluations.submit(solution(i, 5.0))
+        self.assertEqual([s["id"] for s in evaluations.close()], [4, 0, 1, 2, 3, 5])
+
+    def test_async_ties_rank_by_id(self):
+        async def evaluate_batch(batch):
+            await asyncio.sleep(0.01 * (6 - batch[0]["id"]))
+
+        async def run():
+            evaluations = AsyncEvaluationPipeline(evaluate_batch, workers=6, batch_size=1, linger=0)
+            for i in range(6):
+                evaluations.submit(solution(i, 7.0))
+            return await evaluations.close()
+
+        self.assertEqual([s["id"] for s in asyncio.run(run())], [0, 1, 2, 3, 4, 5])
+
+if __name__ == "__main__":
+    unittest.main()